@@ -0,0 +1,181 @@
+"""Run the DB sync of both ingestion lambdas concurrently against one MySQL.
+
+Each round, store_items_in_db of get_backtohome and of get_thaimissing
+sync the same synthetic case names at the same time, in different orders
+and with content that changes every round, the way the two lambdas do
+when their schedules overlap. The first round is a full sync, the later
+ones go through each lambda's snapshot diff. Afterwards the script checks
+that no name_key has more than one case and that no write was lost to a
+deadlock, and reports rows/s per round.
+
+Needs a scratch MySQL database with the schema in src/database/rds,
+named with --database; other connection settings come from the lambdas'
+DB_CONFIG. The cases it creates, with their outbox events, are removed
+at the end.
+
+    python src/bench/bench_concurrent_ingest.py --database bench_missing --cases 2000 --rounds 5
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import import_lambda
+
+NAME_PREFIX = 'bench-ingest-'
+
+def listing_id(name):
+    """Each name keeps its listing id across rounds, as it does on the sites."""
+    return int(name[len(NAME_PREFIX):])
+
+def backtohome_items(names, round_no):
+    return [{
+        'id': str(listing_id(name)),
+        'name': name,
+        'image_url': f"https://example.org/backtohome/{listing_id(name)}.jpg",
+        'detail_link': f"https://example.org/backtohome/{listing_id(name)}?round={round_no}",
+        'detail': f"round {round_no}"
+    } for name in names]
+
+def thaimissing_items(names, round_no):
+    return [{
+        'full_name': name,
+        'photo_url': f"https://example.org/thaimissing/{listing_id(name)}.jpg",
+        'source_url': f"https://example.org/thaimissing/{listing_id(name)}",
+        'gender': 'ชาย' if listing_id(name) % 2 else 'หญิง',
+        'age_missing': str(round_no)
+    } for name in names]
+
+def connect(module):
+    return module.pymysql.connect(
+        **module.DB_CONFIG,
+        cursorclass=module.pymysql.cursors.DictCursor,
+        client_flag=module.CLIENT.MULTI_STATEMENTS
+    )
+
+def record_errors(module):
+    """Make the lambda's bulk and chunked writers record what they raise; returns the list.
+
+    The lambda recovers from these by falling back or retrying row by
+    row, so they only show in its output otherwise.
+    """
+    errors = []
+
+    def recording(write):
+        def wrapper(*args):
+            try:
+                return write(*args)
+            except Exception as e:
+                errors.append(str(e))
+                raise
+        return wrapper
+
+    module.bulk_sync = recording(module.bulk_sync)
+    module.upsert_items = recording(module.upsert_items)
+    return errors
+
+def write(module, items, errors):
+    """Sync items through the lambda's store_items_in_db.
+
+    Returns (seconds, errors): the errors recorded during the sync, those
+    of the rejected rows, and one for every item that was not stored.
+    """
+    del errors[:]
+    start = time.perf_counter()
+    report = module.store_items_in_db(items)
+    elapsed = time.perf_counter() - start
+    failed = list(errors) + [str(error) for _, error in report['rejected']]
+    if report['stored'] + len(report['rejected']) < len(items):
+        failed.append(f"{len(items) - report['stored'] - len(report['rejected'])} items not stored")
+    return elapsed, failed
+
+def cleanup(module):
+    conn = connect(module)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+            DELETE o FROM case_outbox o
+            JOIN cases c ON c.id = o.case_id
+            WHERE c.name_key LIKE %s
+            """, (NAME_PREFIX + '%',))
+            cur.execute("""
+            DELETE ci FROM case_information ci
+            JOIN cases c ON c.id = ci.case_id
+            WHERE c.name_key LIKE %s
+            """, (NAME_PREFIX + '%',))
+            cur.execute("DELETE FROM cases WHERE name_key LIKE %s", (NAME_PREFIX + '%',))
+        conn.commit()
+    finally:
+        conn.close()
+
+def count_duplicates(module):
+    conn = connect(module)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+            SELECT COUNT(*) AS duplicates FROM (
+                SELECT name FROM cases
+                WHERE name LIKE %s
+                GROUP BY name COLLATE utf8mb4_bin
+                HAVING COUNT(*) > 1
+            ) d
+            """, (NAME_PREFIX + '%',))
+            return cur.fetchone()['duplicates']
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--database', required=True, help='scratch database both lambdas sync into')
+    parser.add_argument('--cases', type=int, default=2000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    backtohome = import_lambda('get_backtohome')
+    thaimissing = import_lambda('get_thaimissing')
+    state_dir = tempfile.mkdtemp(prefix='bench-concurrent-ingest-')
+    errors = {}
+    for module in (backtohome, thaimissing):
+        module.DB_CONFIG = dict(module.DB_CONFIG, database=args.database)
+        module.SNAPSHOT_PATH = os.path.join(state_dir, f"{module.__name__}-snapshot.json")
+        module.CASE_CACHE_PATH = os.path.join(state_dir, f"{module.__name__}-cases.bin")
+        errors[module] = record_errors(module)
+    names = [f"{NAME_PREFIX}{i:06d}" for i in range(args.cases)]
+
+    cleanup(backtohome)
+    deadlocks = 0
+    failures = 0
+    try:
+        print(f"{'round':>5} {'backtohome':>14} {'thaimissing':>14} {'rows/s':>10}")
+        for round_no in range(args.rounds):
+            # Each writer sees the names in its own order, as the sources list them
+            order_a = random.sample(names, len(names))
+            order_b = random.sample(names, len(names))
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                start = time.perf_counter()
+                jobs = [
+                    executor.submit(write, backtohome, backtohome_items(order_a, round_no), errors[backtohome]),
+                    executor.submit(write, thaimissing, thaimissing_items(order_b, round_no), errors[thaimissing]),
+                ]
+                results = [job.result() for job in jobs]
+                wall = time.perf_counter() - start
+
+            for _, failed in results:
+                failures += len(failed)
+                deadlocks += sum('Deadlock' in error or '1213' in error for error in failed)
+            (time_a, _), (time_b, _) = results
+            print(f"{round_no:>5} {time_a:>12.2f} s {time_b:>12.2f} s {2 * len(names) / wall:>10.0f}")
+
+        duplicates = count_duplicates(backtohome)
+    finally:
+        cleanup(backtohome)
+
+    print(f"duplicate names: {duplicates}, deadlocks: {deadlocks}, failed writes: {failures}")
+    if duplicates or deadlocks or failures:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Load-test get_backtohome's crawl against a local replay server.
+
+Starts replay_server in-process, points get_backtohome at it and crawls
+every listing page and detail, reporting requests, throughput and how
+the crawl coped with the injected latency and errors. An error response
+on a listing page aborts the crawl; a crawl that finishes is checked
+against the listings the server holds, and the bench exits with status
+1 if any are missing. With --full it runs the whole main() instead,
+which also needs the MySQL database.
+
+    python src/bench/bench_crawl.py --pages 200 --latency lognormal:120,0.6 --error-rate 0.02
+"""
+import argparse
+import os
+import sys
+import time
+
+from common import import_lambda
+from replay_server import LISTING_PATH, LISTING_QUERY, add_server_arguments, server_from_args, server_urls
+
+def expected_listings(backtohome, catalog, pages):
+    """Count the listings the catalog serves on pages 1..pages, without injected faults."""
+    count = 0
+    for page in range(1, pages + 1):
+        response = catalog.lookup(f"{LISTING_PATH}?{LISTING_QUERY}{page}")
+        if response is not None and response[0] == 200:
+            count += len(backtohome.parse_listing_page(response[2]))
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    add_server_arguments(parser)
+    parser.add_argument('--full', action='store_true', help='run main() including the DB sync')
+    parser.add_argument('--quiet', action='store_true', help="hide the lambda's per-item output")
+    args = parser.parse_args()
+
+    server = server_from_args(args)
+    # Set before import so parse processes started with spawn see it too
+    os.environ.update(server_urls(server))
+    backtohome = import_lambda('get_backtohome')
+
+    stdout = sys.stdout
+    if args.quiet:
+        sys.stdout = open(os.devnull, 'w')
+    start = time.perf_counter()
+    items = None
+    pages = None
+    error = None
+    try:
+        if args.full:
+            backtohome.main()
+        else:
+            pages = backtohome.get_total_pages()
+            items = backtohome.crawl_pages(range(1, pages + 1))
+    except Exception as e:
+        # An error response or a dropped connection on a listing page
+        # aborts the crawl rather than yielding a partial catalog
+        error = e
+    finally:
+        if args.quiet:
+            sys.stdout.close()
+            sys.stdout = stdout
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    stats = server.RequestHandlerClass.stats
+    print(f"{stats['requests']} requests in {elapsed:.2f}s ({stats['requests'] / elapsed:.1f} req/s)")
+    print(f"Injected {stats['errors']} errors and {stats['resets']} resets; {stats['missing']} requests not in the catalog")
+    if error is not None:
+        print(f"Run aborted after {elapsed:.2f}s: {error!r}")
+    if items is not None:
+        with_detail = sum(1 for item in items if item.get('detail'))
+        print(f"{len(items)} listings, {with_detail} with details ({len(items) / elapsed:.1f} listings/s)")
+        expected = expected_listings(backtohome, server.RequestHandlerClass.catalog, pages)
+        if len(items) < expected:
+            print(f"Missing {expected - len(items)} of {expected} listings the server holds")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Measure how get_backtohome's store_items_in_db scales with the catalog size.
+
+For each size, empties the case tables, loads a synthetic catalog of that
+many cases (a full sweep into an empty database), then syncs successive
+crawls in which a given share of the cases changed, disappeared or
+appeared. Each sync reports wall time, client round trips and the rows
+InnoDB wrote, so a step that grows faster than the catalog stands out.
+
+Needs a scratch MySQL database with the schema in src/database/rds; its
+case tables are emptied before every size. Other connection settings
+come from the lambda's DB_CONFIG.
+
+    python src/bench/bench_db_sync.py --database bench_missing --sizes 1000 10000 100000 --change-rates 0 0.01 0.1
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from common import import_lambda
+from synthetic import backtohome_items, evolve
+
+ROW_COUNTERS = ('Innodb_rows_inserted', 'Innodb_rows_updated', 'Innodb_rows_deleted')
+
+def count_round_trips(pymysql):
+    """Count every command the client sends; returns the counter dict."""
+    counter = {'round_trips': 0}
+    execute_command = pymysql.connections.Connection._execute_command
+
+    def counted(self, command, sql):
+        counter['round_trips'] += 1
+        return execute_command(self, command, sql)
+
+    pymysql.connections.Connection._execute_command = counted
+    return counter
+
+def connect(backtohome):
+    return backtohome.pymysql.connect(**backtohome.DB_CONFIG, cursorclass=backtohome.pymysql.cursors.DictCursor)
+
+def rows_written(backtohome):
+    conn = connect(backtohome)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SHOW GLOBAL STATUS WHERE Variable_name IN %s", (ROW_COUNTERS,))
+            return sum(int(row['Value']) for row in cur.fetchall())
+    finally:
+        conn.close()
+
+def reset(backtohome):
+    conn = connect(backtohome)
+    try:
+        with conn.cursor() as cur:
+            for table in ('case_outbox', 'posted_case', 'photo_match', 'case_link', 'case_information', 'cases'):
+                cur.execute(f"DELETE FROM {table}")
+        conn.commit()
+    finally:
+        conn.close()
+    for path in (backtohome.SNAPSHOT_PATH, backtohome.CASE_CACHE_PATH):
+        if os.path.exists(path):
+            os.remove(path)
+
+def timed_sync(backtohome, counter, items, label, size):
+    before_rows = rows_written(backtohome)
+    before_trips = counter['round_trips']
+    start = time.perf_counter()
+    report = backtohome.store_items_in_db(items)
+    elapsed = time.perf_counter() - start
+    trips = counter['round_trips'] - before_trips
+    rows = rows_written(backtohome) - before_rows
+    return f"{size:>8} {label:>10} {elapsed:>9.2f} {trips:>11} {rows:>10} {report['stored']:>8}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--database', required=True, help='scratch database; its case tables are emptied')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--change-rates', type=float, nargs='+', default=[0, 0.01, 0.1])
+    parser.add_argument('--no-snapshot', action='store_true', help='drop the snapshot before every sync, forcing full sweeps')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    backtohome = import_lambda('get_backtohome')
+    backtohome.DB_CONFIG = dict(backtohome.DB_CONFIG, database=args.database)
+    state_dir = tempfile.mkdtemp(prefix='bench-db-sync-')
+    backtohome.SNAPSHOT_PATH = os.path.join(state_dir, 'snapshot.json')
+    backtohome.CASE_CACHE_PATH = os.path.join(state_dir, 'cases.bin')
+    counter = count_round_trips(backtohome.pymysql)
+
+    lines = []
+    for size in args.sizes:
+        reset(backtohome)
+        catalog = backtohome_items(size, args.seed)
+        lines.append(timed_sync(backtohome, counter, catalog, 'load', size))
+        for round_no, rate in enumerate(args.change_rates, 1):
+            catalog = evolve(catalog, rate, args.seed + round_no)
+            if args.no_snapshot and os.path.exists(backtohome.SNAPSHOT_PATH):
+                os.remove(backtohome.SNAPSHOT_PATH)
+            lines.append(timed_sync(backtohome, counter, catalog, f"{rate:.1%}", size))
+
+    print(f"{'cases':>8} {'change':>10} {'seconds':>9} {'round trips':>11} {'rows':>10} {'stored':>8}")
+    for line in lines:
+        print(line)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Measure get_backtohome's DB sync throughput against the number of writers.
+
+For each writer count K, writes a fresh set of synthetic cases through
+write_partitioned with DB_WRITERS=K (all inserts), then writes it again
+with changed content (all updates), and reports rows/s for both passes.
+
+Needs a scratch MySQL database with the schema in src/database/rds,
+named with --database; other connection settings come from the lambda's
+DB_CONFIG. The cases it creates, with their outbox events, are removed
+at the end.
+
+    python src/bench/bench_db_writers.py --database bench_missing --cases 5000 --writers 1 2 4 8
+"""
+import argparse
+import time
+
+from common import import_lambda
+
+NAME_PREFIX = 'bench-writers-'
+
+def make_items(prefix, count, round_no):
+    return [{
+        'id': str(i),
+        'name': f"{prefix}{i:06d}",
+        'image_url': f"https://example.org/backtohome/{i}.jpg",
+        'detail_link': f"https://example.org/backtohome/{i}",
+        'detail': f"round {round_no}"
+    } for i in range(count)]
+
+def connect(backtohome):
+    return backtohome.pymysql.connect(
+        **backtohome.DB_CONFIG,
+        cursorclass=backtohome.pymysql.cursors.DictCursor,
+        client_flag=backtohome.CLIENT.MULTI_STATEMENTS
+    )
+
+def timed_write(backtohome, items):
+    conn = connect(backtohome)
+    try:
+        start = time.perf_counter()
+        written, rejected = backtohome.write_partitioned(conn, items)
+        elapsed = time.perf_counter() - start
+    finally:
+        conn.close()
+    if rejected or len(written) != len(items):
+        raise SystemExit(f"Only {len(written)} of {len(items)} rows written, {len(rejected)} rejected")
+    return len(items) / elapsed
+
+def cleanup(backtohome):
+    conn = connect(backtohome)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+            DELETE o FROM case_outbox o
+            JOIN cases c ON c.id = o.case_id
+            WHERE c.name_key LIKE %s
+            """, (NAME_PREFIX + '%',))
+            cur.execute("""
+            DELETE ci FROM case_information ci
+            JOIN cases c ON c.id = ci.case_id
+            WHERE c.name_key LIKE %s
+            """, (NAME_PREFIX + '%',))
+            cur.execute("DELETE FROM cases WHERE name_key LIKE %s", (NAME_PREFIX + '%',))
+        conn.commit()
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--database', required=True, help='scratch database the cases are written to')
+    parser.add_argument('--cases', type=int, default=5000)
+    parser.add_argument('--writers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    backtohome = import_lambda('get_backtohome')
+    backtohome.DB_CONFIG = dict(backtohome.DB_CONFIG, database=args.database)
+    cleanup(backtohome)
+    try:
+        print(f"{'writers':>7} {'insert rows/s':>14} {'update rows/s':>14}")
+        for writers in args.writers:
+            backtohome.DB_WRITERS = writers
+            prefix = f"{NAME_PREFIX}{writers}-"
+            inserts = timed_write(backtohome, make_items(prefix, args.cases, 0))
+            updates = timed_write(backtohome, make_items(prefix, args.cases, 1))
+            print(f"{writers:>7} {inserts:>14.0f} {updates:>14.0f}")
+    finally:
+        cleanup(backtohome)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Micro-benchmark every extraction and normalization hot path on the fixture corpus.
+
+Times get_backtohome's listing and detail page extraction and
+get_thaimissing's date, time and name normalization, record parsing and
+description building over the fixtures listed in fixtures/manifest.json.
+Results can be saved as JSON and compared against an earlier run; any
+benchmark slower than the baseline by more than the threshold is flagged
+and the script exits non-zero.
+
+    python src/bench/bench_hot_paths.py --output baseline.json
+    python src/bench/bench_hot_paths.py --compare baseline.json --threshold 0.1
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+
+from common import best_of, import_lambda, load_manifest, read_fixture
+
+def fixture_names(manifest, prefix):
+    return [path.split('/', 1)[1] for path in manifest['files'] if path.startswith(prefix)]
+
+def make_benchmarks(manifest):
+    """Return {name: (func, calls)}; func runs the hot path calls times."""
+    backtohome = import_lambda('get_backtohome')
+    thaimissing = import_lambda('get_thaimissing')
+
+    listings = [read_fixture('backtohome', name) for name in fixture_names(manifest, 'backtohome/listing_')]
+    details = [read_fixture('backtohome', name) for name in fixture_names(manifest, 'backtohome/detail_')]
+    records = json.loads(read_fixture('thaimissing', 'payload.json').decode('utf-8'))
+    items = [thaimissing.parse_record(rec) for rec in records]
+    dates = [rec.get('missingDate') for rec in records]
+    times = [rec.get('missingTime') for rec in records]
+    names = [rec.get('fullName') for rec in records]
+
+    def each(func, values):
+        return lambda: [func(value) for value in values], len(values)
+
+    return {
+        'backtohome.parse_listing_page': each(backtohome.parse_listing_page, listings),
+        'backtohome.parse_detail_page': each(backtohome.parse_detail_page, details),
+        'thaimissing.parse_thai_date': each(thaimissing.parse_thai_date, dates),
+        'thaimissing.parse_thai_time': each(thaimissing.parse_thai_time, times),
+        'thaimissing.remove_thai_honorific': each(thaimissing.remove_thai_honorific, names),
+        'thaimissing.parse_record': each(thaimissing.parse_record, records),
+        'thaimissing.build_description': each(thaimissing.build_description, items),
+    }
+
+def run(manifest, repeat, number):
+    results = {}
+    for name, (func, calls) in make_benchmarks(manifest).items():
+        results[name] = best_of(func, repeat, number) / calls
+        print(f"{name:<40} {results[name] * 1e6:>12.2f} us/call")
+    return {
+        'corpus_version': manifest['version'],
+        'python': platform.python_version(),
+        'results': results
+    }
+
+def compare(current, baseline, threshold):
+    """Print the change of each benchmark against baseline; return the regressed names."""
+    if baseline['corpus_version'] != current['corpus_version']:
+        raise SystemExit(
+            f"Baseline is for corpus version {baseline['corpus_version']}, "
+            f"this run used {current['corpus_version']}"
+        )
+    regressed = []
+    print(f"{'benchmark':<40} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, seconds in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            print(f"{name:<40} {'-':>12} {seconds * 1e6:>9.2f} us {'new':>9}")
+            continue
+        change = seconds / before - 1
+        flag = ''
+        if change > threshold:
+            regressed.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<40} {before * 1e6:>9.2f} us {seconds * 1e6:>9.2f} us {change:>+8.1%}{flag}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--output', help='save the results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON file from an earlier --output')
+    parser.add_argument('--threshold', type=float, default=0.1, help='slowdown flagged as a regression, 0.1 = 10%%')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=20)
+    args = parser.parse_args()
+
+    manifest = load_manifest()
+    print(f"Fixture corpus version {manifest['version']}, {len(manifest['files'])} files")
+    current = run(manifest, args.repeat, args.number)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"Saved results to {os.path.abspath(args.output)}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressed = compare(current, baseline, args.threshold)
+        if regressed:
+            print(f"{len(regressed)} benchmark(s) regressed by more than {args.threshold:.0%}")
+            return 1
+        print(f"No benchmark regressed by more than {args.threshold:.0%}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
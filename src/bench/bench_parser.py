@@ -0,0 +1,96 @@
+"""Compare the HTML parser backends used by get_backtohome.
+
+Checks that every available backend, and the streaming extractors fed in
+small chunks, extract identical records from the fixture pages, then
+reports parse time per listing and detail page. The repo has no test
+suite, so this parity check is run by hand after touching the parsers;
+--check runs only the check and exits with status 1 on any mismatch.
+
+    python src/bench/bench_parser.py
+    python src/bench/bench_parser.py --check
+"""
+import argparse
+import os
+import sys
+
+from common import FIXTURES_DIR, best_of, import_lambda, read_fixture
+
+BACKENDS = ['html.parser', 'lxml']
+
+# Small enough that text nodes and tags are split across feed() calls
+STREAM_TEST_CHUNK = 61
+
+def available_backends():
+    backends = []
+    for backend in BACKENDS:
+        try:
+            if backend == 'lxml':
+                import lxml  # noqa: F401
+            backends.append(backend)
+        except ImportError:
+            print(f"Skipping {backend}: not installed")
+    return backends
+
+def chunked(content, size):
+    return [content[i:i + size] for i in range(0, len(content), size)]
+
+def make_parsers(backtohome, kind):
+    """Return {label: parse(content)} for every way of parsing a page kind."""
+    parse = backtohome.parse_listing_page if kind == 'listing' else backtohome.parse_detail_page
+    parsers = {backend: (lambda content, b=backend: parse(content, b)) for backend in available_backends()}
+
+    def parse_stream(content, chunk_size):
+        if kind == 'listing':
+            return list(backtohome.feed_chunks(backtohome.ListingStreamParser(), chunked(content, chunk_size)))
+        extractor = backtohome.DetailStreamParser()
+        list(backtohome.feed_chunks(extractor, chunked(content, chunk_size)))
+        return extractor.text
+
+    parsers['stream'] = lambda content: parse_stream(content, backtohome.STREAM_CHUNK_SIZE)
+    parsers['stream-small'] = lambda content: parse_stream(content, STREAM_TEST_CHUNK)
+    return parsers
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--check', action='store_true', help='only check parser parity, without timing')
+    args = parser.parse_args()
+
+    backtohome = import_lambda('get_backtohome')
+    fixture_dir = os.path.join(FIXTURES_DIR, 'backtohome')
+    pages = [
+        (name, 'listing' if name.startswith('listing_') else 'detail')
+        for name in sorted(os.listdir(fixture_dir))
+        if name.endswith('.html')
+    ]
+
+    mismatches = 0
+    timings = {}
+    for name, kind in pages:
+        content = read_fixture('backtohome', name)
+        parsers = make_parsers(backtohome, kind)
+        results = {label: parse(content) for label, parse in parsers.items()}
+        reference_label = next(iter(results))
+        reference = results[reference_label]
+        for label, result in results.items():
+            if result != reference:
+                mismatches += 1
+                print(f"MISMATCH {name}: {reference_label} != {label}")
+                print(f"  {reference_label}: {reference!r}")
+                print(f"  {label}: {result!r}")
+        if not args.check:
+            timings[name] = {label: best_of(lambda: parse(content)) for label, parse in parsers.items()}
+
+    labels = list(parsers)
+    if timings:
+        print(f"{'page':<32}" + ''.join(f"{label:>16}" for label in labels))
+        for name, row in timings.items():
+            print(f"{name:<32}" + ''.join(f"{row[label] * 1000:>13.3f} ms" for label in labels))
+
+    if mismatches:
+        print(f"{mismatches} result(s) differ between parsers")
+        return 1
+    print(f"All {len(pages)} pages match across {', '.join(labels)}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""Check mirror_images' HammingIndex against brute force and time its searches.
+
+Builds an index over random 64-bit picture hashes, some of them
+near-duplicates a few bits apart as re-encoded copies of a photo would
+be, then answers queries both with HammingIndex.search and by computing
+the hamming distance to every hash. Also reports how many stored hashes
+a search had to check. Exits with status 1 if the two ever disagree.
+
+    python src/bench/bench_photo_index.py --hashes 20000 --queries 200 --distance 6
+"""
+import argparse
+import random
+import sys
+import time
+
+from common import import_lambda
+
+def near_copy(rng, value, max_bits):
+    """value with up to max_bits random bits flipped."""
+    for bit in rng.sample(range(64), rng.randint(0, max_bits)):
+        value ^= 1 << bit
+    return value
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--hashes', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--distance', type=int, default=6, help='largest hamming distance searched for')
+    parser.add_argument('--duplicates', type=float, default=0.2, help='share of hashes that copy an earlier one')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    mirror_images = import_lambda('mirror_images')
+    rng = random.Random(args.seed)
+    hashes = []
+    for _ in range(args.hashes):
+        if hashes and rng.random() < args.duplicates:
+            hashes.append(near_copy(rng, rng.choice(hashes), args.distance + 2))
+        else:
+            hashes.append(rng.getrandbits(64))
+
+    start = time.perf_counter()
+    index = mirror_images.HammingIndex(args.distance)
+    for value, key in enumerate(hashes):
+        index.add(key, value)
+    built = time.perf_counter() - start
+
+    queries = [near_copy(rng, rng.choice(hashes), args.distance) for _ in range(args.queries)]
+    start = time.perf_counter()
+    found = [sorted(index.search(query, args.distance)) for query in queries]
+    searched = time.perf_counter() - start
+
+    checked = sum(
+        len(set().union(*(table.get((query >> shift) & mask, ())
+                          for table, (shift, mask) in zip(index.tables, index.ranges))))
+        for query in queries
+    )
+
+    start = time.perf_counter()
+    expected = [
+        sorted((distance, value) for value, key in enumerate(hashes)
+               for distance in [mirror_images.hamming(query, key)] if distance <= args.distance)
+        for query in queries
+    ]
+    brute = time.perf_counter() - start
+
+    mismatches = sum(1 for got, want in zip(found, expected) if got != want)
+    matches = sum(len(want) for want in expected)
+    print(f"Built an index of {len(hashes)} hashes ({len(index.values)} distinct) in {built:.2f}s")
+    print(f"{len(queries)} searches within {args.distance} bits: index {searched:.2f}s, brute force {brute:.2f}s ({matches} matches)")
+    print(f"A search checked {checked / len(queries) / len(index.values):.2%} of the distinct hashes on average")
+    if mismatches:
+        print(f"{mismatches} of {len(queries)} searches differ from brute force")
+        sys.exit(1)
+    print("Every search matches brute force")
+
+if __name__ == '__main__':
+    main()
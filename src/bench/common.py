@@ -0,0 +1,58 @@
+"""Shared helpers for the offline benchmark scripts in this directory."""
+import os
+import sys
+import json
+import time
+import hashlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+LAMBDA_DIR = os.path.join(BENCH_DIR, '..', 'features', 'lambda')
+
+# Lambda source dirs and the dirs whose deploy bundles vendor their dependencies
+LAMBDAS = {
+    'get_backtohome': ('get_backtohome', 'get_backtohome'),
+    'get_thaimissing': ('get_thaimssing', 'get_thaimssing'),
+    'link_cases': ('link_cases', 'link_cases'),
+    'mirror_images': ('mirror_images', 'mirror_images'),
+    'publish_cases': ('publish_cases', 'publish_cases'),
+}
+
+def import_lambda(module_name):
+    """Import a lambda's local script, falling back to its vendored dependencies."""
+    source_dir, bundle_dir = LAMBDAS[module_name]
+    lambda_dir = os.path.abspath(os.path.join(LAMBDA_DIR, source_dir))
+    if lambda_dir not in sys.path:
+        sys.path.insert(0, lambda_dir)
+    deploy_dir = os.path.abspath(os.path.join(LAMBDA_DIR, bundle_dir, 'deploy'))
+    if deploy_dir not in sys.path:
+        # Appended so installed packages (e.g. lxml-enabled bs4) still take precedence
+        sys.path.append(deploy_dir)
+    return __import__(module_name)
+
+def read_fixture(*parts):
+    with open(os.path.join(FIXTURES_DIR, *parts), 'rb') as f:
+        return f.read()
+
+def load_manifest():
+    """Return the fixture manifest after checking every file against its checksum.
+
+    Any edit to the corpus must come with a new manifest version, so
+    results are only ever compared across identical inputs.
+    """
+    with open(os.path.join(FIXTURES_DIR, 'manifest.json')) as f:
+        manifest = json.load(f)
+    for path, digest in manifest['files'].items():
+        if hashlib.sha256(read_fixture(*path.split('/'))).hexdigest() != digest:
+            raise SystemExit(f"Fixture {path} does not match manifest version {manifest['version']}; bump the version")
+    return manifest
+
+def best_of(func, repeat=5, number=20):
+    """Return the best per-call time of func in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
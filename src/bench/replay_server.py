@@ -0,0 +1,297 @@
+"""Record the source sites into a cassette and replay them from a local HTTP server.
+
+record fetches backtohome listing pages, their detail pages and the
+thaimissing API payload into a cassette file. serve replays a cassette
+(or, without one, the fixture corpus) with configurable latency, injected
+errors and connection resets, and can scale the catalog to any number of
+listing pages and API records by synthesizing them from the recorded
+ones. Point the lambdas at it with BACKTOHOME_BASE_URL and
+THAIMISSING_API_URL, as printed on startup.
+
+    python src/bench/replay_server.py record --pages 3 --output cassette.json
+    python src/bench/replay_server.py serve --cassette cassette.json --pages 500 --latency lognormal:80,0.5 --error-rate 0.01
+"""
+import argparse
+import base64
+import json
+import math
+import random
+import re
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from common import FIXTURES_DIR, import_lambda, load_manifest, read_fixture
+
+LISTING_PATH = '/net%20missing.php'
+LISTING_QUERY = 'width=1920&height=1080&pages='
+DETAIL_PATH = '/net%20missing_detail.php'
+API_PATH = '/api/v1/cir-Datacatalog-web/DataMissingPerson'
+
+# Ids of synthesized listings are the recorded id plus page * SYNTHETIC_ID_STRIDE
+SYNTHETIC_ID_STRIDE = 1000000
+
+PAGE_LINK = re.compile(rb'pages=(\d+)')
+DETAIL_ID = re.compile(rb'((?:id=|images_missing/))(\d+)')
+LISTING_NAME = re.compile(rb'(<div align="center"><b>)(.*?)(</b>)', re.S)
+
+def request_key(url):
+    """Cassette key for a URL: its path and query, without host or fragment."""
+    parts = urlsplit(url)
+    return f"{parts.path}?{parts.query}" if parts.query else parts.path
+
+def make_entry(status, content_type, body):
+    return {'status': status, 'content_type': content_type, 'body': base64.b64encode(body).decode('ascii')}
+
+def load_cassette(path):
+    with open(path) as f:
+        cassette = json.load(f)
+    return {
+        key: (entry['status'], entry['content_type'], base64.b64decode(entry['body']))
+        for key, entry in cassette['interactions'].items()
+    }
+
+def fixture_cassette():
+    """Build a cassette from the fixture corpus, for replaying without a recording."""
+    manifest = load_manifest()
+    interactions = {}
+    for path in manifest['files']:
+        source, name = path.split('/', 1)
+        body = read_fixture(source, name)
+        if name.startswith('listing_page_'):
+            page = int(re.search(r'\d+', name).group())
+            interactions[f"{LISTING_PATH}?{LISTING_QUERY}{page}"] = (200, 'text/html; charset=utf-8', body)
+        elif re.match(r'detail_\d+\.html$', name):
+            detail_id = re.search(r'\d+', name).group()
+            interactions[f"{DETAIL_PATH}?id={detail_id}"] = (200, 'text/html; charset=utf-8', body)
+        elif source == 'thaimissing':
+            interactions[API_PATH] = (200, 'application/json', body)
+    print(f"Replaying fixture corpus version {manifest['version']} ({len(interactions)} responses)")
+    return interactions
+
+def record(pages, output, thaimissing=True):
+    """Fetch the first pages of backtohome with their details, and the thaimissing payload."""
+    backtohome = import_lambda('get_backtohome')
+    interactions = {}
+
+    def fetch(url):
+        resp = backtohome.session.get(url, timeout=30)
+        interactions[request_key(url)] = make_entry(resp.status_code, resp.headers.get('Content-Type', 'text/html'), resp.content)
+        print(f"Recorded {resp.status_code} {url} ({len(resp.content)} bytes)")
+        return resp
+
+    for page in range(1, pages + 1):
+        resp = fetch(f"{backtohome.BASE_URL}{page}")
+        for item in backtohome.parse_listing_page(resp.content):
+            if item['detail_link']:
+                fetch(item['detail_link'])
+
+    if thaimissing:
+        fetch(import_lambda('get_thaimissing').API_URL)
+
+    with open(output, 'w') as f:
+        json.dump({'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'interactions': interactions}, f)
+    print(f"Saved {len(interactions)} responses to {output}")
+
+def parse_latency(spec):
+    """Return a function sampling a delay in seconds from a spec such as 'uniform:20,200'.
+
+    Distributions, all in milliseconds: fixed:MS, uniform:LOW,HIGH,
+    exponential:MEAN and lognormal:MEDIAN,SIGMA.
+    """
+    kind, _, params = spec.partition(':')
+    values = [float(value) for value in params.split(',') if value]
+    if kind == 'fixed':
+        return lambda rng: values[0] / 1000
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == 'exponential':
+        return lambda rng: rng.expovariate(1 / values[0]) / 1000 if values[0] else 0.0
+    if kind == 'lognormal':
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1]) / 1000
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+class Catalog:
+    """The responses a replay server answers with, recorded or synthesized.
+
+    The site claims exactly pages listing pages, by default as many as
+    were recorded: pagination links are clamped to it, and pages and
+    details that were not recorded are derived from recorded ones with
+    shifted ids and renamed people. With records set, the API payload is grown or cut to
+    that many records the same way.
+    """
+
+    def __init__(self, interactions, pages=None, records=None):
+        self.interactions = interactions
+        self.pages = pages
+        self.listings = sorted(
+            (int(key.rsplit('=', 1)[1]), key) for key in interactions
+            if key.startswith(f"{LISTING_PATH}?")
+        )
+        self.details = sorted(key for key in interactions if key.startswith(f"{DETAIL_PATH}?"))
+        if pages is None and self.listings:
+            # Recorded pages still link to every page of the live site
+            self.pages = self.listings[-1][0]
+        if records is not None and API_PATH in interactions:
+            status, content_type, body = interactions[API_PATH]
+            interactions[API_PATH] = (status, content_type, self.scale_payload(json.loads(body), records))
+
+    @staticmethod
+    def scale_payload(data, records):
+        payload = []
+        for i in range(records):
+            rec = dict(data[i % len(data)])
+            copy = i // len(data)
+            if copy:
+                if rec.get('fullName'):
+                    rec['fullName'] = f"{rec['fullName']} {copy}"
+                rec['url'] = f"{rec.get('url') or ''}?copy={copy}"
+            payload.append(rec)
+        return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+    def clamp_pages(self, body):
+        body = PAGE_LINK.sub(lambda m: b'pages=%d' % min(int(m.group(1)), self.pages), body)
+        link = f'<a href="net%20missing.php?{LISTING_QUERY.replace("&", "&amp;")}{self.pages}#content">{self.pages}</a>'
+        return body.replace(b'</body>', link.encode() + b'\n</body>', 1)
+
+    def synthesize_listing(self, page):
+        _, key = self.listings[page % len(self.listings)]
+        status, content_type, body = self.interactions[key]
+        offset = page * SYNTHETIC_ID_STRIDE
+        body = DETAIL_ID.sub(lambda m: m.group(1) + str(int(m.group(2)) + offset).encode(), body)
+        body = LISTING_NAME.sub(lambda m: m.group(1) + m.group(2) + b' %d' % page + m.group(3), body)
+        return status, content_type, body
+
+    def lookup(self, key):
+        """Return (status, content_type, body) for a request key, or None."""
+        path, _, query = key.partition('?')
+        if self.pages is not None and path == LISTING_PATH:
+            page = int(parse_qs(query).get('pages', ['0'])[0])
+            if not 1 <= page <= self.pages or not self.listings:
+                return None
+            status, content_type, body = self.interactions.get(key) or self.synthesize_listing(page)
+            return status, content_type, self.clamp_pages(body)
+        if key in self.interactions:
+            return self.interactions[key]
+        if self.pages is not None and path == DETAIL_PATH and self.details:
+            detail_id = int(parse_qs(query).get('id', ['0'])[0])
+            recorded = f"{DETAIL_PATH}?id={detail_id % SYNTHETIC_ID_STRIDE}"
+            return self.interactions.get(recorded) or self.interactions[self.details[detail_id % len(self.details)]]
+        return None
+
+def make_handler(catalog, latency, error_rate, error_status, reset_rate, seed):
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+    stats = {'requests': 0, 'errors': 0, 'resets': 0, 'missing': 0}
+
+    class ReplayHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            with rng_lock:
+                delay = latency(rng)
+                roll = rng.random()
+                stats['requests'] += 1
+            time.sleep(delay)
+
+            if roll < reset_rate:
+                with rng_lock:
+                    stats['resets'] += 1
+                # Drop the connection without answering, like an overloaded origin
+                self.connection.shutdown(socket.SHUT_RDWR)
+                self.close_connection = True
+                return
+            if roll < reset_rate + error_rate:
+                with rng_lock:
+                    stats['errors'] += 1
+                self.respond(error_status, 'text/plain', b'injected error')
+                return
+
+            response = catalog.lookup(request_key(self.path))
+            if response is None:
+                with rng_lock:
+                    stats['missing'] += 1
+                self.respond(404, 'text/plain', b'not in cassette')
+                return
+            self.respond(*response)
+
+        def respond(self, status, content_type, body):
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    ReplayHandler.stats = stats
+    ReplayHandler.catalog = catalog
+    return ReplayHandler
+
+def start_server(catalog, port=0, latency='fixed:0', error_rate=0.0, error_status=503, reset_rate=0.0, seed=1):
+    """Serve catalog from a background thread; returns the server, its handler has .stats and .catalog."""
+    handler = make_handler(catalog, parse_latency(latency), error_rate, error_status, reset_rate, seed)
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def server_urls(server):
+    host, port = server.server_address[:2]
+    return {
+        'BACKTOHOME_BASE_URL': f"http://{host}:{port}{LISTING_PATH}?{LISTING_QUERY}",
+        'THAIMISSING_API_URL': f"http://{host}:{port}{API_PATH}"
+    }
+
+def add_server_arguments(parser):
+    """Options shared by serve and the benchmarks that start a replay server."""
+    parser.add_argument('--cassette', help=f"recorded cassette; the corpus in {FIXTURES_DIR} by default")
+    parser.add_argument('--pages', type=int, help='listing pages the site claims, synthesizing missing ones')
+    parser.add_argument('--records', type=int, help='records in the API payload, synthesizing missing ones')
+    parser.add_argument('--latency', default='fixed:0', help='fixed:MS, uniform:LOW,HIGH, exponential:MEAN or lognormal:MEDIAN,SIGMA')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with --error-status')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--reset-rate', type=float, default=0.0, help='share of connections dropped without a response')
+    parser.add_argument('--seed', type=int, default=1)
+
+def server_from_args(args, port=0):
+    interactions = load_cassette(args.cassette) if args.cassette else fixture_cassette()
+    catalog = Catalog(interactions, args.pages, args.records)
+    return start_server(
+        catalog, port, args.latency, args.error_rate, args.error_status, args.reset_rate, args.seed
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    record_parser = commands.add_parser('record', help='record the live sites into a cassette')
+    record_parser.add_argument('--pages', type=int, default=1, help='listing pages to record, with their details')
+    record_parser.add_argument('--output', required=True)
+    record_parser.add_argument('--no-thaimissing', action='store_true', help='skip the thaimissing API payload')
+    serve_parser = commands.add_parser('serve', help='replay a cassette')
+    add_server_arguments(serve_parser)
+    serve_parser.add_argument('--port', type=int, default=8080)
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        record(args.pages, args.output, not args.no_thaimissing)
+        return 0
+
+    server = server_from_args(args, args.port)
+    for name, url in server_urls(server).items():
+        print(f"export {name}='{url}'")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"Served {server.RequestHandlerClass.stats}")
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""Generators of realistic synthetic cases for the benchmarks in this directory.
+
+Names are built from common Thai syllables and usually carry an
+honorific, dates are written the way the sources write them (Thai month
+names, Buddhist-era years), and detail texts vary in length the way the
+site's do, from a line to several paragraphs. Everything is derived from
+a seed, so a catalog can be regenerated exactly.
+"""
+import random
+
+SYLLABLES = [
+    'สม', 'ใจ', 'ศรี', 'สุข', 'ประ', 'เสริฐ', 'วัฒ', 'นา', 'กิต', 'ติ', 'พง', 'ษ์',
+    'ชัย', 'มงคล', 'อรุณ', 'รัตน์', 'ทอง', 'คำ', 'แก้ว', 'บุญ', 'มา', 'จันทร์',
+    'เพ็ญ', 'นภา', 'ธนา', 'กร', 'ภู', 'มิ', 'วิ', 'ไล', 'พร', 'ทิพ', 'ย์', 'สุ',
+    'ดา', 'รุ่ง', 'เรือง', 'อ่อน', 'น้อย', 'ใหญ่', 'เจริญ', 'ผล', 'ยิ่ง', 'ยศ'
+]
+HONORIFICS = ['นาย', 'นาง', 'นางสาว', 'ด.ช.', 'ด.ญ.', 'เด็กชาย', 'เด็กหญิง']
+PROVINCES = ['กรุงเทพมหานคร', 'เชียงใหม่', 'ขอนแก่น', 'ชลบุรี', 'สงขลา', 'นครราชสีมา', 'ภูเก็ต', 'อุดรธานี']
+THAI_MONTHS = [
+    'มกราคม', 'กุมภาพันธ์', 'มีนาคม', 'เมษายน', 'พฤษภาคม', 'มิถุนายน',
+    'กรกฎาคม', 'สิงหาคม', 'กันยายน', 'ตุลาคม', 'พฤศจิกายน', 'ธันวาคม'
+]
+LETTERS = 'กขคงจฉชซญดตถทธนบปผพฟภมยรลวศสหอฮ'
+
+# Sentences detail texts are assembled from
+DETAIL_SENTENCES = [
+    'ผิวขาวเหลือง รูปร่างสันทัด ผมสั้นสีดำ.',
+    'ก่อนหายตัวสวมเสื้อยืดสีขาว กางเกงยีนส์ขายาว.',
+    'มีไฝที่แก้มซ้าย และรอยแผลเป็นที่แขนขวา.',
+    'ออกจากบ้านไปโรงเรียนตามปกติแต่ไม่กลับมา.',
+    'พูดไม่ชัด มีอาการหลงลืม ญาติติดตามหาแล้วแต่ไม่พบ.',
+    'ครั้งสุดท้ายมีผู้พบเห็นบริเวณตลาดใกล้บ้าน.',
+    'หากพบเห็นกรุณาแจ้งมูลนิธิกระจกเงา หรือสถานีตำรวจใกล้บ้าน.',
+    'โทรศัพท์มือถือปิดเครื่องตั้งแต่วันที่หายตัว.'
+]
+
+def make_name(rng):
+    first = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+    last = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+    return f"{first} {last}"
+
+def make_variant(rng, name):
+    """Respell a name the way another source might."""
+    variant = name
+    change = rng.randrange(4)
+    if change == 0:
+        variant = variant.replace(' ', '  ')
+    elif change == 1:
+        variant = rng.choice(HONORIFICS) + variant
+    elif change == 2:
+        variant = ''.join(c for c in variant if c not in '่้๊๋์') or variant
+    else:
+        i = rng.randrange(len(variant))
+        variant = variant[:i] + rng.choice(LETTERS) + variant[i + 1:]
+    return variant
+
+def make_description(rng, age, date, province):
+    """Description as get_thaimissing's build_description lays one out."""
+    parts = []
+    if rng.random() < 0.8:
+        parts.append(f"อายุขณะหายตัว: {age} ปี")
+    if rng.random() < 0.7:
+        parts.append(f"วันที่หายตัว: {date}")
+    if rng.random() < 0.7:
+        parts.append(f"สถานที่หายตัว: จ.{province}")
+    return '\n'.join(parts)
+
+def make_thai_date(rng):
+    """A date between 2015 and 2024 as the sources write it, e.g. '12 มีนาคม 2566'."""
+    return f"{rng.randint(1, 28)} {rng.choice(THAI_MONTHS)} {rng.randint(2015, 2024) + 543}"
+
+def make_detail(rng):
+    """A detail text of one line to several paragraphs; most are short."""
+    sentences = min(int(rng.lognormvariate(1.2, 0.8)) + 1, 40)
+    return ' '.join(rng.choice(DETAIL_SENTENCES) for _ in range(sentences))
+
+def unique_names(rng, count):
+    """count distinct names, most with an honorific in front."""
+    names = set()
+    result = []
+    while len(result) < count:
+        name = make_name(rng)
+        if rng.random() < 0.7:
+            name = rng.choice(HONORIFICS) + name
+        if name not in names:
+            names.add(name)
+            result.append(name)
+    return result
+
+def backtohome_items(count, seed=1, first_id=1):
+    """Return count crawled backtohome listings with their details fetched."""
+    rng = random.Random(seed)
+    return [{
+        'id': str(person_id),
+        'name': name,
+        'age': str(rng.randint(3, 90)),
+        'detail_link': f"https://web.backtohome.org/net%20missing_detail.php?id={person_id}",
+        'image_url': f"images_missing/{person_id}.jpg",
+        'detail': f"วันที่หายตัว: {make_thai_date(rng)} {make_detail(rng)}"
+    } for person_id, name in enumerate(unique_names(rng, count), first_id)]
+
+def thaimissing_records(count, seed=1):
+    """Return count records as the thaimissing API sends them."""
+    rng = random.Random(seed)
+    records = []
+    for i, name in enumerate(unique_names(rng, count)):
+        age = rng.randint(3, 90)
+        records.append({
+            'fullName': name,
+            'nationality': rng.choice(['ไทย', 'ไทย', 'ไทย', 'เมียนมา', None]),
+            'ageMissing': f"{age} ปี",
+            'ageCurrent': f"{age + rng.randint(0, 6)} ปี",
+            'ageInform': rng.choice([f"{rng.randint(25, 70)} ปี", None]),
+            'sex': rng.choice(['ชาย', 'หญิง']),
+            'missingDate': make_thai_date(rng),
+            'missingTime': rng.choice([f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d} น.", None]),
+            'missingLocation': f"จ.{rng.choice(PROVINCES)}",
+            'informLocation': rng.choice([f"สภ.เมือง{rng.choice(PROVINCES)}", None]),
+            'image': f"https://api.thaimissing.go.th/files/images/{i}.jpg",
+            'url': f"https://www.thaimissing.go.th/missing-person/{i}"
+        })
+    return records
+
+def evolve(items, change_rate, seed=1):
+    """Return the next crawl of a backtohome catalog.
+
+    A change_rate share of the listings get a new detail text, half that
+    share disappear and as many new listings appear, as between two runs
+    on the live site. The input items are not modified.
+    """
+    rng = random.Random(seed)
+    changes = int(len(items) * change_rate)
+    churn = changes // 2
+    kept = [dict(item) for item in items]
+    rng.shuffle(kept)
+    kept = kept[churn:]
+    for item in kept[:changes]:
+        item['detail'] = f"{item['detail']} {make_detail(rng)}"
+    next_id = max((int(item['id']) for item in items), default=0) + 1
+    known = {item['name'] for item in kept}
+    fresh = [item for item in backtohome_items(churn * 2, seed + 1, next_id) if item['name'] not in known][:churn]
+    return kept + fresh
+
+def duplicate_people(count, duplicate_rate, seed=1):
+    """Return (records, true_pairs) for entity resolution.
+
+    records are (case_id, platform, name, description) tuples, count in
+    total. A duplicate_rate share of people are filed a second time by the
+    other platform under a spelling variant and a slightly different
+    description; true_pairs holds their (case_id, other_case_id) pairs.
+    """
+    rng = random.Random(seed)
+    records = []
+    true_pairs = set()
+    case_id = 0
+    while len(records) < count:
+        name = make_name(rng)
+        age = rng.randint(3, 90)
+        date = f"{rng.randint(2015, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+        province = rng.choice(PROVINCES)
+        case_id += 1
+        first_id = case_id
+        records.append((first_id, 'backtohome', name, make_description(rng, age, date, province)))
+        if rng.random() < duplicate_rate and len(records) < count:
+            case_id += 1
+            records.append((
+                case_id, 'thaimissing', make_variant(rng, name),
+                make_description(rng, age + rng.randint(0, 1), date, province)
+            ))
+            true_pairs.add((first_id, case_id))
+    return records, true_pairs
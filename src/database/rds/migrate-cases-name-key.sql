@@ -0,0 +1,43 @@
+-- Adds cases.name_key to an existing database. The ingestion lambdas
+-- find and create cases through this unique key. Cases created twice
+-- under the same name before the key existed are merged into the one
+-- with the lowest id first.
+
+ALTER TABLE `cases` ADD COLUMN `name_key` varchar(255) COLLATE utf8mb4_bin AFTER `name`;
+
+CREATE TEMPORARY TABLE `case_merge` AS
+SELECT c.id, k.keep_id
+FROM `cases` c
+JOIN (
+  SELECT `name` COLLATE utf8mb4_bin AS `name`, MIN(id) AS keep_id
+  FROM `cases`
+  WHERE `name` IS NOT NULL
+  GROUP BY `name` COLLATE utf8mb4_bin
+) k ON k.`name` = c.`name` COLLATE utf8mb4_bin
+WHERE c.id <> k.keep_id;
+
+-- Where both cases have a row for the same platform, the kept case's row wins
+DELETE ci FROM `case_information` ci
+JOIN `case_merge` m ON m.id = ci.case_id
+JOIN `case_information` kept ON kept.case_id = m.keep_id AND kept.platform = ci.platform;
+
+UPDATE `case_information` ci
+JOIN `case_merge` m ON m.id = ci.case_id
+SET ci.case_id = m.keep_id;
+
+DELETE p FROM `posted_case` p
+JOIN `case_merge` m ON m.id = p.case_id
+JOIN `posted_case` kept ON kept.case_id = m.keep_id AND kept.social_platform = p.social_platform;
+
+UPDATE `posted_case` p
+JOIN `case_merge` m ON m.id = p.case_id
+SET p.case_id = m.keep_id;
+
+DELETE c FROM `cases` c
+JOIN `case_merge` m ON m.id = c.id;
+
+UPDATE `cases` SET `name_key` = `name` WHERE `name` IS NOT NULL;
+
+ALTER TABLE `cases` ADD UNIQUE (`name_key`);
+
+DROP TEMPORARY TABLE `case_merge`;
@@ -1,6 +1,7 @@
 CREATE TABLE `cases` (
   `id` integer PRIMARY KEY AUTO_INCREMENT,
   `name` varchar(255),
+  `name_key` varchar(255) COLLATE utf8mb4_bin UNIQUE,
   `created_at` timestamp
 );
 
@@ -10,6 +11,7 @@ CREATE TABLE `case_information` (
   `picture` varchar(255),
   `url` varchar(255),
   `description` varchar(5000),
+  `picture_digest` char(64) COMMENT 'SHA-256 of the mirrored picture',
   `created_at` timestamp,
   PRIMARY KEY (`case_id`, `platform`)
 );
@@ -17,11 +19,83 @@ CREATE TABLE `case_information` (
 CREATE TABLE `posted_case` (
   `case_id` integer,
   `social_platform` varchar(255),
-  `posted_at` timestamp,
-  `url` varchar(255),
+  `posted_at` timestamp NULL COMMENT 'when the post was claimed, then when it went out; NULL once a failed post is released',
+  `url` varchar(255) COMMENT 'NULL until the post went out',
+  `claim` char(32) COMMENT 'token of the publisher batch that claimed the post',
   PRIMARY KEY (`case_id`, `social_platform`)
 );
 
+CREATE TABLE `publish_cursor` (
+  `social_platform` varchar(255) PRIMARY KEY,
+  `seq` bigint COMMENT 'last case_outbox seq read for this sink'
+);
+
+CREATE TABLE `image_mirror` (
+  `url` varchar(255) PRIMARY KEY,
+  `digest` char(64),
+  `content_type` varchar(255),
+  `size` integer,
+  `dhash` bigint unsigned COMMENT '64-bit difference hash',
+  `error` varchar(255) COMMENT 'why the last download failed; digest is NULL then',
+  `failures` integer DEFAULT 0,
+  `fetched_at` timestamp DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE `photo_match` (
+  `case_id` integer,
+  `other_case_id` integer,
+  `distance` integer,
+  PRIMARY KEY (`case_id`, `other_case_id`)
+);
+
+CREATE TABLE `case_link` (
+  `case_id` integer,
+  `linked_case_id` integer,
+  `score` decimal(5,3),
+  PRIMARY KEY (`case_id`, `linked_case_id`)
+);
+
+CREATE TABLE `case_outbox` (
+  `seq` bigint PRIMARY KEY AUTO_INCREMENT,
+  `case_id` integer,
+  `platform` varchar(255),
+  `change_type` varchar(16) COMMENT 'inserted, updated or deactivated',
+  `created_at` timestamp DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE `crawl_shard` (
+  `run_id` varchar(64),
+  `platform` varchar(255),
+  `shard` integer,
+  `item_count` integer,
+  `finished_at` timestamp,
+  PRIMARY KEY (`run_id`, `platform`, `shard`)
+);
+
+CREATE TABLE `crawl_seen` (
+  `run_id` varchar(64),
+  `platform` varchar(255),
+  `case_id` integer,
+  PRIMARY KEY (`run_id`, `platform`, `case_id`)
+);
+
+CREATE TABLE `crawl_checkpoint` (
+  `platform` varchar(255) PRIMARY KEY,
+  `generation` varchar(64),
+  `state` longtext,
+  `updated_at` timestamp
+);
+
+CREATE INDEX `case_outbox_change_type_seq` ON `case_outbox` (`change_type`, `seq`);
+
+CREATE INDEX `case_outbox_platform_seq` ON `case_outbox` (`platform`, `seq`);
+
+CREATE INDEX `posted_case_pending` ON `posted_case` (`social_platform`, `url`);
+
+CREATE INDEX `posted_case_claim` ON `posted_case` (`claim`);
+
+CREATE INDEX `case_information_platform_created_at` ON `case_information` (`platform`, `created_at`);
+
 ALTER TABLE `case_information` ADD CONSTRAINT `case_information` FOREIGN KEY (`case_id`) REFERENCES `cases` (`id`);
 
 ALTER TABLE `posted_case` ADD CONSTRAINT `post` FOREIGN KEY (`case_id`) REFERENCES `cases` (`id`);
\ No newline at end of file
@@ -1,20 +1,35 @@
 import time
 import os
+import io
+import codecs
 import requests
 from bs4 import BeautifulSoup
 import json
+import hashlib
+import bisect
+import mmap
+import struct
 import re
+import uuid
+import threading
+import queue
+import multiprocessing
+from html.parser import HTMLParser
 from urllib.parse import urljoin, parse_qs, urlparse
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import deque
 import pymysql
+from pymysql.constants import CLIENT
 from datetime import datetime
 from dotenv import load_dotenv
-
-BASE_URL = "https://web.backtohome.org/net%20missing.php?width=1920&height=1080&pages="
+from contextlib import contextmanager, nullcontext
 
 # Load environment variables
 load_dotenv()
 
+# Listing page URL, page number appended; point it at src/bench/replay_server.py for load tests
+BASE_URL = os.getenv('BACKTOHOME_BASE_URL', "https://web.backtohome.org/net%20missing.php?width=1920&height=1080&pages=")
+
 # Database configuration
 DB_CONFIG = {
     'host': os.getenv('DB_HOST', 'localhost'),
@@ -24,58 +39,732 @@ DB_CONFIG = {
     'database': os.getenv('DB_NAME', 'missing_persons_db')
 }
 
+# Prefer lxml for HTML parsing when it is installed; html.parser is always available
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+HTML_PARSER = os.getenv('HTML_PARSER', HTML_PARSER)
+
+# Processes used for HTML parsing; below 2, pages are parsed in the fetching threads
+PARSE_WORKERS = int(os.getenv('PARSE_WORKERS', os.cpu_count() or 1))
+parse_pool = None
+
+# Parse pages while they download instead of buffering the whole body first
+STREAM_PARSE = os.getenv('STREAM_PARSE', '').lower() in ('1', 'true', 'yes')
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 16384))
+
+# Listing pages handled by each worker invocation in sharded mode
+SHARD_PAGES = int(os.getenv('SHARD_PAGES', 5))
+
+# Seconds before the Lambda deadline to stop scheduling detail fetches (leaves
+# room for the DB sync) and to stop writing rows and commit
+DEADLINE_MARGIN = float(os.getenv('DEADLINE_MARGIN', 60))
+COMMIT_MARGIN = float(os.getenv('COMMIT_MARGIN', 10))
+DETAIL_WORKERS = 10
+
+# Crawl checkpoint: 'file' keeps it under /tmp, 'mysql' in crawl_checkpoint
+CHECKPOINT_STORE = os.getenv('CHECKPOINT_STORE', 'file')
+CHECKPOINT_PATH = os.getenv('CHECKPOINT_PATH', '/tmp/backtohome_checkpoint.json')
+CHECKPOINT_TTL = float(os.getenv('CHECKPOINT_TTL', 6 * 3600))
+CHECKPOINT_INTERVAL = float(os.getenv('CHECKPOINT_INTERVAL', 15))
+
+# MySQL advisory lock that keeps overlapping scheduled runs apart
+RUN_LOCK_NAME = 'missing-alert-hub:backtohome'
+
+# Opt-in per-stage profiling: comma-separated 'cprofile', 'tracemalloc' and/or 'sql'.
+# An event's 'profile' key overrides it for one run; see StageProfiler
+PROFILE = os.getenv('PROFILE', '')
+PROFILE_PATH = os.getenv('PROFILE_PATH', '/tmp/profiles')
+PROFILE_BUCKET = os.getenv('PROFILE_BUCKET')
+PROFILE_TOP = int(os.getenv('PROFILE_TOP', 15))
+PROFILER = None
+NO_PROFILE = nullcontext()
+# Statement stats per SQL template while profiling with 'sql', see ProfilingCursor
+SQL_STATS = {}
+SQL_STATS_LOCK = threading.Lock()
+# Slowest templates whose plans the SQL summary includes; 0 skips EXPLAIN
+SQL_EXPLAIN_TOP = int(os.getenv('SQL_EXPLAIN_TOP', 0))
+# cursorclass of every connection; start_profiling swaps in ProfilingCursor
+DB_CURSOR = pymysql.cursors.DictCursor
+
+# Rows written per transaction during the DB sync
+DB_BATCH_SIZE = int(os.getenv('DB_BATCH_SIZE', 200))
+
+# Connections that write a sync's rows in parallel, see write_partitioned
+DB_WRITERS = int(os.getenv('DB_WRITERS', 1))
+
+# 'bulk' applies full sweeps through a staging table, 'batched' row by row
+SYNC_MODE = os.getenv('SYNC_MODE', 'bulk')
+
+# Last synced {external_id: [content_hash, name]}; full sweeps run without it
+SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH', '/tmp/backtohome_snapshot.json')
+SNAPSHOT_TTL = float(os.getenv('SNAPSHOT_TTL', 24 * 3600))
+
+# Warm-container cache of the stored cases, see CaseIndex
+CASE_CACHE_PATH = os.getenv('CASE_CACHE_PATH', '/tmp/backtohome_cases.bin')
+CASE_CACHE_HEADER = struct.Struct('<4sqqq')      # magic and the probe_case_information values
+CASE_CACHE_RECORD = struct.Struct('<q16s16s')    # case id, name digest, content digest
+
+# Elements that never have an end tag
+VOID_ELEMENTS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr'
+])
+
 session = requests.Session()
 session.headers.update({
     'User-Agent': 'Mozilla/5.0 (compatible; MissingScraper/1.0; +https://yourdomain.com)'
 })
 
+def parse_worker(conn):
+    """Loop of a parse process: receive (parse, content), send back (ok, result)."""
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        parse, content = task
+        try:
+            conn.send((True, parse(content)))
+        except Exception as e:
+            conn.send((False, e))
+
+class PipeParsePool:
+    """Parse processes fed over multiprocessing.Pipe.
+    
+    ProcessPoolExecutor needs semaphores in /dev/shm, which AWS Lambda
+    does not have; processes and pipes work there. Each fetch thread
+    borrows an idle worker for one page and waits for its result.
+    
+    A worker that dies mid-page, e.g. killed for memory, is dropped rather
+    than replaced, as forking once fetch threads run is unsafe. Once every
+    worker is gone, pages are parsed in the calling thread.
+    """
+    
+    def __init__(self, workers):
+        self._idle = queue.Queue()
+        self._workers = {}
+        self._lock = threading.Lock()
+        for _ in range(workers):
+            conn, child_conn = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=parse_worker, args=(child_conn,), daemon=True)
+            process.start()
+            child_conn.close()
+            self._workers[conn] = process
+            self._idle.put(conn)
+    
+    def run(self, parse, content):
+        conn = self._idle.get()
+        if conn is None:
+            # Every worker died; pass the marker on to the other waiters
+            self._idle.put(None)
+            return parse(content)
+        try:
+            conn.send((parse, content))
+            ok, result = conn.recv()
+        except (EOFError, OSError):
+            self._drop(conn)
+            raise
+        self._idle.put(conn)
+        if not ok:
+            raise result
+        return result
+    
+    def _drop(self, conn):
+        with self._lock:
+            process = self._workers.pop(conn)
+            remaining = len(self._workers)
+        process.terminate()
+        process.join()
+        conn.close()
+        print(f"Parse process {process.pid} died with exit code {process.exitcode}, {remaining} left")
+        if not remaining:
+            self._idle.put(None)
+    
+    def shutdown(self):
+        with self._lock:
+            workers = list(self._workers.items())
+            self._workers.clear()
+        for conn, process in workers:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            process.join()
+            conn.close()
+
+def start_parse_pool():
+    """Start the processes that parse fetched HTML off the GIL."""
+    global parse_pool
+    if PARSE_WORKERS < 2:
+        return None
+    try:
+        # Start every worker now, before any fetch threads exist
+        parse_pool = PipeParsePool(PARSE_WORKERS)
+    except OSError as e:
+        print(f"Parse processes unavailable, parsing in fetch threads: {e}")
+        parse_pool = None
+    return parse_pool
+
+def stop_parse_pool():
+    global parse_pool
+    if parse_pool:
+        parse_pool.shutdown()
+        parse_pool = None
+
+def run_parser(parse, content):
+    """Parse raw page bytes in the parse processes when available, else inline."""
+    if parse_pool:
+        return parse_pool.run(parse, content)
+    return parse(content)
+
+def acquire_run_lock():
+    """Take this source's advisory lock without waiting for it.
+    
+    Returns the connection holding the lock, or None when another run
+    holds it. GET_LOCK belongs to the session, so the lock is held until
+    release_run_lock() or until the connection drops, e.g. when the
+    Lambda is killed mid-run.
+    """
+    conn = pymysql.connect(
+        **DB_CONFIG,
+        cursorclass=DB_CURSOR
+    )
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT GET_LOCK(%s, 0) AS acquired", (RUN_LOCK_NAME,))
+            acquired = cur.fetchone()['acquired'] == 1
+    except Exception:
+        conn.close()
+        raise
+    if not acquired:
+        conn.close()
+        return None
+    return conn
+
+def release_run_lock(conn):
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (RUN_LOCK_NAME,))
+    finally:
+        conn.close()
+
+def deadline_from_context(context):
+    """Return the invocation's deadline on the time.monotonic() clock, or None."""
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return None
+    return time.monotonic() + context.get_remaining_time_in_millis() / 1000
+
+def past_deadline(deadline, margin):
+    return deadline is not None and time.monotonic() > deadline - margin
+
+class StageProfiler:
+    """Profiles each pipeline stage run under stage(name).
+    
+    tools holds 'cprofile' and/or 'tracemalloc'. After every stage a
+    top-PROFILE_TOP summary is printed and the full dumps (a pstats file
+    and the top allocations) are written under PROFILE_PATH, and uploaded
+    to PROFILE_BUCKET when it is set. cProfile only sees the thread that
+    runs the stage, so time spent in worker threads and processes shows up
+    as waits.
+    """
+    
+    def __init__(self, tools):
+        # Imported here so runs without profiling never load them
+        import cProfile
+        import tracemalloc
+        self.cProfile = cProfile
+        self.tracemalloc = tracemalloc
+        self.tools = tools
+        self.run_id = f"backtohome-{datetime.now():%Y%m%d%H%M%S}-{os.getpid()}"
+        self.path = os.path.join(PROFILE_PATH, self.run_id)
+        os.makedirs(self.path, exist_ok=True)
+    
+    @contextmanager
+    def stage(self, name):
+        profile = self.cProfile.Profile() if 'cprofile' in self.tools else None
+        tracing = 'tracemalloc' in self.tools and not self.tracemalloc.is_tracing()
+        if tracing:
+            self.tracemalloc.start()
+        start = time.perf_counter()
+        if profile:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile:
+                profile.disable()
+            elapsed = time.perf_counter() - start
+            snapshot = peak = None
+            if tracing:
+                snapshot = self.tracemalloc.take_snapshot()
+                peak = self.tracemalloc.get_traced_memory()[1]
+                self.tracemalloc.stop()
+            print(f"[profile] stage {name}: {elapsed:.2f}s")
+            self.report_profile(name, profile)
+            self.report_allocations(name, snapshot, peak)
+    
+    def report_profile(self, name, profile):
+        if profile is None:
+            return
+        import pstats
+        summary = io.StringIO()
+        stats = pstats.Stats(profile, stream=summary)
+        stats.sort_stats('cumulative').print_stats(PROFILE_TOP)
+        print(summary.getvalue().rstrip())
+        dump_path = os.path.join(self.path, f"{name}.pstats")
+        stats.dump_stats(dump_path)
+        self.upload(dump_path)
+    
+    def report_allocations(self, name, snapshot, peak):
+        if snapshot is None:
+            return
+        snapshot = snapshot.filter_traces([
+            self.tracemalloc.Filter(False, self.tracemalloc.__file__),
+            self.tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ])
+        top = snapshot.statistics('lineno')
+        print(f"[profile] stage {name}: peak traced memory {peak / 1024 / 1024:.1f} MiB, top allocations:")
+        for stat in top[:PROFILE_TOP]:
+            print(f"  {stat}")
+        dump_path = os.path.join(self.path, f"{name}.allocations.txt")
+        with open(dump_path, 'w') as f:
+            f.write(f"peak {peak}\n")
+            f.writelines(f"{stat}\n" for stat in top[:PROFILE_TOP * 10])
+        self.upload(dump_path)
+    
+    def upload(self, path):
+        if not PROFILE_BUCKET:
+            return
+        # boto3 ships with the Lambda Python runtime
+        import boto3
+        key = f"profiles/{self.run_id}/{os.path.basename(path)}"
+        boto3.client('s3').upload_file(path, PROFILE_BUCKET, key)
+
+def start_profiling(event=None):
+    """Turn on profiling for this run from the event's 'profile' key or PROFILE."""
+    global PROFILER, DB_CURSOR
+    tools = (event or {}).get('profile', PROFILE)
+    if isinstance(tools, str):
+        tools = tools.split(',')
+    tools = {tool.strip() for tool in tools if tool and tool.strip()}
+    unknown = tools - {'cprofile', 'tracemalloc', 'sql'}
+    if unknown:
+        print(f"Ignoring unknown profiling tools: {', '.join(sorted(unknown))}")
+    tools -= unknown
+    PROFILER = StageProfiler(tools) if tools else None
+    DB_CURSOR = ProfilingCursor if 'sql' in tools else pymysql.cursors.DictCursor
+    SQL_STATS.clear()
+    if PROFILER:
+        print(f"Profiling stages with {', '.join(sorted(tools))} into {PROFILER.path}")
+
+def stop_profiling():
+    """Print the SQL summary when profiling 'sql', and turn profiling off."""
+    global PROFILER, DB_CURSOR
+    if DB_CURSOR is ProfilingCursor:
+        report_sql_profile()
+    PROFILER = None
+    DB_CURSOR = pymysql.cursors.DictCursor
+
+def profile_stage(name):
+    """Context manager profiling a pipeline stage; does nothing unless profiling is on."""
+    return PROFILER.stage(name) if PROFILER else NO_PROFILE
+
+SQL_LITERAL = re.compile(r"(?:_binary)?'(?:[^'\\]|\\.)*'|\b\d+(?:\.\d+)?(?:e[+-]?\d+)?\b|\bNULL\b", re.I)
+SQL_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+SQL_REPEATED_LISTS = re.compile(r"\(\?, \.\.\.\)(?:\s*,\s*\(\?, \.\.\.\))+")
+SQL_STATEMENT = re.compile(r"(?:'(?:[^'\\]|\\.)*'|[^;'])+")
+
+def sql_template(query):
+    """Reduce a statement to its shape: literals become ?, value lists and repeats collapse."""
+    template = SQL_LITERAL.sub('?', query)
+    template = SQL_VALUE_LIST.sub('(?, ...)', template)
+    template = SQL_REPEATED_LISTS.sub('(?, ...), ...', template)
+    statements = [' '.join(statement.split()) for statement in template.split(';')]
+    # A multi-statement batch is the same template however many rows it carries
+    return '; '.join(dict.fromkeys(statement for statement in statements if statement))
+
+def record_sql(query, elapsed, rows, sent):
+    template = sql_template(query)
+    with SQL_STATS_LOCK:
+        stats = SQL_STATS.get(template)
+        if stats is None:
+            stats = SQL_STATS[template] = {
+                'count': 0, 'total': 0.0, 'latencies': [], 'rows': 0, 'bytes': 0, 'slowest': 0.0, 'sample': query
+            }
+        stats['count'] += 1
+        stats['total'] += elapsed
+        stats['latencies'].append(elapsed)
+        stats['rows'] += max(rows, 0)
+        stats['bytes'] += sent
+        if elapsed >= stats['slowest']:
+            stats['slowest'] = elapsed
+            stats['sample'] = query
+
+class ProfilingCursor(pymysql.cursors.DictCursor):
+    """DictCursor that records every statement it sends in SQL_STATS.
+    
+    Installed as the connections' cursorclass while profiling with 'sql'.
+    Hooks _query, which execute, executemany and callproc all go through,
+    so each round trip is timed once with the SQL actually sent.
+    """
+    
+    def _query(self, q):
+        start = time.perf_counter()
+        try:
+            return super()._query(q)
+        finally:
+            elapsed = time.perf_counter() - start
+            encoding = self._get_db().encoding
+            # executemany's multi-row rewrite sends bytes
+            if isinstance(q, (bytes, bytearray)):
+                record_sql(q.decode(encoding, 'replace'), elapsed, self.rowcount, len(q))
+            else:
+                record_sql(q, elapsed, self.rowcount, len(q.encode(encoding)))
+
+def report_sql_profile():
+    """Print the statement templates ranked by total time, with EXPLAIN for the slowest."""
+    with SQL_STATS_LOCK:
+        ranked = sorted(SQL_STATS.items(), key=lambda entry: entry[1]['total'], reverse=True)
+    if not ranked:
+        print("[profile] No SQL statements recorded")
+        return
+    
+    print(f"[profile] {sum(stats['count'] for _, stats in ranked)} SQL statements in "
+          f"{sum(stats['total'] for _, stats in ranked):.2f}s across {len(ranked)} templates:")
+    print(f"{'count':>7} {'total s':>9} {'mean ms':>9} {'p95 ms':>9} {'rows':>9} {'bytes':>11}  template")
+    for template, stats in ranked[:PROFILE_TOP]:
+        latencies = sorted(stats['latencies'])
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"{stats['count']:>7} {stats['total']:>9.3f} {stats['total'] / stats['count'] * 1000:>9.2f} "
+              f"{p95 * 1000:>9.2f} {stats['rows']:>9} {stats['bytes']:>11}  {template[:200]}")
+    
+    if SQL_EXPLAIN_TOP:
+        explain_statements([(template, stats['sample']) for template, stats in ranked[:SQL_EXPLAIN_TOP]])
+
+def explain_statements(statements):
+    """Print the plan of the slowest sample of each (template, query).
+    
+    Only the first statement of a multi-statement batch is explained, and
+    statements on temporary tables of the profiled run cannot be.
+    """
+    conn = pymysql.connect(
+        **DB_CONFIG,
+        cursorclass=pymysql.cursors.DictCursor
+    )
+    
+    try:
+        with conn.cursor() as cur:
+            for template, query in statements:
+                statement = next((s.strip() for s in SQL_STATEMENT.findall(query) if s.strip()), '')
+                print(f"[profile] EXPLAIN {template[:200]}")
+                if statement.split(None, 1)[0].upper() not in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE'):
+                    print("  not explainable")
+                    continue
+                try:
+                    cur.execute(f"EXPLAIN {statement}")
+                except pymysql.MySQLError as e:
+                    print(f"  EXPLAIN failed: {e}")
+                    continue
+                for row in cur.fetchall():
+                    print(f"  {row.get('table')}: type={row.get('type')} key={row.get('key')} "
+                          f"rows={row.get('rows')} filtered={row.get('filtered')} extra={row.get('Extra')}")
+    finally:
+        conn.close()
+
 def get_total_pages():
     """Determine the total number of pages to scrape."""
     resp = session.get(f"{BASE_URL}1#content", timeout=10)
-    soup = BeautifulSoup(resp.text, 'html.parser')
+    resp.raise_for_status()
+    soup = BeautifulSoup(resp.text, HTML_PARSER)
     page_numbers = {
         int(link['href'].split('pages=')[1].split('#')[0])
         for link in soup.select('a[href*="pages="]')
     }
     return max(page_numbers or {1})
 
-def fetch_and_process_page(page):
-    """Fetch a page and process all its listings."""
-    url = f"{BASE_URL}{page}#content"
-    resp = session.get(url, timeout=10)
-    soup = BeautifulSoup(resp.content, 'html.parser')
+def parse_listing_page(content, parser=None):
+    """Extract all listings from the HTML of a listing page."""
+    soup = BeautifulSoup(content, parser or HTML_PARSER)
     
     items = []
     # Process all listings on the page
     for img_div, detail_div in zip(soup.select('.miss_img'), soup.select('.miss_detail')):
-        # Extract link and ID
+        # Extract link
         link_tag = img_div.find('a', href=True)
-        detail_link = urljoin('https://web.backtohome.org/', link_tag['href']) if link_tag else None
-        person_id = parse_qs(urlparse(detail_link).query).get('id', [None])[0] if detail_link else None
         
         # Extract image URL
         image_url = next(
             (img['src'] for img in img_div.find_all('img') 
-             if not any(x in img['src'] for x in ['small_missing', 'small_childmissing'])),
+             if not is_status_icon(img['src'])),
             None
         )
         
         # Extract name and age
         center_texts = [d.get_text(strip=True) for d in detail_div.find_all('div', align='center')]
-        name = center_texts[0] if center_texts else None
-        age = center_texts[1].strip('()') if len(center_texts) > 1 else None
         
-        items.append({
-            'id': person_id,
-            'name': name,
-            'age': age,
-            'detail_link': detail_link,
-            'image_url': image_url
-        })
+        items.append(make_listing_item(link_tag['href'] if link_tag else None, image_url, center_texts))
+    
+    return items
+
+def is_status_icon(src):
+    """Whether an image is the missing/child-missing badge rather than a photo."""
+    return any(x in src for x in ['small_missing', 'small_childmissing'])
+
+def make_listing_item(href, image_url, center_texts):
+    """Build a listing record from the raw values extracted from its markup."""
+    # Extract link and ID
+    detail_link = urljoin(BASE_URL, href) if href is not None else None
+    person_id = parse_qs(urlparse(detail_link).query).get('id', [None])[0] if detail_link else None
+    
+    # Extract name and age
+    name = center_texts[0] if center_texts else None
+    age = center_texts[1].strip('()') if len(center_texts) > 1 else None
+    
+    return {
+        'id': person_id,
+        'name': name,
+        'age': age,
+        'detail_link': detail_link,
+        'image_url': image_url
+    }
+
+def fetch_and_process_page(page):
+    """Fetch a page and process all its listings.
+    
+    An error response raises instead of reading as a page without
+    listings, so the run stops before the page is checkpointed or its
+    cases are deactivated.
+    """
+    url = f"{BASE_URL}{page}#content"
+    if STREAM_PARSE:
+        items = list(stream_page(url, ListingStreamParser()))
+    else:
+        resp = session.get(url, timeout=10)
+        resp.raise_for_status()
+        items = run_parser(parse_listing_page, resp.content)
     
     print(f"Page {page}: found {len(items)} listings")
     return items
 
+def parse_detail_page(content, parser=None):
+    """Extract the cleaned description text from the HTML of a detail page."""
+    soup = BeautifulSoup(content, parser or HTML_PARSER)
+    
+    target = soup.select_one('#content > article > div')
+    if not target or len(target.find_all('div', recursive=False)) < 2:
+        return None
+    
+    text = target.find_all('div', recursive=False)[1].get_text(' ', strip=True)
+    return clean_detail_text(text)
+
+def clean_detail_text(text):
+    """Normalize whitespace and sentence breaks in a detail description."""
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'([.!?])\s+', r'\1\n\n', text)
+    text = re.sub(r'\*\*\s*', '**\n\n', text)
+    text = re.sub(r'\n\s*\n', ' ', text)
+    return text
+
+class StreamExtractor(HTMLParser):
+    """Incremental HTML parser that tracks open elements and whole text nodes.
+    
+    Subclasses implement start_element/end_element/handle_text, append
+    finished records to self.records and set self.done once they have
+    everything they need from the page.
+    """
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []  # open elements as (tag, attrs)
+        self.records = []
+        self.done = False
+        self._text = []
+    
+    def start_element(self, tag, attrs):
+        pass
+    
+    def end_element(self, tag, depth):
+        pass
+    
+    def handle_text(self, text):
+        pass
+    
+    def pop_records(self):
+        records, self.records = self.records, []
+        return records
+    
+    def flush_text(self):
+        # Text can arrive split across feed() calls; deliver each node whole
+        if self._text:
+            text = ''.join(self._text)
+            self._text = []
+            if not (self.stack and self.stack[-1][0] in ('script', 'style')):
+                self.handle_text(text)
+    
+    def handle_starttag(self, tag, attrs):
+        self.flush_text()
+        attrs = {name: value if value is not None else '' for name, value in attrs}
+        self.start_element(tag, attrs)
+        if tag not in VOID_ELEMENTS:
+            self.stack.append((tag, attrs))
+    
+    def handle_endtag(self, tag):
+        self.flush_text()
+        # Like BeautifulSoup, close any unclosed children and ignore stray end tags
+        if not any(open_tag == tag for open_tag, _ in self.stack):
+            return
+        while self.stack:
+            open_tag, _ = self.stack.pop()
+            self.end_element(open_tag, len(self.stack))
+            if open_tag == tag:
+                break
+    
+    def handle_data(self, data):
+        self._text.append(data)
+    
+    def handle_comment(self, data):
+        self.flush_text()
+    
+    def close(self):
+        super().close()
+        self.flush_text()
+
+class ListingStreamParser(StreamExtractor):
+    """Streaming equivalent of parse_listing_page."""
+    
+    def __init__(self):
+        super().__init__()
+        self._images = []   # (href, image_url) of closed .miss_img blocks
+        self._details = []  # center texts of closed .miss_detail blocks
+        self._block = None  # (kind, depth) of the open listing block
+        self._href = None
+        self._image_url = None
+        self._centers = []  # [depth, text parts] per div[align=center]
+        self._open_centers = []
+    
+    def start_element(self, tag, attrs):
+        depth = len(self.stack)
+        if self._block is None:
+            classes = attrs.get('class', '').split()
+            if tag == 'div' and 'miss_img' in classes:
+                self._block = ('img', depth)
+                self._href = None
+                self._image_url = None
+            elif tag == 'div' and 'miss_detail' in classes:
+                self._block = ('detail', depth)
+                self._centers = []
+                self._open_centers = []
+        elif self._block[0] == 'img':
+            if tag == 'a' and self._href is None and 'href' in attrs:
+                self._href = attrs['href']
+            elif (tag == 'img' and self._image_url is None and 'src' in attrs
+                  and not is_status_icon(attrs['src'])):
+                self._image_url = attrs['src']
+        elif tag == 'div' and attrs.get('align') == 'center':
+            center = [depth, []]
+            self._centers.append(center)
+            self._open_centers.append(center)
+    
+    def handle_text(self, text):
+        text = text.strip()
+        for center in self._open_centers:
+            center[1].append(text)
+    
+    def end_element(self, tag, depth):
+        if self._block is None:
+            return
+        kind, block_depth = self._block
+        if depth == block_depth:
+            self._block = None
+            if kind == 'img':
+                self._images.append((self._href, self._image_url))
+            else:
+                self._details.append([''.join(parts) for _, parts in self._centers])
+                self._open_centers = []
+            # A record is complete once both its image and detail blocks have closed
+            while self._images and self._details:
+                href, image_url = self._images.pop(0)
+                self.records.append(make_listing_item(href, image_url, self._details.pop(0)))
+        elif self._open_centers and self._open_centers[-1][0] == depth:
+            self._open_centers.pop()
+
+class DetailStreamParser(StreamExtractor):
+    """Streaming equivalent of parse_detail_page.
+    
+    Only the second child div of '#content > article > div' is needed, so
+    the extractor is done as soon as that div closes.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self.text = None
+        self._target = None    # depth of '#content > article > div'
+        self._children = 0
+        self._text_div = None  # depth of the target's second child div
+        self._parts = []
+    
+    def start_element(self, tag, attrs):
+        if tag != 'div' or self.done:
+            return
+        depth = len(self.stack)
+        if self._target is None:
+            if (depth >= 2 and self.stack[-1][0] == 'article'
+                    and self.stack[-2][1].get('id') == 'content'):
+                self._target = depth
+        elif depth == self._target + 1:
+            self._children += 1
+            if self._children == 2:
+                self._text_div = depth
+    
+    def handle_text(self, text):
+        if self._text_div is not None and not self.done and len(self.stack) > self._text_div:
+            text = text.strip()
+            if text:
+                self._parts.append(text)
+    
+    def end_element(self, tag, depth):
+        if self.done:
+            return
+        if depth == self._text_div:
+            self.text = clean_detail_text(' '.join(self._parts))
+            self.done = True
+        elif depth == self._target:
+            self.done = True
+
+def feed_chunks(extractor, chunks, encoding='utf-8'):
+    """Feed byte chunks into extractor, yielding records as soon as they close.
+    
+    Stops consuming chunks once the extractor reports it is done.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    for chunk in chunks:
+        extractor.feed(decoder.decode(chunk))
+        yield from extractor.pop_records()
+        if extractor.done:
+            return
+    extractor.feed(decoder.decode(b'', final=True))
+    extractor.close()
+    yield from extractor.pop_records()
+
+def stream_page(url, extractor):
+    """Download a page in chunks and parse it while it arrives.
+    
+    Closing the response early abandons the rest of the download once
+    the extractor has seen the region it needs. An error response raises
+    before anything is parsed.
+    """
+    with session.get(url, timeout=10, stream=True) as resp:
+        resp.raise_for_status()
+        # requests assumes ISO-8859-1 when no charset is sent; the site serves UTF-8
+        has_charset = 'charset' in resp.headers.get('Content-Type', '').lower()
+        encoding = resp.encoding if has_charset else 'utf-8'
+        yield from feed_chunks(extractor, resp.iter_content(chunk_size=STREAM_CHUNK_SIZE), encoding)
+
 def fetch_detail(item):
     """Fetch and extract details for a single item."""
     if not item.get('detail_link'):
@@ -85,17 +774,17 @@ def fetch_detail(item):
     
     try:
         print(f"Fetching details from: {item['detail_link']}")
-        resp = session.get(item['detail_link'], timeout=10)
-        soup = BeautifulSoup(resp.content, 'html.parser')
+        if STREAM_PARSE:
+            extractor = DetailStreamParser()
+            for _ in stream_page(item['detail_link'], extractor):
+                pass
+            text = extractor.text
+        else:
+            resp = session.get(item['detail_link'], timeout=10)
+            resp.raise_for_status()
+            text = run_parser(parse_detail_page, resp.content)
         
-        target = soup.select_one('#content > article > div')
-        if target and len(target.find_all('div', recursive=False)) >= 2:
-            text = target.find_all('div', recursive=False)[1].get_text(' ', strip=True)
-            # Clean up text
-            text = re.sub(r'\s+', ' ', text)
-            text = re.sub(r'([.!?])\s+', r'\1\n\n', text)
-            text = re.sub(r'\*\*\s*', '**\n\n', text)
-            text = re.sub(r'\n\s*\n', ' ', text)
+        if text is not None:
             item['detail'] = text
             print(f"Found detail text for item {item.get('id')}")
         else:
@@ -107,6 +796,365 @@ def fetch_detail(item):
     
     return item
 
+def timed_fetch_detail(item, checkpoint=None):
+    start = time.monotonic()
+    fetch_detail(item)
+    if checkpoint:
+        checkpoint.detail_done(item)
+    return time.monotonic() - start
+
+def fetch_details(items, deadline=None, checkpoint=None):
+    """Fetch details in the given order, stopping before the deadline.
+    
+    A fetch is only started while its projected finish (now plus the mean
+    fetch time so far) is before the deadline minus DEADLINE_MARGIN. Items
+    left unfetched have no 'detail' key. Returns how many were skipped.
+    """
+    pending = deque(items)
+    durations = []
+    in_flight = set()
+    skipped = 0
+    with ThreadPoolExecutor(max_workers=DETAIL_WORKERS) as executor:
+        while pending or in_flight:
+            while pending and len(in_flight) < DETAIL_WORKERS:
+                expected = sum(durations) / len(durations) if durations else 1.0
+                if deadline is not None and time.monotonic() + expected > deadline - DEADLINE_MARGIN:
+                    print(f"Deadline approaching, skipping details for {len(pending)} items")
+                    skipped = len(pending)
+                    pending.clear()
+                    break
+                in_flight.add(executor.submit(timed_fetch_detail, pending.popleft(), checkpoint))
+            
+            if not in_flight:
+                break
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    durations.append(future.result())
+                except Exception as e:
+                    print(f"Error processing item: {e}")
+    return skipped
+
+class FileCheckpointStore:
+    """Checkpoint kept as a JSON file; /tmp survives warm Lambda invocations."""
+    
+    def __init__(self, path=CHECKPOINT_PATH):
+        self.path = path
+    
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+    
+    def save(self, state, replace=False):
+        """Write state unless a newer generation has replaced it."""
+        if not replace:
+            current = self.load()
+            if current and current['generation'] != state['generation']:
+                return False
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        return True
+    
+    def clear(self, generation):
+        current = self.load()
+        if current and current['generation'] == generation:
+            os.remove(self.path)
+
+class MySQLCheckpointStore:
+    """Checkpoint kept in the crawl_checkpoint table, durable across cold starts."""
+    
+    def _connect(self):
+        return pymysql.connect(
+            **DB_CONFIG,
+            cursorclass=DB_CURSOR
+        )
+    
+    def load(self):
+        conn = self._connect()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT state FROM crawl_checkpoint WHERE platform = 'backtohome'")
+                row = cur.fetchone()
+                return json.loads(row['state']) if row else None
+        finally:
+            conn.close()
+    
+    def save(self, state, replace=False):
+        """Write state unless a newer generation has replaced it."""
+        conn = self._connect()
+        try:
+            with conn.cursor() as cur:
+                if replace:
+                    cur.execute("""
+                    REPLACE INTO crawl_checkpoint (platform, generation, state, updated_at)
+                    VALUES ('backtohome', %(generation)s, %(state)s, NOW())
+                    """, {'generation': state['generation'], 'state': json.dumps(state, ensure_ascii=False)})
+                else:
+                    cur.execute("""
+                    UPDATE crawl_checkpoint SET state = %(state)s, updated_at = NOW()
+                    WHERE platform = 'backtohome' AND generation = %(generation)s
+                    """, {'generation': state['generation'], 'state': json.dumps(state, ensure_ascii=False)})
+                saved = replace or cur.rowcount > 0
+            conn.commit()
+            return saved
+        finally:
+            conn.close()
+    
+    def clear(self, generation):
+        conn = self._connect()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM crawl_checkpoint WHERE platform = 'backtohome' AND generation = %s",
+                    (generation,)
+                )
+            conn.commit()
+        finally:
+            conn.close()
+
+class CrawlCheckpoint:
+    """Pages and details a run has fetched and persisted, for resuming it.
+    
+    Each fresh run gets a new generation id. A checkpoint older than
+    CHECKPOINT_TTL, or taken when the site had a different page count, is
+    discarded, and a run still writing an older generation cannot
+    overwrite a newer one. Updates are thread-safe and written to the
+    store at most every CHECKPOINT_INTERVAL seconds until flushed.
+    """
+    
+    def __init__(self, store, state):
+        self.store = store
+        self.state = state
+        self._lock = threading.Lock()
+        self._saved_at = time.monotonic()
+        self._dirty = False
+        self._persisted = set(state['persisted'])
+    
+    @classmethod
+    def open(cls, total_pages, store=None):
+        """Resume the stored checkpoint if it is still valid, else start a new one."""
+        store = store or (MySQLCheckpointStore() if CHECKPOINT_STORE == 'mysql' else FileCheckpointStore())
+        state = store.load()
+        if state:
+            age = time.time() - state['started_at']
+            if age < CHECKPOINT_TTL and state['total_pages'] == total_pages:
+                print(f"Resuming checkpoint {state['generation']}: {len(state['pages'])} pages, "
+                      f"{len(state['details'])} details, {len(state['persisted'])} persisted")
+                return cls(store, state)
+            print(f"Discarding stale checkpoint {state['generation']} "
+                  f"({age:.0f}s old, taken with {state['total_pages']} pages)")
+        
+        state = {
+            'generation': uuid.uuid4().hex,
+            'started_at': time.time(),
+            'total_pages': total_pages,
+            'pages': {},
+            'details': {},
+            'persisted': []
+        }
+        store.save(state, replace=True)
+        return cls(store, state)
+    
+    def page_items(self, page):
+        """Return copies of the items saved for a page, or None if not fetched."""
+        items = self.state['pages'].get(str(page))
+        return [dict(item) for item in items] if items is not None else None
+    
+    def page_done(self, page, items):
+        with self._lock:
+            self.state['pages'][str(page)] = [dict(item) for item in items]
+            self._changed()
+    
+    def restore_detail(self, item):
+        """Copy a previously fetched detail onto item; return whether there was one."""
+        if item.get('id') not in self.state['details']:
+            return False
+        item['detail'] = self.state['details'][item['id']]
+        return True
+    
+    def detail_done(self, item):
+        # Failed fetches are left out so a resumed run retries them
+        if item.get('id') is None or item.get('detail') is None:
+            return
+        with self._lock:
+            self.state['details'][item['id']] = item['detail']
+            self._changed()
+    
+    def is_persisted(self, item):
+        return item.get('id') in self._persisted
+    
+    def mark_persisted(self, items):
+        with self._lock:
+            self._persisted.update(item['id'] for item in items if item.get('id') is not None)
+            self.state['persisted'] = sorted(self._persisted)
+            self._save()
+    
+    def _changed(self):
+        self._dirty = True
+        if time.monotonic() - self._saved_at >= CHECKPOINT_INTERVAL:
+            self._save()
+    
+    def _save(self):
+        try:
+            if not self.store.save(self.state):
+                print(f"Checkpoint {self.state['generation']} was superseded, not saving")
+        except Exception as e:
+            print(f"Error saving checkpoint: {e}")
+        self._saved_at = time.monotonic()
+        self._dirty = False
+    
+    def flush(self):
+        with self._lock:
+            if self._dirty:
+                self._save()
+    
+    def finish(self):
+        """Drop the checkpoint once the whole run is persisted."""
+        try:
+            self.store.clear(self.state['generation'])
+        except Exception as e:
+            print(f"Error clearing checkpoint: {e}")
+
+class CaseIndex:
+    """Stored backtohome cases as sorted fixed-width records, memory-mapped from CASE_CACHE_PATH.
+    
+    Each record is (case id, MD5 of the name, MD5 of name/picture/url),
+    sorted by name digest, so a lookup is a binary search over the mapped
+    file and nothing is parsed up front.
+    """
+    
+    MAGIC = b'CIX2'
+    
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, *self.probe = CASE_CACHE_HEADER.unpack_from(self._map)
+        if magic != self.MAGIC:
+            raise ValueError(f"{path} is not a case cache")
+    
+    def __len__(self):
+        return (len(self._map) - CASE_CACHE_HEADER.size) // CASE_CACHE_RECORD.size
+    
+    def __getitem__(self, i):
+        # Only the name digest, which is all bisect needs
+        offset = CASE_CACHE_HEADER.size + i * CASE_CACHE_RECORD.size + 8
+        return self._map[offset:offset + 16]
+    
+    def __iter__(self):
+        return CASE_CACHE_RECORD.iter_unpack(memoryview(self._map)[CASE_CACHE_HEADER.size:])
+    
+    def get(self, name):
+        """Return (case_id, content_digest) of the lowest case id with this name, or None."""
+        digest = hashlib.md5(name.encode('utf-8')).digest()
+        i = bisect.bisect_left(self, digest)
+        if i < len(self) and self[i] == digest:
+            case_id, _, content_digest = CASE_CACHE_RECORD.unpack_from(
+                self._map, CASE_CACHE_HEADER.size + i * CASE_CACHE_RECORD.size
+            )
+            return case_id, content_digest
+        return None
+    
+    def state(self, name, digest):
+        """Return 0 for a new name, 1 if the stored content differs from the hex digest, 2 if unchanged."""
+        stored = self.get(name)
+        if stored is None:
+            return 0
+        return 2 if stored[1].hex() == digest else 1
+    
+    def missing_ids(self, names):
+        """Return the ids of the cached cases whose name is not among names."""
+        listed = {hashlib.md5(name.encode('utf-8')).digest() for name in names}
+        return [case_id for case_id, name_digest, _ in self if name_digest not in listed]
+
+def probe_case_information(cur):
+    """Return [count, latest, seq] for the backtohome rows: COUNT(*) and
+    MAX(created_at) of case_information, and the last case_outbox seq.
+    
+    Every write either changes the row count or sets created_at to NOW(),
+    so an unchanged probe means unchanged rows. A write in the same second
+    as the newest row would not move MAX(created_at), but every real
+    change the lambdas make also records an outbox event, which moves seq.
+    """
+    cur.execute("""
+    SELECT COUNT(*) AS count,
+           COALESCE(UNIX_TIMESTAMP(MAX(created_at)), 0) AS latest,
+           (SELECT COALESCE(MAX(seq), 0) FROM case_outbox WHERE platform = 'backtohome') AS seq
+    FROM case_information
+    WHERE platform = 'backtohome'
+    """)
+    probe = cur.fetchone()
+    return [probe['count'], int(probe['latest']), probe['seq']]
+
+def probe_matches(stored, current):
+    """Whether nothing was written since the stored probe was taken."""
+    return stored is not None and list(stored) == list(current)
+
+def load_case_index(cur):
+    """Return a CaseIndex of the backtohome cases in the database.
+    
+    A warm container reuses the cache in CASE_CACHE_PATH while
+    probe_case_information matches the probe it was built with, and only
+    rebuilds it otherwise.
+    """
+    probe = probe_case_information(cur)
+    
+    try:
+        index = CaseIndex(CASE_CACHE_PATH)
+        if probe_matches(index.probe, probe):
+            print(f"Using cached index of {len(index)} existing cases")
+            return index
+    except (FileNotFoundError, ValueError, struct.error):
+        pass
+    
+    # Rows are sorted server-side and streamed straight into the file, so
+    # memory does not grow with the number of cases
+    tmp_path = f"{CASE_CACHE_PATH}.{os.getpid()}.tmp"
+    records = 0
+    with open(tmp_path, 'wb') as f, cur.connection.cursor(pymysql.cursors.SSCursor) as stream:
+        f.write(CASE_CACHE_HEADER.pack(CaseIndex.MAGIC, *probe))
+        stream.execute("""
+        SELECT c.id,
+               UNHEX(MD5(COALESCE(c.name_key, c.name, ''))) AS name_digest,
+               UNHEX(MD5(CONCAT_WS(CHAR(31), c.name, ci.picture, ci.url))) AS content_digest
+        FROM cases c
+        JOIN case_information ci ON c.id = ci.case_id
+        WHERE ci.platform = 'backtohome'
+        ORDER BY name_digest, c.id
+        """)
+        for case_id, name_digest, content_digest in stream:
+            f.write(CASE_CACHE_RECORD.pack(case_id, name_digest, content_digest))
+            records += 1
+    os.replace(tmp_path, CASE_CACHE_PATH)
+    print(f"Cached index of {records} existing cases")
+    return CaseIndex(CASE_CACHE_PATH)
+
+def prioritize_items(items):
+    """Order items new first, then changed, then unchanged listings."""
+    try:
+        conn = pymysql.connect(
+            **DB_CONFIG,
+            cursorclass=DB_CURSOR
+        )
+        try:
+            with conn.cursor() as cur:
+                index = load_case_index(cur)
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"Could not load existing cases, keeping page order: {e}")
+        return list(items)
+    
+    def priority(item):
+        name = remove_thai_honorific(item['name'])
+        return index.state(name, content_hash(name, item['image_url'], item['detail_link']))
+    
+    return sorted(items, key=priority)
+
 def remove_thai_honorific(name):
     if not name:
         return 'ไม่ระบุ'
@@ -124,190 +1172,905 @@ def remove_thai_honorific(name):
     
     return processed_name or 'ไม่ระบุ'
 
-def store_items_in_db(items):
-    """Store items in the database."""
+def record_changes(cur, changes):
+    """Append (case_id, change_type) events for backtohome to case_outbox.
+    
+    Runs on the cursor that made the changes, so the events commit or
+    roll back together with them.
+    """
+    if changes:
+        cur.executemany("""
+        INSERT INTO case_outbox (case_id, platform, change_type)
+        VALUES (%s, %s, %s)
+        """, [(case_id, 'backtohome', change_type) for case_id, change_type in changes])
+
+def deactivate_cases(cur, case_ids):
+    """Mark cases inactive, drop their backtohome rows and delete orphaned cases."""
+    # Mark cases as inactive by updating case_information
+    update_sql = """
+    UPDATE case_information 
+    SET description = CONCAT(COALESCE(description, ''), '\n[INACTIVE - No longer found in source]'),
+        created_at = NOW()
+    WHERE case_id IN %(case_ids)s AND platform = 'backtohome'
+    """
+    cur.execute(update_sql, {'case_ids': tuple(case_ids)})
+    record_changes(cur, [(case_id, 'deactivated') for case_id in case_ids])
+    print(f"Marked {len(case_ids)} old cases as inactive")
+    
+    # Delete marked cases from case_information
+    delete_marked_sql = """
+    DELETE FROM case_information 
+    WHERE case_id IN %(case_ids)s AND platform = 'backtohome'
+    """
+    cur.execute(delete_marked_sql, {'case_ids': tuple(case_ids)})
+    print(f"Deleted {len(case_ids)} marked cases from case_information")
+    
+    # Find and delete orphaned cases (cases with no case_information). Cases
+    # that were posted or claimed keep their row: posted_case references them
+    # and the post history outlives the source listing.
+    delete_orphaned_sql = """
+    DELETE FROM cases 
+    WHERE id IN %(case_ids)s 
+    AND NOT EXISTS (
+        SELECT 1 FROM case_information 
+        WHERE case_id = cases.id
+    )
+    AND NOT EXISTS (
+        SELECT 1 FROM posted_case
+        WHERE case_id = cases.id
+    )
+    """
+    cur.execute(delete_orphaned_sql, {'case_ids': tuple(case_ids)})
+    print(f"Deleted orphaned cases from cases table")
+
+def find_case_id(cur, name):
+    """Return the id of the case with this cleaned name, or None."""
+    check_sql = """
+    SELECT id FROM cases WHERE name_key = %(name)s
+    """
+    cur.execute(check_sql, {'name': name})
+    result = cur.fetchone()
+    return result['id'] if result else None
+
+def write_batches(conn, items, write_item, deadline=None, write_chunk=None):
+    """Write items with write_item(cur, item), committing every DB_BATCH_SIZE rows.
+    
+    A chunk that fails is rolled back and retried row by row, each row
+    under its own savepoint, so a bad row costs only that row. No new
+    chunk is started within COMMIT_MARGIN seconds of the deadline.
+    
+    With write_chunk(cur, chunk), each chunk is first written in one call
+    that returns the write_item results for the whole chunk.
+    
+    Returns (written, rejected): (item, write_item result) pairs for the
+    committed rows and (item, error) pairs for the rejected ones.
+    """
+    written = []
+    rejected = []
+    for start in range(0, len(items), DB_BATCH_SIZE):
+        if past_deadline(deadline, COMMIT_MARGIN):
+            print(f"Deadline approaching, stopping after {len(written)} items")
+            break
+        chunk = items[start:start + DB_BATCH_SIZE]
+        
+        try:
+            with conn.cursor() as cur:
+                if write_chunk:
+                    results = list(zip(chunk, write_chunk(cur, chunk)))
+                else:
+                    results = [(item, write_item(cur, item)) for item in chunk]
+            conn.commit()
+            written.extend(results)
+            continue
+        except Exception as e:
+            conn.rollback()
+            print(f"Batch of {len(chunk)} items failed ({e}), retrying row by row")
+        
+        with conn.cursor() as cur:
+            for item in chunk:
+                cur.execute("SAVEPOINT sync_item")
+                try:
+                    result = write_item(cur, item)
+                    cur.execute("RELEASE SAVEPOINT sync_item")
+                    written.append((item, result))
+                except Exception as e:
+                    cur.execute("ROLLBACK TO SAVEPOINT sync_item")
+                    rejected.append((item, str(e)))
+                    print(f"Rejected item {item.get('id')} ('{item.get('name')}'): {e}")
+        conn.commit()
+    
+    return written, rejected
+
+def upsert_item(cur, item):
+    """Insert or update the case and backtohome case_information for one item.
+    
+    Returns the case id. Safe to repeat: an item already stored is matched
+    by name and only updated when its content changed.
+    """
+    cleaned_name = remove_thai_honorific(item['name'])
+    
+    # Find or create the case in one statement; the unique name_key makes
+    # this safe against the other lambda creating the same case meanwhile
+    case_sql = """
+    INSERT INTO cases (name, name_key, created_at)
+    VALUES (%(name)s, %(name)s, NOW())
+    ON DUPLICATE KEY UPDATE id = LAST_INSERT_ID(id)
+    """
+    cur.execute(case_sql, {'name': cleaned_name})
+    case_id = cur.lastrowid
+    if cur.rowcount == 1:
+        print(f"Created new case with name '{cleaned_name}', ID: {case_id}")
+    else:
+        print(f"Found existing case with name '{cleaned_name}', using ID: {case_id}")
+
+    # Check if this platform's information already exists
+    check_platform_sql = """
+    SELECT case_id FROM case_information 
+    WHERE case_id = %(case_id)s AND platform = %(platform)s
+    """
+    cur.execute(check_platform_sql, {
+        'case_id': case_id,
+        'platform': 'backtohome'
+    })
+    existing_platform = cur.fetchone()
+
+    if not existing_platform:
+        # Insert new case_information row
+        info_sql = """
+        INSERT INTO case_information (
+            case_id, platform, picture, url, description, created_at
+        ) VALUES (
+            %(case_id)s, %(platform)s, %(picture)s, %(url)s, %(description)s, NOW()
+        )
+        """
+        
+        cur.execute(info_sql, {
+            'case_id': case_id,
+            'platform': 'backtohome',
+            'picture': item['image_url'],
+            'url': item['detail_link'],
+            'description': item.get('detail')
+        })
+        record_changes(cur, [(case_id, 'inserted')])
+        print(f"Added new case information for platform 'backtohome' for case ID {case_id}")
+    else:
+        # Update existing case information
+        update_sql = """
+        UPDATE case_information 
+        SET picture = %(picture)s,
+            url = %(url)s,
+            description = %(description)s,
+            created_at = NOW()
+        WHERE case_id = %(case_id)s 
+        AND platform = 'backtohome'
+        AND (
+            picture != %(picture)s 
+            OR url != %(url)s 
+            OR description != %(description)s
+        )
+        """
+        cur.execute(update_sql, {
+            'case_id': case_id,
+            'platform': 'backtohome',
+            'picture': item['image_url'],
+            'url': item['detail_link'],
+            'description': item.get('detail')
+        })
+        if cur.rowcount > 0:
+            record_changes(cur, [(case_id, 'updated')])
+            print(f"Updated existing case information for platform 'backtohome' for case ID {case_id}")
+        else:
+            print(f"No changes needed for case ID {case_id}")
+    
+    return case_id
+
+def resolve_case_ids(cur, names):
+    """Return {name: case_id} for the cleaned names, creating the missing cases.
+    
+    Cases are keyed on the unique name_key, so neither lambda can create a
+    case the other is creating at the same time. Names are inserted in
+    sorted order so that concurrent writers lock keys in the same order
+    and cannot deadlock each other.
+    
+    The ids are read with a locking read: a plain SELECT would read the
+    transaction's snapshot, which misses a case the other lambda committed
+    after the snapshot was taken even though the INSERT just hit it.
+    LOCK IN SHARE MODE rather than FOR SHARE keeps this working on MySQL 5.7.
+    """
+    names = sorted(set(names))
+    if not names:
+        return {}
+    # One multi-row INSERT; executemany only rewrites plain placeholder rows
+    values = ',\n'.join(cur.mogrify("(%s, %s, NOW())", (name, name)) for name in names)
+    cur.execute(f"""
+    INSERT INTO cases (name, name_key, created_at)
+    VALUES {values}
+    ON DUPLICATE KEY UPDATE id = id
+    """)
+    cur.execute("SELECT id, name_key FROM cases WHERE name_key IN %(names)s LOCK IN SHARE MODE", {'names': tuple(names)})
+    return {row['name_key']: row['id'] for row in cur.fetchall()}
+
+# Affected-row counts of an INSERT ... ON DUPLICATE KEY UPDATE
+UPSERT_OUTCOMES = {0: 'unchanged', 1: 'inserted', 2: 'updated'}
+
+def upsert_items(cur, items):
+    """Upsert a chunk of items in a fixed number of round trips.
+    
+    Case ids are resolved in bulk with resolve_case_ids, then every item's
+    INSERT ... ON DUPLICATE KEY UPDATE of its backtohome case_information
+    row is sent, in case id order, as a single multi-statement query; the
+    connection must be opened with CLIENT.MULTI_STATEMENTS. The affected
+    row count of each upsert is read back with nextset().
+    
+    Every insert or real change is recorded in case_outbox.
+    
+    Returns 'inserted', 'updated' or 'unchanged' for each item.
+    """
+    names = [remove_thai_honorific(item['name']) for item in items]
+    case_ids = resolve_case_ids(cur, names)
+    missing = [name for name in names if name not in case_ids]
+    if missing:
+        # Rejected like a failed row rather than aborting the whole sync
+        raise LookupError(f"No case id resolved for {', '.join(repr(name) for name in missing)}")
+    order = sorted(range(len(items)), key=lambda i: case_ids[names[i]])
+    
+    statements = []
+    for i in order:
+        item = items[i]
+        # created_at only moves when the content changed
+        statements.append(cur.mogrify("""
+        INSERT INTO case_information (case_id, platform, picture, url, description, created_at)
+        VALUES (%(case_id)s, 'backtohome', %(picture)s, %(url)s, %(description)s, NOW())
+        ON DUPLICATE KEY UPDATE
+            created_at = IF(
+                picture <=> VALUES(picture)
+                AND url <=> VALUES(url)
+                AND description <=> VALUES(description),
+                created_at, NOW()
+            ),
+            picture = VALUES(picture),
+            url = VALUES(url),
+            description = VALUES(description)
+        """, {
+            'case_id': case_ids[names[i]],
+            'picture': item['image_url'],
+            'url': item['detail_link'],
+            'description': item.get('detail')
+        }))
+    
+    cur.execute(';'.join(statements))
+    outcomes = [None] * len(items)
+    for position, i in enumerate(order):
+        if position:
+            cur.nextset()
+        outcomes[i] = UPSERT_OUTCOMES[cur.rowcount]
+    
+    record_changes(cur, [
+        (case_ids[names[i]], outcomes[i]) for i in order if outcomes[i] != 'unchanged'
+    ])
+    return outcomes
+
+def upsert_one(cur, item):
+    """upsert_items for a single item, used when a chunk is retried row by row."""
+    return upsert_items(cur, [item])[0]
+
+def write_partitioned(conn, items, deadline=None):
+    """Write items with upsert_items over DB_WRITERS connections in parallel.
+    
+    The sorted cleaned names are split into DB_WRITERS contiguous ranges
+    and each range's items are written and committed by their own
+    connection with write_batches. Every chunk creates its cases in the
+    same transaction as their case_information rows, so a writer that
+    fails or stops at the deadline leaves no case without information
+    behind. Partitions share no names, and their cases fall in disjoint
+    ranges of the name_key index, so the writers rarely wait on each
+    other's locks.
+    
+    Returns (written, rejected) like write_batches.
+    """
+    if DB_WRITERS < 2 or len(items) <= DB_BATCH_SIZE:
+        return write_batches(conn, items, upsert_one, deadline, write_chunk=upsert_items)
+    
+    names = sorted({remove_thai_honorific(item['name']) for item in items})
+    partition_of = {name: position * DB_WRITERS // len(names) for position, name in enumerate(names)}
+    partitions = [[] for _ in range(DB_WRITERS)]
+    for item in items:
+        partitions[partition_of[remove_thai_honorific(item['name'])]].append(item)
+    
+    def write_partition(partition):
+        writer = pymysql.connect(
+            **DB_CONFIG,
+            cursorclass=DB_CURSOR,
+            client_flag=CLIENT.MULTI_STATEMENTS
+        )
+        try:
+            return write_batches(writer, partition, upsert_one, deadline, write_chunk=upsert_items)
+        finally:
+            writer.close()
+    
+    with ThreadPoolExecutor(max_workers=DB_WRITERS) as executor:
+        results = list(executor.map(write_partition, [partition for partition in partitions if partition]))
+    print(f"Wrote {len(items)} items over {len(results)} connections")
+    written = [pair for partition_written, _ in results for pair in partition_written]
+    rejected = [pair for _, partition_rejected in results for pair in partition_rejected]
+    return written, rejected
+
+def content_hash(*values):
+    """MD5 of the non-NULL values, same as MD5(CONCAT_WS(CHAR(31), ...)) in MySQL."""
+    return hashlib.md5('\x1f'.join(v for v in values if v is not None).encode('utf-8')).hexdigest()
+
+def snapshot_entry(item):
+    """Return (external_id, [content_hash, cleaned_name]) for a listing.
+    
+    The hash is None while the item's details have not been fetched.
+    """
+    name = remove_thai_honorific(item['name'])
+    if 'detail' not in item:
+        return item.get('id') or name, [None, name]
+    return item.get('id') or name, [
+        content_hash(name, item['image_url'], item['detail_link'], item['detail']),
+        name
+    ]
+
+def load_snapshot():
+    """Return the last synced snapshot, or None if there is none to diff against.
+    
+    The snapshot is only trusted while the database still matches it: the
+    probe_case_information taken when it was saved must match a fresh
+    one. Rows written by another container, a sharded run or by hand
+    therefore force a full sync instead of being hidden by the snapshot.
+    """
+    try:
+        with open(SNAPSHOT_PATH, encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if time.time() - snapshot['taken_at'] > SNAPSHOT_TTL:
+        print("Snapshot is older than SNAPSHOT_TTL, running a full sync")
+        return None
+    
     conn = pymysql.connect(
         **DB_CONFIG,
-        cursorclass=pymysql.cursors.DictCursor
+        cursorclass=DB_CURSOR
+    )
+    try:
+        with conn.cursor() as cur:
+            probe = probe_case_information(cur)
+    finally:
+        conn.close()
+    if not probe_matches(snapshot.get('probe'), probe):
+        print("Database changed since the snapshot was taken, running a full sync")
+        return None
+    return snapshot
+
+def save_snapshot(records, digest=None, probe=None):
+    """Save the synced records with the probe_case_information of the database they match."""
+    tmp_path = f"{SNAPSHOT_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'taken_at': time.time(), 'digest': digest, 'probe': probe, 'records': records}, f, ensure_ascii=False)
+    os.replace(tmp_path, SNAPSHOT_PATH)
+
+def diff_snapshot(previous, items):
+    """Compare this run's items with the previous snapshot in one pass.
+    
+    Returns (current, inserts, updates, removed): the external_id -> entry
+    map for this run, the new and changed items, and the names of cases
+    that are no longer listed. Items without details are never changed.
+    """
+    current = {}
+    inserts = []
+    updates = []
+    for item in items:
+        external_id, entry = snapshot_entry(item)
+        current[external_id] = entry
+        if entry[0] is None:
+            continue
+        if external_id not in previous:
+            inserts.append(item)
+        elif previous[external_id] != entry:
+            updates.append(item)
+    
+    current_names = {entry[1] for entry in current.values()}
+    removed = {
+        entry[1] for external_id, entry in previous.items()
+        if external_id not in current and entry[1] not in current_names
+    }
+    return current, inserts, updates, removed
+
+def deactivate_names(cur, names):
+    """Deactivate the backtohome cases with the given cleaned names."""
+    cur.execute("""
+    SELECT c.id
+    FROM cases c
+    JOIN case_information ci ON c.id = ci.case_id
+    WHERE ci.platform = 'backtohome' AND c.name_key IN %(names)s
+    """, {'names': tuple(names)})
+    cases_to_mark = [row['id'] for row in cur.fetchall()]
+    print(f"Found {len(cases_to_mark)} cases to mark as inactive")
+    if cases_to_mark:
+        deactivate_cases(cur, cases_to_mark)
+
+def deactivate_missing_cases(cur, items):
+    """Deactivate stored backtohome cases whose names are not among items."""
+    # Get all existing case IDs and names for this platform
+    index = load_case_index(cur)
+    print(f"Found {len(index)} existing cases in database")
+    
+    # Create a set of new case names for comparison
+    new_case_names = {remove_thai_honorific(item['name']) for item in items}
+    print(f"Found {len(new_case_names)} new cases from source")
+    
+    # Find cases to mark as inactive (those that don't exist in new data)
+    cases_to_mark = index.missing_ids(new_case_names)
+    for case_id in cases_to_mark:
+        print(f"Case {case_id} not found in new data")
+    
+    print(f"Found {len(cases_to_mark)} cases to mark as inactive")
+    
+    if cases_to_mark:
+        deactivate_cases(cur, cases_to_mark)
+
+def bulk_sync(conn, items, to_store):
+    """Apply a full sweep server-side with a staging table and set-based statements.
+    
+    Every listed item is loaded into a temporary staging table with
+    multi-row INSERTs; only those in to_store are written. Missing cases
+    are deactivated with an anti-join, new cases inserted, and
+    case_information upserted in one statement, so the round trips no
+    longer grow with the number of items. The caller commits.
+    
+    Returns the number of case_information rows inserted or changed.
+    """
+    store_ids = {id(item) for item in to_store}
+    # Like the per-row path, the last stored listing with a given name wins;
+    # a duplicate that is not stored never displaces one that is, or the
+    # staged row would be skipped while the caller counts it as written
+    rows = {}
+    for item in items:
+        name = remove_thai_honorific(item['name'])
+        sync = id(item) in store_ids
+        if sync or not (name in rows and rows[name][4]):
+            rows[name] = (name, item['image_url'], item['detail_link'], item.get('detail'), sync)
+    
+    with conn.cursor() as cur:
+        cur.execute("""
+        CREATE TEMPORARY TABLE IF NOT EXISTS staging_backtohome (
+            name varchar(255) COLLATE utf8mb4_bin NOT NULL,
+            picture varchar(255),
+            url varchar(255),
+            description text,
+            sync tinyint NOT NULL,
+            PRIMARY KEY (name)
+        )
+        """)
+        cur.execute("DELETE FROM staging_backtohome")
+        # executemany rewrites this into multi-row INSERTs of up to ~1MB each
+        cur.executemany("""
+        INSERT INTO staging_backtohome (name, picture, url, description, sync)
+        VALUES (%s, %s, %s, %s, %s)
+        """, list(rows.values()))
+        print(f"Loaded {len(rows)} listings into staging table")
+        
+        # Deactivate stored cases that are no longer listed
+        cur.execute("""
+        SELECT c.id
+        FROM cases c
+        JOIN case_information ci ON ci.case_id = c.id AND ci.platform = 'backtohome'
+        LEFT JOIN staging_backtohome s ON s.name = c.name_key
+        WHERE s.name IS NULL
+        """)
+        cases_to_mark = [row['id'] for row in cur.fetchall()]
+        print(f"Found {len(cases_to_mark)} cases to mark as inactive")
+        if cases_to_mark:
+            deactivate_cases(cur, cases_to_mark)
+        
+        # Insert cases for names not seen before
+        cur.execute("""
+        INSERT INTO cases (name, name_key, created_at)
+        SELECT s.name, s.name, NOW()
+        FROM staging_backtohome s
+        WHERE s.sync = 1
+        ORDER BY s.name
+        ON DUPLICATE KEY UPDATE id = id
+        """)
+        print(f"Created {cur.rowcount} new cases")
+        
+        # Record the inserts and real changes the upsert below will make
+        cur.execute("""
+        INSERT INTO case_outbox (case_id, platform, change_type)
+        SELECT c.id, 'backtohome', IF(ci.case_id IS NULL, 'inserted', 'updated')
+        FROM staging_backtohome s
+        JOIN cases c ON c.name_key = s.name
+        LEFT JOIN case_information ci ON ci.case_id = c.id AND ci.platform = 'backtohome'
+        WHERE s.sync = 1
+        AND (
+            ci.case_id IS NULL
+            OR NOT (ci.picture <=> s.picture AND ci.url <=> s.url AND ci.description <=> s.description)
+        )
+        ORDER BY c.id
+        """)
+        
+        # Upsert case_information; created_at only moves when the content changed
+        cur.execute("""
+        INSERT INTO case_information (case_id, platform, picture, url, description, created_at)
+        SELECT c.id, 'backtohome', s.picture, s.url, s.description, NOW()
+        FROM staging_backtohome s
+        JOIN cases c ON c.name_key = s.name
+        WHERE s.sync = 1
+        ON DUPLICATE KEY UPDATE
+            case_information.created_at = IF(
+                case_information.picture <=> VALUES(picture)
+                AND case_information.url <=> VALUES(url)
+                AND case_information.description <=> VALUES(description),
+                case_information.created_at, NOW()
+            ),
+            case_information.picture = VALUES(picture),
+            case_information.url = VALUES(url),
+            case_information.description = VALUES(description)
+        """)
+        # Affected rows count 1 per insert, 2 per changed row and 0 per unchanged row
+        changed = cur.rowcount
+        print(f"Upserted case information for platform 'backtohome' ({changed} affected rows)")
+        
+        cur.execute("DROP TEMPORARY TABLE staging_backtohome")
+    
+    return changed
+
+def store_items_in_db(items, deadline=None, checkpoint=None):
+    """Store items in the database.
+    
+    Items whose details were never fetched, or that the checkpoint shows a
+    previous attempt already persisted, are left as they are in the
+    database.
+    
+    When the previous run's snapshot is available, only the items it shows
+    as new or changed are written and only the cases that disappeared are
+    deactivated; if nothing changed the database is not touched at all.
+    Without a snapshot the run is a full sweep, applied with bulk_sync
+    unless SYNC_MODE is 'batched'.
+    
+    Delta writes, and a full sweep whose bulk sync fails, are committed in
+    batches (see write_batches); rows the database refuses are skipped and
+    returned in the report's reject list. Writing stops COMMIT_MARGIN
+    seconds before the deadline.
+    """
+    report = {'stored': 0, 'rejected': [], 'changes': {}}
+    
+    # Process new items
+    to_store = [
+        item for item in items
+        if 'detail' in item and not (checkpoint and checkpoint.is_persisted(item))
+    ]
+    
+    snapshot = load_snapshot()
+    previous = snapshot['records'] if snapshot else {}
+    current, inserts, updates, removed = diff_snapshot(previous, items)
+    if snapshot:
+        print(f"Snapshot diff: {len(inserts)} new, {len(updates)} changed, {len(removed)} removed")
+        changed_ids = {id(item) for item in inserts + updates}
+        to_store = [item for item in to_store if id(item) in changed_ids]
+        if not to_store and not removed:
+            print("No changes since the last run, skipping the database")
+            if checkpoint and all('detail' in item for item in items):
+                checkpoint.finish()
+            return report
+    
+    conn = pymysql.connect(
+        **DB_CONFIG,
+        cursorclass=DB_CURSOR,
+        client_flag=CLIENT.MULTI_STATEMENTS
     )
     
     try:
+        written = None
+        if not snapshot and SYNC_MODE == 'bulk' and not past_deadline(deadline, COMMIT_MARGIN):
+            try:
+                bulk_sync(conn, items, to_store)
+                conn.commit()
+                written, rejected = [(item, None) for item in to_store], []
+            except pymysql.MySQLError as e:
+                conn.rollback()
+                print(f"Bulk sync failed ({e}), falling back to batched writes")
+        
+        if written is None:
+            with conn.cursor() as cur:
+                if snapshot:
+                    if removed:
+                        deactivate_names(cur, removed)
+                else:
+                    deactivate_missing_cases(cur, items)
+            conn.commit()
+            written, rejected = write_partitioned(conn, to_store, deadline)
+        
+        stored = [item for item, _ in written]
+        report['stored'] = len(stored)
+        report['rejected'] = [
+            {'id': item.get('id'), 'name': item.get('name'), 'error': error}
+            for item, error in rejected
+        ]
+        print(f"Successfully stored {len(stored)} of {len(items)} items in database, "
+              f"rejected {len(rejected)}")
+        # Per-item upsert results; a bulk sync only reports its total
+        for _, outcome in written:
+            if outcome:
+                report['changes'][outcome] = report['changes'].get(outcome, 0) + 1
+        if report['changes']:
+            print(f"Case information changes: {report['changes']}")
+        
+        # Only what is now in the database enters the snapshot, so rejected
+        # and unwritten items show up as changed again next run
+        records = {external_id: previous[external_id] for external_id in current if external_id in previous}
+        persisted = [item for item in items if checkpoint and checkpoint.is_persisted(item)]
+        for item in stored + persisted:
+            external_id, entry = snapshot_entry(item)
+            records[external_id] = entry
+        # Probe in a fresh transaction so it sees every writer's commits
+        conn.commit()
         with conn.cursor() as cur:
-            # Get all existing case IDs and names for this platform
-            existing_cases_sql = """
-            SELECT c.id, c.name 
-            FROM cases c
-            JOIN case_information ci ON c.id = ci.case_id
-            WHERE ci.platform = 'backtohome'
-            """
-            cur.execute(existing_cases_sql)
-            existing_cases = cur.fetchall()
-            print(f"Found {len(existing_cases)} existing cases in database")
+            save_snapshot(records, probe=probe_case_information(cur))
+        
+        if checkpoint:
+            complete = (len(written) + len(rejected) == len(to_store)
+                        and all('detail' in item for item in items))
+            if complete:
+                checkpoint.finish()
+            else:
+                checkpoint.mark_persisted(stored)
+    except Exception as e:
+        print(f"Database error: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+    
+    return report
+
+def store_shard_in_db(run_id, shard, items, deadline=None):
+    """Store one shard's items and record which cases the run has seen.
+    
+    Writes are idempotent, so a retried worker invocation is harmless.
+    Deactivation is left to reconcile_run once every shard has reported.
+    A shard cut short by the deadline commits its items but is not
+    recorded as finished, so the run will not deactivate anything.
+    Rejected rows keep their existing case alive but are not written.
+    """
+    conn = pymysql.connect(
+        **DB_CONFIG,
+        cursorclass=DB_CURSOR
+    )
+    
+    try:
+        to_store = [item for item in items if 'detail' in item]
+        written, rejected = write_batches(conn, to_store, upsert_item, deadline)
+        complete = len(written) + len(rejected) == len(items)
+        case_ids = {case_id for _, case_id in written}
+        
+        with conn.cursor() as cur:
+            # Rejected items are still listed on the site, so their cases were seen
+            for item, _ in rejected:
+                case_id = find_case_id(cur, remove_thai_honorific(item['name']))
+                if case_id:
+                    case_ids.add(case_id)
             
-            # Create a set of new case names for comparison
-            new_case_names = {remove_thai_honorific(item['name']) for item in items}
-            print(f"Found {len(new_case_names)} new cases from source")
+            if case_ids:
+                seen_sql = """
+                INSERT IGNORE INTO crawl_seen (run_id, platform, case_id)
+                VALUES (%s, 'backtohome', %s)
+                """
+                cur.executemany(seen_sql, [(run_id, case_id) for case_id in case_ids])
             
-            # Find cases to mark as inactive (those that don't exist in new data)
-            cases_to_mark = []
-            for case in existing_cases:
-                if case['name'] not in new_case_names:
-                    cases_to_mark.append(case['id'])
-                    print(f"Case {case['id']} with name '{case['name']}' not found in new data")
+            if complete:
+                shard_sql = """
+                REPLACE INTO crawl_shard (run_id, platform, shard, item_count, finished_at)
+                VALUES (%(run_id)s, 'backtohome', %(shard)s, %(item_count)s, NOW())
+                """
+                cur.execute(shard_sql, {'run_id': run_id, 'shard': shard, 'item_count': len(items)})
+        
+        conn.commit()
+        if complete:
+            print(f"Shard {shard} of run {run_id}: stored {len(written)} items, rejected {len(rejected)}")
+        else:
+            print(f"Shard {shard} of run {run_id}: stopped at the deadline, not marked finished")
+    except Exception as e:
+        print(f"Database error in shard {shard} of run {run_id}: {e}")
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def reconcile_run(run_id, shard_count):
+    """Deactivate cases no shard of the run saw, once all shards have finished.
+    
+    Returns False and leaves every case untouched if any shard is missing,
+    so a partially failed run can never deactivate live cases.
+    """
+    conn = pymysql.connect(
+        **DB_CONFIG,
+        cursorclass=DB_CURSOR
+    )
+    
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT COUNT(*) AS finished FROM crawl_shard WHERE run_id = %s AND platform = 'backtohome'",
+                (run_id,)
+            )
+            finished = cur.fetchone()['finished']
+            if finished < shard_count:
+                print(f"Run {run_id}: only {finished}/{shard_count} shards finished, skipping deactivation")
+                return False
             
-            print(f"Found {len(cases_to_mark)} cases to mark as inactive")
+            unseen_sql = """
+            SELECT ci.case_id AS id
+            FROM case_information ci
+            LEFT JOIN crawl_seen s
+                ON s.case_id = ci.case_id AND s.platform = ci.platform AND s.run_id = %(run_id)s
+            WHERE ci.platform = 'backtohome' AND s.case_id IS NULL
+            """
+            cur.execute(unseen_sql, {'run_id': run_id})
+            cases_to_mark = [row['id'] for row in cur.fetchall()]
+            print(f"Run {run_id}: found {len(cases_to_mark)} cases to mark as inactive")
             
-            # Mark cases as inactive by updating case_information
             if cases_to_mark:
-                update_sql = """
-                UPDATE case_information 
-                SET description = CONCAT(COALESCE(description, ''), '\n[INACTIVE - No longer found in source]'),
-                    created_at = NOW()
-                WHERE case_id IN %(case_ids)s AND platform = 'backtohome'
-                """
-                cur.execute(update_sql, {'case_ids': tuple(cases_to_mark)})
-                print(f"Marked {len(cases_to_mark)} old cases as inactive")
-                
-                # Delete marked cases from case_information
-                delete_marked_sql = """
-                DELETE FROM case_information 
-                WHERE case_id IN %(case_ids)s AND platform = 'backtohome'
-                """
-                cur.execute(delete_marked_sql, {'case_ids': tuple(cases_to_mark)})
-                print(f"Deleted {len(cases_to_mark)} marked cases from case_information")
-                
-                # Find and delete orphaned cases (cases with no case_information)
-                delete_orphaned_sql = """
-                DELETE FROM cases 
-                WHERE id IN %(case_ids)s 
-                AND NOT EXISTS (
-                    SELECT 1 FROM case_information 
-                    WHERE case_id = cases.id
-                )
-                """
-                cur.execute(delete_orphaned_sql, {'case_ids': tuple(cases_to_mark)})
-                print(f"Deleted orphaned cases from cases table")
+                deactivate_cases(cur, cases_to_mark)
             
-            # Process new items
-            for item in items:
-                cleaned_name = remove_thai_honorific(item['name'])
-                
-                # Check if case with same name exists
-                check_sql = """
-                SELECT id FROM cases WHERE name = %(name)s
-                """
-                cur.execute(check_sql, {'name': cleaned_name})
-                result = cur.fetchone()
-                
-                if result:
-                    # Use existing case ID
-                    case_id = result['id']
-                    print(f"Found existing case with name '{cleaned_name}', using ID: {case_id}")
-                else:
-                    # Insert new case
-                    case_sql = """
-                    INSERT INTO cases (name, created_at)
-                    VALUES (%(name)s, NOW())
-                    """
-                    cur.execute(case_sql, {'name': cleaned_name})
-                    case_id = cur.lastrowid
-                    print(f"Created new case with name '{cleaned_name}', ID: {case_id}")
-
-                # Check if this platform's information already exists
-                check_platform_sql = """
-                SELECT case_id FROM case_information 
-                WHERE case_id = %(case_id)s AND platform = %(platform)s
-                """
-                cur.execute(check_platform_sql, {
-                    'case_id': case_id,
-                    'platform': 'backtohome'
-                })
-                existing_platform = cur.fetchone()
-
-                if not existing_platform:
-                    # Insert new case_information row
-                    info_sql = """
-                    INSERT INTO case_information (
-                        case_id, platform, picture, url, description, created_at
-                    ) VALUES (
-                        %(case_id)s, %(platform)s, %(picture)s, %(url)s, %(description)s, NOW()
-                    )
-                    """
-                    
-                    cur.execute(info_sql, {
-                        'case_id': case_id,
-                        'platform': 'backtohome',
-                        'picture': item['image_url'],
-                        'url': item['detail_link'],
-                        'description': item.get('detail')
-                    })
-                    print(f"Added new case information for platform 'backtohome' for case ID {case_id}")
-                else:
-                    # Update existing case information
-                    update_sql = """
-                    UPDATE case_information 
-                    SET picture = %(picture)s,
-                        url = %(url)s,
-                        description = %(description)s,
-                        created_at = NOW()
-                    WHERE case_id = %(case_id)s 
-                    AND platform = 'backtohome'
-                    AND (
-                        picture != %(picture)s 
-                        OR url != %(url)s 
-                        OR description != %(description)s
-                    )
-                    """
-                    cur.execute(update_sql, {
-                        'case_id': case_id,
-                        'platform': 'backtohome',
-                        'picture': item['image_url'],
-                        'url': item['detail_link'],
-                        'description': item.get('detail')
-                    })
-                    if cur.rowcount > 0:
-                        print(f"Updated existing case information for platform 'backtohome' for case ID {case_id}")
-                    else:
-                        print(f"No changes needed for case ID {case_id}")
-
+            cur.execute("DELETE FROM crawl_seen WHERE run_id = %s AND platform = 'backtohome'", (run_id,))
+            cur.execute("DELETE FROM crawl_shard WHERE run_id = %s AND platform = 'backtohome'", (run_id,))
+        
         conn.commit()
-        print(f"Successfully stored {len(items)} items in database")
+        return True
     except Exception as e:
-        print(f"Database error: {e}")
+        print(f"Database error reconciling run {run_id}: {e}")
         conn.rollback()
+        raise
     finally:
         conn.close()
 
-def main():
-    start_time = time.time()
-    total_pages = get_total_pages()
-    print(f"Total pages to process: {total_pages}")
+def fetch_listing_page(page, checkpoint=None):
+    """Fetch a listing page unless the checkpoint already has its items."""
+    if checkpoint:
+        items = checkpoint.page_items(page)
+        if items is not None:
+            return items
+    items = fetch_and_process_page(page)
+    if checkpoint:
+        checkpoint.page_done(page, items)
+    return items
+
+def crawl_pages(pages, deadline=None, checkpoint=None):
+    """Fetch the listings on the given pages along with their details.
+    
+    With a deadline, details of new and changed listings are fetched first
+    and fetching stops early enough to leave time for the DB sync. With a
+    checkpoint, pages and details fetched by an earlier attempt are reused.
+    """
+    # Threads do the network I/O and hand raw bytes to the parse processes
+    start_parse_pool()
+    try:
+        # First, collect all items from all pages
+        all_items = []
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            page_items = list(executor.map(lambda page: fetch_listing_page(page, checkpoint), pages))
+            all_items = [item for page_items in page_items for item in page_items]
+        
+        print(f"Collected {len(all_items)} total items from all pages")
+        
+        # Then, fetch details for all items
+        to_fetch = [item for item in all_items if not (checkpoint and checkpoint.restore_detail(item))]
+        if len(to_fetch) < len(all_items):
+            print(f"Reusing {len(all_items) - len(to_fetch)} details from checkpoint")
+        fetch_details(prioritize_items(to_fetch) if deadline else to_fetch, deadline, checkpoint)
+    finally:
+        stop_parse_pool()
+        if checkpoint:
+            checkpoint.flush()
     
-    # First, collect all items from all pages
-    all_items = []
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        page_items = list(executor.map(fetch_and_process_page, range(1, total_pages + 1)))
-        all_items = [item for page_items in page_items for item in page_items]
+    return all_items
+
+def plan_shards(pages_per_shard=SHARD_PAGES):
+    """Coordinator: split the listing pages into shard descriptors.
     
-    print(f"Collected {len(all_items)} total items from all pages")
+    Each shard is the event for one worker invocation; the returned
+    reconcile descriptor is the event for the final step.
+    """
+    total_pages = get_total_pages()
+    run_id = f"{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+    first_pages = range(1, total_pages + 1, pages_per_shard)
     
-    # Then, fetch details for all items
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = {executor.submit(fetch_detail, item): item for item in all_items}
-        for future in futures:
-            try:
-                future.result()
-            except Exception as e:
-                print(f"Error processing item: {e}")
+    shards = [
+        {
+            'mode': 'worker',
+            'run_id': run_id,
+            'shard': shard,
+            'first_page': first_page,
+            'last_page': min(first_page + pages_per_shard - 1, total_pages)
+        }
+        for shard, first_page in enumerate(first_pages)
+    ]
+    print(f"Run {run_id}: split {total_pages} pages into {len(shards)} shards")
     
-    # Finally, store all items in database at once
-    store_items_in_db(all_items)
+    return {
+        'run_id': run_id,
+        'shards': shards,
+        'reconcile': {'mode': 'reconcile', 'run_id': run_id, 'shard_count': len(shards)}
+    }
+
+def run_shard(shard, deadline=None):
+    """Worker: crawl one shard's page range and store it."""
+    start_time = time.time()
+    with profile_stage('crawl'):
+        items = crawl_pages(range(shard['first_page'], shard['last_page'] + 1), deadline)
+    with profile_stage('store'):
+        store_shard_in_db(shard['run_id'], shard['shard'], items, deadline)
     
     elapsed = time.time() - start_time
-    print(f"All done in {elapsed:.2f}s. Processed {len(all_items)} total items.")
+    print(f"Shard {shard['shard']} done in {elapsed:.2f}s. Processed {len(items)} items.")
+    return len(items)
+
+def main(deadline=None):
+    """Crawl every page and sync the database.
+    
+    Returns False without doing anything while another full run holds
+    the source's lock.
+    """
+    lock = acquire_run_lock()
+    if lock is None:
+        print("Another backtohome run is still in progress, skipping this one")
+        return False
+    
+    try:
+        start_time = time.time()
+        with profile_stage('total_pages'):
+            total_pages = get_total_pages()
+        print(f"Total pages to process: {total_pages} (HTML parser: {HTML_PARSER})")
+        
+        checkpoint = CrawlCheckpoint.open(total_pages)
+        with profile_stage('crawl'):
+            all_items = crawl_pages(range(1, total_pages + 1), deadline, checkpoint)
+        
+        # Finally, store all items in database at once
+        with profile_stage('store'):
+            store_items_in_db(all_items, deadline, checkpoint)
+        
+        elapsed = time.time() - start_time
+        print(f"All done in {elapsed:.2f}s. Processed {len(all_items)} total items.")
+    finally:
+        release_run_lock(lock)
+    return True
 
 def lambda_handler(event, context):
-    main()
+    start_profiling(event)
+    try:
+        return handle_event(event, context)
+    finally:
+        stop_profiling()
+
+def handle_event(event, context):
+    mode = (event or {}).get('mode')
+    deadline = deadline_from_context(context)
+    
+    # Sharded fan-out: the coordinator's shards feed a Map state of worker
+    # invocations, followed by a single reconcile invocation
+    if mode == 'coordinator':
+        return {'statusCode': 200, **plan_shards(event.get('pages_per_shard', SHARD_PAGES))}
+    if mode == 'worker':
+        processed = run_shard(event, deadline)
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'shard': event['shard'], 'processed': processed})
+        }
+    if mode == 'reconcile':
+        with profile_stage('reconcile'):
+            reconciled = reconcile_run(event['run_id'], event['shard_count'])
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'run_id': event['run_id'], 'reconciled': reconciled})
+        }
+    
+    if not main(deadline):
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'processed': 0, 'skipped': 'another run is in progress'})
+        }
     return {
         'statusCode': 200,
         'body': json.dumps('Lambda function executed successfully')
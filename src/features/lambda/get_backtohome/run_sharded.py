@@ -0,0 +1,61 @@
+"""Run the sharded backtohome crawl locally, one subprocess per worker.
+
+Simulates the Lambda fan-out without AWS: the coordinator plans shards
+in-process, each shard runs in its own Python process exactly as a worker
+invocation would, and the reconcile step runs once every worker exits.
+
+    python run_sharded.py --pages-per-shard 5 --parallel 4
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import get_backtohome
+
+def run_worker(shard):
+    """Run one shard in a subprocess and return (shard, exit code, seconds)."""
+    start_time = time.time()
+    result = subprocess.run(
+        [sys.executable, __file__, '--worker', json.dumps(shard)],
+        capture_output=True,
+        text=True
+    )
+    elapsed = time.time() - start_time
+    sys.stdout.write(result.stdout)
+    sys.stderr.write(result.stderr)
+    return shard['shard'], result.returncode, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages-per-shard', type=int, default=get_backtohome.SHARD_PAGES)
+    parser.add_argument('--parallel', type=int, default=4, help='worker processes running at once')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.worker:
+        get_backtohome.run_shard(json.loads(args.worker))
+        return 0
+    
+    start_time = time.time()
+    plan = get_backtohome.plan_shards(args.pages_per_shard)
+    
+    with ThreadPoolExecutor(max_workers=args.parallel) as executor:
+        results = list(executor.map(run_worker, plan['shards']))
+    
+    failed = [shard for shard, returncode, _ in results if returncode != 0]
+    for shard, returncode, elapsed in results:
+        print(f"Shard {shard}: exit {returncode} in {elapsed:.2f}s")
+    
+    reconcile = plan['reconcile']
+    reconciled = get_backtohome.reconcile_run(reconcile['run_id'], reconcile['shard_count'])
+    
+    elapsed = time.time() - start_time
+    print(f"Run {plan['run_id']}: {len(results)} shards, {len(failed)} failed, "
+          f"reconciled={reconciled}, total {elapsed:.2f}s")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,10 +1,20 @@
 import os
+import io
 import json
+import hashlib
+import bisect
+import mmap
+import struct
+import time
+import threading
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 import pymysql
 import re
+from pymysql.constants import CLIENT
 from datetime import datetime
 from dotenv import load_dotenv
+from contextlib import contextmanager, nullcontext
 # import boto3
 # from botocore.exceptions import ClientError
 
@@ -18,6 +28,312 @@ THAI_MONTHS = {
     "กันยายน": 9, "ตุลาคม": 10, "พฤศจิกายน": 11, "ธันวาคม": 12
 }
 
+# Database configuration
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': int(os.getenv('DB_PORT', 3306)),
+    'user': os.getenv('DB_USER', 'admin'),
+    'password': os.getenv('DB_PASSWORD', '12345678'),
+    'database': os.getenv('DB_NAME', 'missing_persons_db')
+}
+
+# Source API; point it at src/bench/replay_server.py for load tests
+API_URL = os.getenv('THAIMISSING_API_URL', "https://api.thaimissing.go.th/api/v1/cir-Datacatalog-web/DataMissingPerson")
+
+# Seconds before the Lambda deadline to stop writing rows and commit
+COMMIT_MARGIN = float(os.getenv('COMMIT_MARGIN', 10))
+
+# MySQL advisory lock that keeps overlapping scheduled runs apart
+RUN_LOCK_NAME = 'missing-alert-hub:thaimissing'
+
+# Opt-in per-stage profiling: comma-separated 'cprofile', 'tracemalloc' and/or 'sql'.
+# An event's 'profile' key overrides it for one run; see StageProfiler
+PROFILE = os.getenv('PROFILE', '')
+PROFILE_PATH = os.getenv('PROFILE_PATH', '/tmp/profiles')
+PROFILE_BUCKET = os.getenv('PROFILE_BUCKET')
+PROFILE_TOP = int(os.getenv('PROFILE_TOP', 15))
+PROFILER = None
+NO_PROFILE = nullcontext()
+# Statement stats per SQL template while profiling with 'sql', see ProfilingCursor
+SQL_STATS = {}
+SQL_STATS_LOCK = threading.Lock()
+# Slowest templates whose plans the SQL summary includes; 0 skips EXPLAIN
+SQL_EXPLAIN_TOP = int(os.getenv('SQL_EXPLAIN_TOP', 0))
+# cursorclass of every connection; start_profiling swaps in ProfilingCursor
+DB_CURSOR = pymysql.cursors.DictCursor
+
+# Rows written per transaction during the DB sync
+DB_BATCH_SIZE = int(os.getenv('DB_BATCH_SIZE', 200))
+
+# Connections that write a sync's rows in parallel, see write_partitioned
+DB_WRITERS = int(os.getenv('DB_WRITERS', 1))
+
+# 'bulk' applies full syncs through a staging table, 'batched' row by row
+SYNC_MODE = os.getenv('SYNC_MODE', 'bulk')
+
+# Last synced {external_id: [content_hash, name]} and API payload digest
+SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH', '/tmp/thaimissing_snapshot.json')
+SNAPSHOT_TTL = float(os.getenv('SNAPSHOT_TTL', 24 * 3600))
+
+# Warm-container cache of the stored cases, see CaseIndex
+CASE_CACHE_PATH = os.getenv('CASE_CACHE_PATH', '/tmp/thaimissing_cases.bin')
+CASE_CACHE_HEADER = struct.Struct('<4sqqq')      # magic and the probe_case_information values
+CASE_CACHE_RECORD = struct.Struct('<q16s16s')    # case id, name digest, content digest
+
+def acquire_run_lock():
+    """Take this source's advisory lock without waiting for it.
+    
+    Returns the connection holding the lock, or None when another run
+    holds it. GET_LOCK belongs to the session, so the lock is held until
+    release_run_lock() or until the connection drops, e.g. when the
+    Lambda is killed mid-run.
+    """
+    conn = pymysql.connect(
+        **DB_CONFIG,
+        cursorclass=DB_CURSOR
+    )
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT GET_LOCK(%s, 0) AS acquired", (RUN_LOCK_NAME,))
+            acquired = cur.fetchone()['acquired'] == 1
+    except Exception:
+        conn.close()
+        raise
+    if not acquired:
+        conn.close()
+        return None
+    return conn
+
+def release_run_lock(conn):
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT RELEASE_LOCK(%s)", (RUN_LOCK_NAME,))
+    finally:
+        conn.close()
+
+def deadline_from_context(context):
+    """Return the invocation's deadline on the time.monotonic() clock, or None."""
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return None
+    return time.monotonic() + context.get_remaining_time_in_millis() / 1000
+
+def past_deadline(deadline, margin):
+    return deadline is not None and time.monotonic() > deadline - margin
+
+class StageProfiler:
+    """Profiles each pipeline stage run under stage(name).
+    
+    tools holds 'cprofile' and/or 'tracemalloc'. After every stage a
+    top-PROFILE_TOP summary is printed and the full dumps (a pstats file
+    and the top allocations) are written under PROFILE_PATH, and uploaded
+    to PROFILE_BUCKET when it is set. cProfile only sees the thread that
+    runs the stage, so time spent in worker threads and processes shows up
+    as waits.
+    """
+    
+    def __init__(self, tools):
+        # Imported here so runs without profiling never load them
+        import cProfile
+        import tracemalloc
+        self.cProfile = cProfile
+        self.tracemalloc = tracemalloc
+        self.tools = tools
+        self.run_id = f"thaimissing-{datetime.now():%Y%m%d%H%M%S}-{os.getpid()}"
+        self.path = os.path.join(PROFILE_PATH, self.run_id)
+        os.makedirs(self.path, exist_ok=True)
+    
+    @contextmanager
+    def stage(self, name):
+        profile = self.cProfile.Profile() if 'cprofile' in self.tools else None
+        tracing = 'tracemalloc' in self.tools and not self.tracemalloc.is_tracing()
+        if tracing:
+            self.tracemalloc.start()
+        start = time.perf_counter()
+        if profile:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile:
+                profile.disable()
+            elapsed = time.perf_counter() - start
+            snapshot = peak = None
+            if tracing:
+                snapshot = self.tracemalloc.take_snapshot()
+                peak = self.tracemalloc.get_traced_memory()[1]
+                self.tracemalloc.stop()
+            print(f"[profile] stage {name}: {elapsed:.2f}s")
+            self.report_profile(name, profile)
+            self.report_allocations(name, snapshot, peak)
+    
+    def report_profile(self, name, profile):
+        if profile is None:
+            return
+        import pstats
+        summary = io.StringIO()
+        stats = pstats.Stats(profile, stream=summary)
+        stats.sort_stats('cumulative').print_stats(PROFILE_TOP)
+        print(summary.getvalue().rstrip())
+        dump_path = os.path.join(self.path, f"{name}.pstats")
+        stats.dump_stats(dump_path)
+        self.upload(dump_path)
+    
+    def report_allocations(self, name, snapshot, peak):
+        if snapshot is None:
+            return
+        snapshot = snapshot.filter_traces([
+            self.tracemalloc.Filter(False, self.tracemalloc.__file__),
+            self.tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ])
+        top = snapshot.statistics('lineno')
+        print(f"[profile] stage {name}: peak traced memory {peak / 1024 / 1024:.1f} MiB, top allocations:")
+        for stat in top[:PROFILE_TOP]:
+            print(f"  {stat}")
+        dump_path = os.path.join(self.path, f"{name}.allocations.txt")
+        with open(dump_path, 'w') as f:
+            f.write(f"peak {peak}\n")
+            f.writelines(f"{stat}\n" for stat in top[:PROFILE_TOP * 10])
+        self.upload(dump_path)
+    
+    def upload(self, path):
+        if not PROFILE_BUCKET:
+            return
+        # boto3 ships with the Lambda Python runtime
+        import boto3
+        key = f"profiles/{self.run_id}/{os.path.basename(path)}"
+        boto3.client('s3').upload_file(path, PROFILE_BUCKET, key)
+
+def start_profiling(event=None):
+    """Turn on profiling for this run from the event's 'profile' key or PROFILE."""
+    global PROFILER, DB_CURSOR
+    tools = (event or {}).get('profile', PROFILE)
+    if isinstance(tools, str):
+        tools = tools.split(',')
+    tools = {tool.strip() for tool in tools if tool and tool.strip()}
+    unknown = tools - {'cprofile', 'tracemalloc', 'sql'}
+    if unknown:
+        print(f"Ignoring unknown profiling tools: {', '.join(sorted(unknown))}")
+    tools -= unknown
+    PROFILER = StageProfiler(tools) if tools else None
+    DB_CURSOR = ProfilingCursor if 'sql' in tools else pymysql.cursors.DictCursor
+    SQL_STATS.clear()
+    if PROFILER:
+        print(f"Profiling stages with {', '.join(sorted(tools))} into {PROFILER.path}")
+
+def stop_profiling():
+    """Print the SQL summary when profiling 'sql', and turn profiling off."""
+    global PROFILER, DB_CURSOR
+    if DB_CURSOR is ProfilingCursor:
+        report_sql_profile()
+    PROFILER = None
+    DB_CURSOR = pymysql.cursors.DictCursor
+
+def profile_stage(name):
+    """Context manager profiling a pipeline stage; does nothing unless profiling is on."""
+    return PROFILER.stage(name) if PROFILER else NO_PROFILE
+
+SQL_LITERAL = re.compile(r"(?:_binary)?'(?:[^'\\]|\\.)*'|\b\d+(?:\.\d+)?(?:e[+-]?\d+)?\b|\bNULL\b", re.I)
+SQL_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+SQL_REPEATED_LISTS = re.compile(r"\(\?, \.\.\.\)(?:\s*,\s*\(\?, \.\.\.\))+")
+SQL_STATEMENT = re.compile(r"(?:'(?:[^'\\]|\\.)*'|[^;'])+")
+
+def sql_template(query):
+    """Reduce a statement to its shape: literals become ?, value lists and repeats collapse."""
+    template = SQL_LITERAL.sub('?', query)
+    template = SQL_VALUE_LIST.sub('(?, ...)', template)
+    template = SQL_REPEATED_LISTS.sub('(?, ...), ...', template)
+    statements = [' '.join(statement.split()) for statement in template.split(';')]
+    # A multi-statement batch is the same template however many rows it carries
+    return '; '.join(dict.fromkeys(statement for statement in statements if statement))
+
+def record_sql(query, elapsed, rows, sent):
+    template = sql_template(query)
+    with SQL_STATS_LOCK:
+        stats = SQL_STATS.get(template)
+        if stats is None:
+            stats = SQL_STATS[template] = {
+                'count': 0, 'total': 0.0, 'latencies': [], 'rows': 0, 'bytes': 0, 'slowest': 0.0, 'sample': query
+            }
+        stats['count'] += 1
+        stats['total'] += elapsed
+        stats['latencies'].append(elapsed)
+        stats['rows'] += max(rows, 0)
+        stats['bytes'] += sent
+        if elapsed >= stats['slowest']:
+            stats['slowest'] = elapsed
+            stats['sample'] = query
+
+class ProfilingCursor(pymysql.cursors.DictCursor):
+    """DictCursor that records every statement it sends in SQL_STATS.
+    
+    Installed as the connections' cursorclass while profiling with 'sql'.
+    Hooks _query, which execute, executemany and callproc all go through,
+    so each round trip is timed once with the SQL actually sent.
+    """
+    
+    def _query(self, q):
+        start = time.perf_counter()
+        try:
+            return super()._query(q)
+        finally:
+            elapsed = time.perf_counter() - start
+            encoding = self._get_db().encoding
+            # executemany's multi-row rewrite sends bytes
+            if isinstance(q, (bytes, bytearray)):
+                record_sql(q.decode(encoding, 'replace'), elapsed, self.rowcount, len(q))
+            else:
+                record_sql(q, elapsed, self.rowcount, len(q.encode(encoding)))
+
+def report_sql_profile():
+    """Print the statement templates ranked by total time, with EXPLAIN for the slowest."""
+    with SQL_STATS_LOCK:
+        ranked = sorted(SQL_STATS.items(), key=lambda entry: entry[1]['total'], reverse=True)
+    if not ranked:
+        print("[profile] No SQL statements recorded")
+        return
+    
+    print(f"[profile] {sum(stats['count'] for _, stats in ranked)} SQL statements in "
+          f"{sum(stats['total'] for _, stats in ranked):.2f}s across {len(ranked)} templates:")
+    print(f"{'count':>7} {'total s':>9} {'mean ms':>9} {'p95 ms':>9} {'rows':>9} {'bytes':>11}  template")
+    for template, stats in ranked[:PROFILE_TOP]:
+        latencies = sorted(stats['latencies'])
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"{stats['count']:>7} {stats['total']:>9.3f} {stats['total'] / stats['count'] * 1000:>9.2f} "
+              f"{p95 * 1000:>9.2f} {stats['rows']:>9} {stats['bytes']:>11}  {template[:200]}")
+    
+    if SQL_EXPLAIN_TOP:
+        explain_statements([(template, stats['sample']) for template, stats in ranked[:SQL_EXPLAIN_TOP]])
+
+def explain_statements(statements):
+    """Print the plan of the slowest sample of each (template, query).
+    
+    Only the first statement of a multi-statement batch is explained, and
+    statements on temporary tables of the profiled run cannot be.
+    """
+    conn = pymysql.connect(
+        **DB_CONFIG,
+        cursorclass=pymysql.cursors.DictCursor
+    )
+    
+    try:
+        with conn.cursor() as cur:
+            for template, query in statements:
+                statement = next((s.strip() for s in SQL_STATEMENT.findall(query) if s.strip()), '')
+                print(f"[profile] EXPLAIN {template[:200]}")
+                if statement.split(None, 1)[0].upper() not in ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE'):
+                    print("  not explainable")
+                    continue
+                try:
+                    cur.execute(f"EXPLAIN {statement}")
+                except pymysql.MySQLError as e:
+                    print(f"  EXPLAIN failed: {e}")
+                    continue
+                for row in cur.fetchall():
+                    print(f"  {row.get('table')}: type={row.get('type')} key={row.get('key')} "
+                          f"rows={row.get('rows')} filtered={row.get('filtered')} extra={row.get('Extra')}")
+    finally:
+        conn.close()
+
 def parse_thai_date(date_str):
     try:
         if not date_str:
@@ -58,217 +374,746 @@ def remove_thai_honorific(name):
     
     return processed_name or 'ไม่ระบุ'
 
-def store_items_in_db(items):
-    """Store items in the database."""
-    conn = pymysql.connect(
-        host=os.getenv('DB_HOST', 'localhost'),
-        port=int(os.getenv('DB_PORT', 3306)),
-        user=os.getenv('DB_USER', 'admin'),
-        password=os.getenv('DB_PASSWORD', '12345678'),
-        database=os.getenv('DB_NAME', 'missing_persons_db'),
-        cursorclass=pymysql.cursors.DictCursor
+def parse_age(value):
+    try:
+        return int("".join(re.findall(r"\d", value)))
+    except:
+        return None
+
+def parse_record(rec):
+    """Turn one API record into the item stored by store_items_in_db."""
+    return {
+        'full_name': rec.get('fullName'),
+        'nationality': rec.get('nationality'),
+        'age_missing': parse_age(rec.get('ageMissing')),
+        'age_current': parse_age(rec.get('ageCurrent')),
+        'age_inform': parse_age(rec.get('ageInform')),
+        'gender': rec.get('sex'),
+        'missing_date': parse_thai_date(rec.get('missingDate')),
+        'missing_time': parse_thai_time(rec.get('missingTime')),
+        'missing_location': rec.get('missingLocation'),
+        'inform_location': rec.get('informLocation'),
+        'photo_url': rec.get('image'),
+        'source_url': rec.get('url')
+    }
+
+def record_changes(cur, changes):
+    """Append (case_id, change_type) events for thaimissing to case_outbox.
+    
+    Runs on the cursor that made the changes, so the events commit or
+    roll back together with them.
+    """
+    if changes:
+        cur.executemany("""
+        INSERT INTO case_outbox (case_id, platform, change_type)
+        VALUES (%s, %s, %s)
+        """, [(case_id, 'thaimissing', change_type) for case_id, change_type in changes])
+
+def deactivate_cases(cur, case_ids):
+    """Mark cases inactive, drop their thaimissing rows and delete orphaned cases."""
+    # Mark cases as inactive by updating case_information
+    update_sql = """
+    UPDATE case_information 
+    SET description = CONCAT(COALESCE(description, ''), '\n[INACTIVE - No longer found in source]'),
+        created_at = NOW()
+    WHERE case_id IN %(case_ids)s AND platform = 'thaimissing'
+    """
+    cur.execute(update_sql, {'case_ids': tuple(case_ids)})
+    record_changes(cur, [(case_id, 'deactivated') for case_id in case_ids])
+    print(f"Marked {len(case_ids)} old cases as inactive")
+    
+    # Delete marked cases from case_information
+    delete_marked_sql = """
+    DELETE FROM case_information 
+    WHERE case_id IN %(case_ids)s AND platform = 'thaimissing'
+    """
+    cur.execute(delete_marked_sql, {'case_ids': tuple(case_ids)})
+    print(f"Deleted {len(case_ids)} marked cases from case_information")
+    
+    # Find and delete orphaned cases (cases with no case_information). Cases
+    # that were posted or claimed keep their row: posted_case references them
+    # and the post history outlives the source listing.
+    delete_orphaned_sql = """
+    DELETE FROM cases 
+    WHERE id IN %(case_ids)s 
+    AND NOT EXISTS (
+        SELECT 1 FROM case_information 
+        WHERE case_id = cases.id
     )
+    AND NOT EXISTS (
+        SELECT 1 FROM posted_case
+        WHERE case_id = cases.id
+    )
+    """
+    cur.execute(delete_orphaned_sql, {'case_ids': tuple(case_ids)})
+    print(f"Deleted orphaned cases from cases table")
+
+def build_description(item):
+    """Create description from available information."""
+    description_parts = []
+    if item.get('nationality'):
+        description_parts.append(f"สัญชาติ: {item['nationality']}")
+    if item.get('age_missing'):
+        description_parts.append(f"อายุขณะหายตัว: {item['age_missing']} ปี")
+    if item.get('age_current'):
+        description_parts.append(f"อายุปัจจุบัน: {item['age_current']} ปี")
+    if item.get('gender'):
+        description_parts.append(f"เพศ: {item['gender']}")
+    if item.get('missing_date'):
+        description_parts.append(f"วันที่หายตัว: {item['missing_date']}")
+    if item.get('missing_time'):
+        description_parts.append(f"เวลาที่หายตัว: {item['missing_time']}")
+    if item.get('missing_location'):
+        description_parts.append(f"สถานที่หายตัว: {item['missing_location']}")
+    if item.get('inform_location'):
+        description_parts.append(f"สถานที่แจ้งเหตุ: {item['inform_location']}")
+    
+    return "\n".join(description_parts) if description_parts else None
+
+def write_batches(conn, items, write_item, deadline=None, write_chunk=None):
+    """Write items with write_item(cur, item), committing every DB_BATCH_SIZE rows.
+    
+    A chunk that fails is rolled back and retried row by row, each row
+    under its own savepoint, so a bad row costs only that row. No new
+    chunk is started within COMMIT_MARGIN seconds of the deadline.
+    
+    With write_chunk(cur, chunk), each chunk is first written in one call
+    that returns the write_item results for the whole chunk.
+    
+    Returns (written, rejected): (item, write_item result) pairs for the
+    committed rows and (item, error) pairs for the rejected ones.
+    """
+    written = []
+    rejected = []
+    for start in range(0, len(items), DB_BATCH_SIZE):
+        if past_deadline(deadline, COMMIT_MARGIN):
+            print(f"Deadline approaching, stopping after {len(written)} items")
+            break
+        chunk = items[start:start + DB_BATCH_SIZE]
+        
+        try:
+            with conn.cursor() as cur:
+                if write_chunk:
+                    results = list(zip(chunk, write_chunk(cur, chunk)))
+                else:
+                    results = [(item, write_item(cur, item)) for item in chunk]
+            conn.commit()
+            written.extend(results)
+            continue
+        except Exception as e:
+            conn.rollback()
+            print(f"Batch of {len(chunk)} items failed ({e}), retrying row by row")
+        
+        with conn.cursor() as cur:
+            for item in chunk:
+                cur.execute("SAVEPOINT sync_item")
+                try:
+                    result = write_item(cur, item)
+                    cur.execute("RELEASE SAVEPOINT sync_item")
+                    written.append((item, result))
+                except Exception as e:
+                    cur.execute("ROLLBACK TO SAVEPOINT sync_item")
+                    rejected.append((item, str(e)))
+                    print(f"Rejected item '{item.get('full_name')}': {e}")
+        conn.commit()
+    
+    return written, rejected
+
+def resolve_case_ids(cur, names):
+    """Return {name: case_id} for the cleaned names, creating the missing cases.
+    
+    Cases are keyed on the unique name_key, so neither lambda can create a
+    case the other is creating at the same time. Names are inserted in
+    sorted order so that concurrent writers lock keys in the same order
+    and cannot deadlock each other.
+    
+    The ids are read with a locking read: a plain SELECT would read the
+    transaction's snapshot, which misses a case the other lambda committed
+    after the snapshot was taken even though the INSERT just hit it.
+    LOCK IN SHARE MODE rather than FOR SHARE keeps this working on MySQL 5.7.
+    """
+    names = sorted(set(names))
+    if not names:
+        return {}
+    # One multi-row INSERT; executemany only rewrites plain placeholder rows
+    values = ',\n'.join(cur.mogrify("(%s, %s, NOW())", (name, name)) for name in names)
+    cur.execute(f"""
+    INSERT INTO cases (name, name_key, created_at)
+    VALUES {values}
+    ON DUPLICATE KEY UPDATE id = id
+    """)
+    cur.execute("SELECT id, name_key FROM cases WHERE name_key IN %(names)s LOCK IN SHARE MODE", {'names': tuple(names)})
+    return {row['name_key']: row['id'] for row in cur.fetchall()}
+
+# Affected-row counts of an INSERT ... ON DUPLICATE KEY UPDATE
+UPSERT_OUTCOMES = {0: 'unchanged', 1: 'inserted', 2: 'updated'}
+
+def upsert_items(cur, items):
+    """Upsert a chunk of items in a fixed number of round trips.
+    
+    Case ids are resolved in bulk with resolve_case_ids, then every item's
+    INSERT ... ON DUPLICATE KEY UPDATE of its thaimissing case_information
+    row is sent, in case id order, as a single multi-statement query; the
+    connection must be opened with CLIENT.MULTI_STATEMENTS. The affected
+    row count of each upsert is read back with nextset().
+    
+    Every insert or real change is recorded in case_outbox.
+    
+    Returns 'inserted', 'updated' or 'unchanged' for each item.
+    """
+    names = [remove_thai_honorific(item['full_name']) for item in items]
+    case_ids = resolve_case_ids(cur, names)
+    missing = [name for name in names if name not in case_ids]
+    if missing:
+        # Rejected like a failed row rather than aborting the whole sync
+        raise LookupError(f"No case id resolved for {', '.join(repr(name) for name in missing)}")
+    order = sorted(range(len(items)), key=lambda i: case_ids[names[i]])
     
+    statements = []
+    for i in order:
+        item = items[i]
+        # created_at only moves when the content changed
+        statements.append(cur.mogrify("""
+        INSERT INTO case_information (case_id, platform, picture, url, description, created_at)
+        VALUES (%(case_id)s, 'thaimissing', %(picture)s, %(url)s, %(description)s, NOW())
+        ON DUPLICATE KEY UPDATE
+            created_at = IF(
+                picture <=> VALUES(picture)
+                AND url <=> VALUES(url)
+                AND description <=> VALUES(description),
+                created_at, NOW()
+            ),
+            picture = VALUES(picture),
+            url = VALUES(url),
+            description = VALUES(description)
+        """, {
+            'case_id': case_ids[names[i]],
+            'picture': item['photo_url'],
+            'url': item['source_url'],
+            'description': build_description(item)
+        }))
+    
+    cur.execute(';'.join(statements))
+    outcomes = [None] * len(items)
+    for position, i in enumerate(order):
+        if position:
+            cur.nextset()
+        outcomes[i] = UPSERT_OUTCOMES[cur.rowcount]
+    
+    record_changes(cur, [
+        (case_ids[names[i]], outcomes[i]) for i in order if outcomes[i] != 'unchanged'
+    ])
+    return outcomes
+
+def upsert_one(cur, item):
+    """upsert_items for a single item, used when a chunk is retried row by row."""
+    return upsert_items(cur, [item])[0]
+
+def write_partitioned(conn, items, deadline=None):
+    """Write items with upsert_items over DB_WRITERS connections in parallel.
+    
+    The sorted cleaned names are split into DB_WRITERS contiguous ranges
+    and each range's items are written and committed by their own
+    connection with write_batches. Every chunk creates its cases in the
+    same transaction as their case_information rows, so a writer that
+    fails or stops at the deadline leaves no case without information
+    behind. Partitions share no names, and their cases fall in disjoint
+    ranges of the name_key index, so the writers rarely wait on each
+    other's locks.
+    
+    Returns (written, rejected) like write_batches.
+    """
+    if DB_WRITERS < 2 or len(items) <= DB_BATCH_SIZE:
+        return write_batches(conn, items, upsert_one, deadline, write_chunk=upsert_items)
+    
+    names = sorted({remove_thai_honorific(item['full_name']) for item in items})
+    partition_of = {name: position * DB_WRITERS // len(names) for position, name in enumerate(names)}
+    partitions = [[] for _ in range(DB_WRITERS)]
+    for item in items:
+        partitions[partition_of[remove_thai_honorific(item['full_name'])]].append(item)
+    
+    def write_partition(partition):
+        writer = pymysql.connect(
+            **DB_CONFIG,
+            cursorclass=DB_CURSOR,
+            client_flag=CLIENT.MULTI_STATEMENTS
+        )
+        try:
+            return write_batches(writer, partition, upsert_one, deadline, write_chunk=upsert_items)
+        finally:
+            writer.close()
+    
+    with ThreadPoolExecutor(max_workers=DB_WRITERS) as executor:
+        results = list(executor.map(write_partition, [partition for partition in partitions if partition]))
+    print(f"Wrote {len(items)} items over {len(results)} connections")
+    written = [pair for partition_written, _ in results for pair in partition_written]
+    rejected = [pair for _, partition_rejected in results for pair in partition_rejected]
+    return written, rejected
+
+def content_hash(*values):
+    """MD5 of the non-NULL values, same as MD5(CONCAT_WS(CHAR(31), ...)) in MySQL."""
+    return hashlib.md5('\x1f'.join(v for v in values if v is not None).encode('utf-8')).hexdigest()
+
+def snapshot_entry(item):
+    """Return (external_id, [content_hash, cleaned_name]) for a record."""
+    name = remove_thai_honorific(item['full_name'])
+    return item.get('source_url') or name, [
+        content_hash(name, item['photo_url'], item['source_url'], build_description(item)),
+        name
+    ]
+
+def load_snapshot():
+    """Return the last synced snapshot, or None if there is none to diff against.
+    
+    The snapshot is only trusted while the database still matches it: the
+    probe_case_information taken when it was saved must match a fresh
+    one. Rows written by another container, a sharded run or by hand
+    therefore force a full sync instead of being hidden by the snapshot.
+    """
+    try:
+        with open(SNAPSHOT_PATH, encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if time.time() - snapshot['taken_at'] > SNAPSHOT_TTL:
+        print("Snapshot is older than SNAPSHOT_TTL, running a full sync")
+        return None
+    
+    conn = pymysql.connect(
+        **DB_CONFIG,
+        cursorclass=DB_CURSOR
+    )
     try:
         with conn.cursor() as cur:
-            # Get all existing case IDs and names for this platform
-            existing_cases_sql = """
-            SELECT c.id, c.name 
-            FROM cases c
-            JOIN case_information ci ON c.id = ci.case_id
-            WHERE ci.platform = 'thaimissing'
-            """
-            cur.execute(existing_cases_sql)
-            existing_cases = cur.fetchall()
-            
-            # Create a set of new case names for comparison
-            new_case_names = {remove_thai_honorific(item['full_name']) for item in items}
-            
-            # Find cases to mark as inactive (those that don't exist in new data)
-            cases_to_mark = [
-                case['id'] for case in existing_cases 
-                if case['name'] not in new_case_names
-            ]
-            
-            # Mark cases as inactive by updating case_information
-            if cases_to_mark:
-                update_sql = """
-                UPDATE case_information 
-                SET description = CONCAT(COALESCE(description, ''), '\n[INACTIVE - No longer found in source]'),
-                    created_at = NOW()
-                WHERE case_id IN %(case_ids)s AND platform = 'thaimissing'
-                """
-                cur.execute(update_sql, {'case_ids': tuple(cases_to_mark)})
-                print(f"Marked {len(cases_to_mark)} old cases as inactive")
-                
-                # Delete marked cases from case_information
-                delete_marked_sql = """
-                DELETE FROM case_information 
-                WHERE case_id IN %(case_ids)s AND platform = 'thaimissing'
-                """
-                cur.execute(delete_marked_sql, {'case_ids': tuple(cases_to_mark)})
-                print(f"Deleted {len(cases_to_mark)} marked cases from case_information")
-                
-                # Find and delete orphaned cases (cases with no case_information)
-                delete_orphaned_sql = """
-                DELETE FROM cases 
-                WHERE id IN %(case_ids)s 
-                AND NOT EXISTS (
-                    SELECT 1 FROM case_information 
-                    WHERE case_id = cases.id
-                )
-                """
-                cur.execute(delete_orphaned_sql, {'case_ids': tuple(cases_to_mark)})
-                print(f"Deleted orphaned cases from cases table")
-            
-            # Process new items
-            for item in items:
-                cleaned_name = remove_thai_honorific(item['full_name'])
-                
-                # Check if case with same name exists
-                check_sql = """
-                SELECT id FROM cases WHERE name = %(name)s
-                """
-                cur.execute(check_sql, {'name': cleaned_name})
-                result = cur.fetchone()
-                
-                if result:
-                    # Use existing case ID
-                    case_id = result['id']
-                    print(f"Found existing case with name '{cleaned_name}', using ID: {case_id}")
-                else:
-                    # Insert new case
-                    case_sql = """
-                    INSERT INTO cases (name, created_at)
-                    VALUES (%(name)s, NOW())
-                    """
-                    cur.execute(case_sql, {'name': cleaned_name})
-                    case_id = cur.lastrowid
-                    print(f"Created new case with name '{cleaned_name}', ID: {case_id}")
-
-                # Create description from available information
-                description_parts = []
-                if item.get('nationality'):
-                    description_parts.append(f"สัญชาติ: {item['nationality']}")
-                if item.get('age_missing'):
-                    description_parts.append(f"อายุขณะหายตัว: {item['age_missing']} ปี")
-                if item.get('age_current'):
-                    description_parts.append(f"อายุปัจจุบัน: {item['age_current']} ปี")
-                if item.get('gender'):
-                    description_parts.append(f"เพศ: {item['gender']}")
-                if item.get('missing_date'):
-                    description_parts.append(f"วันที่หายตัว: {item['missing_date']}")
-                if item.get('missing_time'):
-                    description_parts.append(f"เวลาที่หายตัว: {item['missing_time']}")
-                if item.get('missing_location'):
-                    description_parts.append(f"สถานที่หายตัว: {item['missing_location']}")
-                if item.get('inform_location'):
-                    description_parts.append(f"สถานที่แจ้งเหตุ: {item['inform_location']}")
-                
-                description = "\n".join(description_parts) if description_parts else None
-
-                # Check if this platform's information already exists
-                check_platform_sql = """
-                SELECT case_id FROM case_information 
-                WHERE case_id = %(case_id)s AND platform = %(platform)s
-                """
-                cur.execute(check_platform_sql, {
-                    'case_id': case_id,
-                    'platform': 'thaimissing'
-                })
-                existing_platform = cur.fetchone()
-
-                if not existing_platform:
-                    # Insert new case_information row
-                    info_sql = """
-                    INSERT INTO case_information (
-                        case_id, platform, picture, url, description, created_at
-                    ) VALUES (
-                        %(case_id)s, %(platform)s, %(picture)s, %(url)s, %(description)s, NOW()
-                    )
-                    """
-                    
-                    cur.execute(info_sql, {
-                        'case_id': case_id,
-                        'platform': 'thaimissing',
-                        'picture': item['photo_url'],
-                        'url': item['source_url'],
-                        'description': description
-                    })
-                    print(f"Added new case information for platform 'thaimissing' for case ID {case_id}")
-                else:
-                    # Update existing case information
-                    update_sql = """
-                    UPDATE case_information 
-                    SET picture = %(picture)s,
-                        url = %(url)s,
-                        description = %(description)s,
-                        created_at = NOW()
-                    WHERE case_id = %(case_id)s AND platform = 'thaimissing'
-                    """
-                    cur.execute(update_sql, {
-                        'case_id': case_id,
-                        'picture': item['photo_url'],
-                        'url': item['source_url'],
-                        'description': description
-                    })
-                    print(f"Updated existing case information for platform 'thaimissing' for case ID {case_id}")
+            probe = probe_case_information(cur)
+    finally:
+        conn.close()
+    if not probe_matches(snapshot.get('probe'), probe):
+        print("Database changed since the snapshot was taken, running a full sync")
+        return None
+    return snapshot
+
+def save_snapshot(records, digest=None, probe=None):
+    """Save the synced records with the probe_case_information of the database they match."""
+    tmp_path = f"{SNAPSHOT_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'taken_at': time.time(), 'digest': digest, 'probe': probe, 'records': records}, f, ensure_ascii=False)
+    os.replace(tmp_path, SNAPSHOT_PATH)
+
+def diff_snapshot(previous, items):
+    """Compare this run's items with the previous snapshot in one pass.
+    
+    Returns (current, inserts, updates, removed): the external_id -> entry
+    map for this run, the new and changed items, and the names of cases
+    that are no longer listed.
+    """
+    current = {}
+    inserts = []
+    updates = []
+    for item in items:
+        external_id, entry = snapshot_entry(item)
+        current[external_id] = entry
+        if external_id not in previous:
+            inserts.append(item)
+        elif previous[external_id] != entry:
+            updates.append(item)
+    
+    current_names = {entry[1] for entry in current.values()}
+    removed = {
+        entry[1] for external_id, entry in previous.items()
+        if external_id not in current and entry[1] not in current_names
+    }
+    return current, inserts, updates, removed
+
+def deactivate_names(cur, names):
+    """Deactivate the thaimissing cases with the given cleaned names."""
+    cur.execute("""
+    SELECT c.id
+    FROM cases c
+    JOIN case_information ci ON c.id = ci.case_id
+    WHERE ci.platform = 'thaimissing' AND c.name_key IN %(names)s
+    """, {'names': tuple(names)})
+    cases_to_mark = [row['id'] for row in cur.fetchall()]
+    if cases_to_mark:
+        deactivate_cases(cur, cases_to_mark)
+
+class CaseIndex:
+    """Stored thaimissing cases as sorted fixed-width records, memory-mapped from CASE_CACHE_PATH.
+    
+    Each record is (case id, MD5 of the name, MD5 of name/picture/url/description),
+    sorted by name digest, so a lookup is a binary search over the mapped
+    file and nothing is parsed up front.
+    """
+    
+    MAGIC = b'CIX2'
+    
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, *self.probe = CASE_CACHE_HEADER.unpack_from(self._map)
+        if magic != self.MAGIC:
+            raise ValueError(f"{path} is not a case cache")
+    
+    def __len__(self):
+        return (len(self._map) - CASE_CACHE_HEADER.size) // CASE_CACHE_RECORD.size
+    
+    def __getitem__(self, i):
+        # Only the name digest, which is all bisect needs
+        offset = CASE_CACHE_HEADER.size + i * CASE_CACHE_RECORD.size + 8
+        return self._map[offset:offset + 16]
+    
+    def __iter__(self):
+        return CASE_CACHE_RECORD.iter_unpack(memoryview(self._map)[CASE_CACHE_HEADER.size:])
+    
+    def get(self, name):
+        """Return (case_id, content_digest) of the lowest case id with this name, or None."""
+        digest = hashlib.md5(name.encode('utf-8')).digest()
+        i = bisect.bisect_left(self, digest)
+        if i < len(self) and self[i] == digest:
+            case_id, _, content_digest = CASE_CACHE_RECORD.unpack_from(
+                self._map, CASE_CACHE_HEADER.size + i * CASE_CACHE_RECORD.size
+            )
+            return case_id, content_digest
+        return None
+    
+    def state(self, name, digest):
+        """Return 0 for a new name, 1 if the stored content differs from the hex digest, 2 if unchanged."""
+        stored = self.get(name)
+        if stored is None:
+            return 0
+        return 2 if stored[1].hex() == digest else 1
+    
+    def missing_ids(self, names):
+        """Return the ids of the cached cases whose name is not among names."""
+        listed = {hashlib.md5(name.encode('utf-8')).digest() for name in names}
+        return [case_id for case_id, name_digest, _ in self if name_digest not in listed]
+
+def probe_case_information(cur):
+    """Return [count, latest, seq] for the thaimissing rows: COUNT(*) and
+    MAX(created_at) of case_information, and the last case_outbox seq.
+    
+    Every write either changes the row count or sets created_at to NOW(),
+    so an unchanged probe means unchanged rows. A write in the same second
+    as the newest row would not move MAX(created_at), but every real
+    change the lambdas make also records an outbox event, which moves seq.
+    """
+    cur.execute("""
+    SELECT COUNT(*) AS count,
+           COALESCE(UNIX_TIMESTAMP(MAX(created_at)), 0) AS latest,
+           (SELECT COALESCE(MAX(seq), 0) FROM case_outbox WHERE platform = 'thaimissing') AS seq
+    FROM case_information
+    WHERE platform = 'thaimissing'
+    """)
+    probe = cur.fetchone()
+    return [probe['count'], int(probe['latest']), probe['seq']]
+
+def probe_matches(stored, current):
+    """Whether nothing was written since the stored probe was taken."""
+    return stored is not None and list(stored) == list(current)
+
+def load_case_index(cur):
+    """Return a CaseIndex of the thaimissing cases in the database.
+    
+    A warm container reuses the cache in CASE_CACHE_PATH while
+    probe_case_information matches the probe it was built with, and only
+    rebuilds it otherwise.
+    """
+    probe = probe_case_information(cur)
+    
+    try:
+        index = CaseIndex(CASE_CACHE_PATH)
+        if probe_matches(index.probe, probe):
+            print(f"Using cached index of {len(index)} existing cases")
+            return index
+    except (FileNotFoundError, ValueError, struct.error):
+        pass
+    
+    # Rows are sorted server-side and streamed straight into the file, so
+    # memory does not grow with the number of cases
+    tmp_path = f"{CASE_CACHE_PATH}.{os.getpid()}.tmp"
+    records = 0
+    with open(tmp_path, 'wb') as f, cur.connection.cursor(pymysql.cursors.SSCursor) as stream:
+        f.write(CASE_CACHE_HEADER.pack(CaseIndex.MAGIC, *probe))
+        stream.execute("""
+        SELECT c.id,
+               UNHEX(MD5(COALESCE(c.name_key, c.name, ''))) AS name_digest,
+               UNHEX(MD5(CONCAT_WS(CHAR(31), c.name, ci.picture, ci.url, ci.description))) AS content_digest
+        FROM cases c
+        JOIN case_information ci ON c.id = ci.case_id
+        WHERE ci.platform = 'thaimissing'
+        ORDER BY name_digest, c.id
+        """)
+        for case_id, name_digest, content_digest in stream:
+            f.write(CASE_CACHE_RECORD.pack(case_id, name_digest, content_digest))
+            records += 1
+    os.replace(tmp_path, CASE_CACHE_PATH)
+    print(f"Cached index of {records} existing cases")
+    return CaseIndex(CASE_CACHE_PATH)
+
+def deactivate_missing_cases(cur, items):
+    """Deactivate stored thaimissing cases whose names are not among items.
+    
+    Returns the CaseIndex of the cases stored before the deactivation.
+    """
+    # Get all existing case IDs and names for this platform
+    index = load_case_index(cur)
+    
+    # Create a set of new case names for comparison
+    new_case_names = {remove_thai_honorific(item['full_name']) for item in items}
+    
+    # Find cases to mark as inactive (those that don't exist in new data)
+    cases_to_mark = index.missing_ids(new_case_names)
+    
+    if cases_to_mark:
+        deactivate_cases(cur, cases_to_mark)
+    
+    return index
+
+def bulk_sync(conn, items):
+    """Apply a full sweep server-side with a staging table and set-based statements.
+    
+    Items are loaded into a temporary staging table with multi-row INSERTs.
+    Missing cases are deactivated with an anti-join, new cases inserted,
+    and case_information upserted in one statement, so the round trips no
+    longer grow with the number of items. The caller commits.
+    
+    Returns the number of case_information rows inserted or changed.
+    """
+    # Like the per-row path, the last record with a given name wins
+    rows = {}
+    for item in items:
+        name = remove_thai_honorific(item['full_name'])
+        rows[name] = (name, item['photo_url'], item['source_url'], build_description(item))
+    
+    with conn.cursor() as cur:
+        cur.execute("""
+        CREATE TEMPORARY TABLE IF NOT EXISTS staging_thaimissing (
+            name varchar(255) COLLATE utf8mb4_bin NOT NULL,
+            picture varchar(255),
+            url varchar(255),
+            description text,
+            PRIMARY KEY (name)
+        )
+        """)
+        cur.execute("DELETE FROM staging_thaimissing")
+        # executemany rewrites this into multi-row INSERTs of up to ~1MB each
+        cur.executemany("""
+        INSERT INTO staging_thaimissing (name, picture, url, description)
+        VALUES (%s, %s, %s, %s)
+        """, list(rows.values()))
+        print(f"Loaded {len(rows)} records into staging table")
+        
+        # Deactivate stored cases that are no longer listed
+        cur.execute("""
+        SELECT c.id
+        FROM cases c
+        JOIN case_information ci ON ci.case_id = c.id AND ci.platform = 'thaimissing'
+        LEFT JOIN staging_thaimissing s ON s.name = c.name_key
+        WHERE s.name IS NULL
+        """)
+        cases_to_mark = [row['id'] for row in cur.fetchall()]
+        if cases_to_mark:
+            deactivate_cases(cur, cases_to_mark)
+        
+        # Insert cases for names not seen before
+        cur.execute("""
+        INSERT INTO cases (name, name_key, created_at)
+        SELECT s.name, s.name, NOW()
+        FROM staging_thaimissing s
+        ORDER BY s.name
+        ON DUPLICATE KEY UPDATE id = id
+        """)
+        print(f"Created {cur.rowcount} new cases")
+        
+        # Record the inserts and real changes the upsert below will make
+        cur.execute("""
+        INSERT INTO case_outbox (case_id, platform, change_type)
+        SELECT c.id, 'thaimissing', IF(ci.case_id IS NULL, 'inserted', 'updated')
+        FROM staging_thaimissing s
+        JOIN cases c ON c.name_key = s.name
+        LEFT JOIN case_information ci ON ci.case_id = c.id AND ci.platform = 'thaimissing'
+        WHERE (
+            ci.case_id IS NULL
+            OR NOT (ci.picture <=> s.picture AND ci.url <=> s.url AND ci.description <=> s.description)
+        )
+        ORDER BY c.id
+        """)
+        
+        # Upsert case_information; created_at only moves when the content changed
+        cur.execute("""
+        INSERT INTO case_information (case_id, platform, picture, url, description, created_at)
+        SELECT c.id, 'thaimissing', s.picture, s.url, s.description, NOW()
+        FROM staging_thaimissing s
+        JOIN cases c ON c.name_key = s.name
+        ON DUPLICATE KEY UPDATE
+            case_information.created_at = IF(
+                case_information.picture <=> VALUES(picture)
+                AND case_information.url <=> VALUES(url)
+                AND case_information.description <=> VALUES(description),
+                case_information.created_at, NOW()
+            ),
+            case_information.picture = VALUES(picture),
+            case_information.url = VALUES(url),
+            case_information.description = VALUES(description)
+        """)
+        # Affected rows count 1 per insert, 2 per changed row and 0 per unchanged row
+        changed = cur.rowcount
+        print(f"Upserted case information for platform 'thaimissing' ({changed} affected rows)")
+        
+        cur.execute("DROP TEMPORARY TABLE staging_thaimissing")
+    
+    return changed
 
+def store_items_in_db(items, deadline=None, digest=None):
+    """Store items in the database.
+    
+    When the previous run's snapshot is available, only the records it
+    shows as new or changed are written and only the cases that
+    disappeared are deactivated. Without a snapshot the full record set is
+    applied with bulk_sync unless SYNC_MODE is 'batched'.
+    
+    Delta writes, and a full sync whose bulk sync fails, are committed in
+    batches, new cases first (see write_batches); rows the database
+    refuses are skipped and returned in the report's reject list. Writing
+    stops COMMIT_MARGIN seconds before the deadline. The payload digest
+    is saved with the snapshot only once every record is stored.
+    """
+    report = {'stored': 0, 'rejected': [], 'changes': {}}
+    
+    snapshot = load_snapshot()
+    previous = snapshot['records'] if snapshot else {}
+    current, inserts, updates, removed = diff_snapshot(previous, items)
+    to_store = items
+    if snapshot:
+        print(f"Snapshot diff: {len(inserts)} new, {len(updates)} changed, {len(removed)} removed")
+        # New cases first so they survive a cut-off run
+        to_store = inserts + updates
+        if not to_store and not removed:
+            print("No changes since the last run, skipping the database")
+            save_snapshot(previous, digest, snapshot['probe'])
+            return report
+    
+    conn = pymysql.connect(
+        **DB_CONFIG,
+        cursorclass=DB_CURSOR,
+        client_flag=CLIENT.MULTI_STATEMENTS
+    )
+    
+    try:
+        written = None
+        unchanged = []
+        if not snapshot and SYNC_MODE == 'bulk' and not past_deadline(deadline, COMMIT_MARGIN):
+            try:
+                bulk_sync(conn, items)
+                conn.commit()
+                written, rejected = [(item, None) for item in items], []
+            except pymysql.MySQLError as e:
+                conn.rollback()
+                print(f"Bulk sync failed ({e}), falling back to batched writes")
+        
+        if written is None:
+            with conn.cursor() as cur:
+                if snapshot:
+                    if removed:
+                        deactivate_names(cur, removed)
+                else:
+                    index = deactivate_missing_cases(cur, items)
+                    # New cases first so they survive a cut-off run, then
+                    # changed ones; unchanged cases need no write at all
+                    states = []
+                    for item in items:
+                        row_digest, name = snapshot_entry(item)[1]
+                        states.append((index.state(name, row_digest), item))
+                    unchanged = [item for state, item in states if state == 2]
+                    to_store = [item for state, item in sorted(states, key=lambda s: s[0]) if state < 2]
+            conn.commit()
+            written, rejected = write_partitioned(conn, to_store, deadline)
+        
+        report['stored'] = len(written)
+        report['rejected'] = [
+            {'name': item.get('full_name'), 'url': item.get('source_url'), 'error': error}
+            for item, error in rejected
+        ]
+        print(f"Successfully stored {len(written)} of {len(items)} items in database, "
+              f"rejected {len(rejected)}")
+        # Per-item upsert results; a bulk sync only reports its total
+        for _, outcome in written:
+            if outcome:
+                report['changes'][outcome] = report['changes'].get(outcome, 0) + 1
+        if report['changes']:
+            print(f"Case information changes: {report['changes']}")
+        
+        # Only what is now in the database enters the snapshot, so rejected
+        # and unwritten records show up as changed again next run
+        records = {external_id: previous[external_id] for external_id in current if external_id in previous}
+        for item in unchanged + [item for item, _ in written]:
+            external_id, entry = snapshot_entry(item)
+            records[external_id] = entry
+        complete = len(written) == len(to_store)
+        # Probe in a fresh transaction so it sees every writer's commits
         conn.commit()
-        print(f"Successfully stored {len(items)} items in database")
+        with conn.cursor() as cur:
+            save_snapshot(records, digest if complete else None, probe_case_information(cur))
     except Exception as e:
         print(f"Database error: {e}")
         conn.rollback()
     finally:
         conn.close()
+    
+    return report
 
-def lambda_handler():
+def lambda_handler(event=None, context=None):
+    lock = acquire_run_lock()
+    if lock is None:
+        print("Another thaimissing run is still in progress, skipping this one")
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'processed': 0, 'skipped': 'another run is in progress'})
+        }
+    
+    try:
+        # Inside the try, so a bad 'profile' value cannot leak the lock
+        start_profiling(event)
+        return sync_source(context)
+    finally:
+        stop_profiling()
+        release_run_lock(lock)
+
+def sync_source(context=None):
     # --- 1) Load config ---
-    api_url = "https://api.thaimissing.go.th/api/v1/cir-Datacatalog-web/DataMissingPerson"
+    api_url = API_URL
 
     # --- 2) Fetch API data ---
-    resp = urllib.request.urlopen(api_url)
-    data = json.loads(resp.read().decode('utf-8'))
-
+    with profile_stage('fetch'):
+        resp = urllib.request.urlopen(api_url)
+        payload = resp.read()
+    
+    # A byte-identical payload cannot change anything
+    digest = hashlib.sha256(payload).hexdigest()
+    snapshot = load_snapshot()
+    if snapshot and snapshot.get('digest') == digest:
+        print("API payload unchanged since the last run, skipping")
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'processed': 0, 'unchanged': True})
+        }
+    
     # --- 3) Process and store data ---
-    items = []
-    for rec in data:
-        try:
-            age_missing = int("".join(re.findall(r"\d", rec.get('ageMissing'))))
-        except:
-            age_missing = None
-
-        try:
-            age_current = int("".join(re.findall(r"\d", rec.get('ageCurrent'))))
-        except:
-            age_current = None
-        
-        try:
-            age_inform = int("".join(re.findall(r"\d", rec.get('ageInform'))))
-        except:
-            age_inform = None
-
-        items.append({
-            'full_name': rec.get('fullName'),
-            'nationality': rec.get('nationality'),
-            'age_missing': age_missing,
-            'age_current': age_current,
-            'age_inform': age_inform,
-            'gender': rec.get('sex'),
-            'missing_date': parse_thai_date(rec.get('missingDate')),
-            'missing_time': parse_thai_time(rec.get('missingTime')),
-            'missing_location': rec.get('missingLocation'),
-            'inform_location': rec.get('informLocation'),
-            'photo_url': rec.get('image'),
-            'source_url': rec.get('url')
-        })
+    with profile_stage('parse'):
+        data = json.loads(payload.decode('utf-8'))
+        items = [parse_record(rec) for rec in data]
 
     # --- 4) Store in database ---
-    store_items_in_db(items)
+    with profile_stage('store'):
+        report = store_items_in_db(items, deadline_from_context(context), digest)
 
     return {
         'statusCode': 200,
-        'body': json.dumps({'processed': len(items)})
+        'body': json.dumps({
+            'processed': len(items),
+            'rejected': len(report['rejected']),
+            'changes': report['changes']
+        })
     }
 
 if __name__ == '__main__':
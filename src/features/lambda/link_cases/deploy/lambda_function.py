@@ -0,0 +1,252 @@
+import os
+import re
+import json
+import time
+import unicodedata
+from collections import Counter, defaultdict
+import pymysql
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Database configuration
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': int(os.getenv('DB_PORT', 3306)),
+    'user': os.getenv('DB_USER', 'admin'),
+    'password': os.getenv('DB_PASSWORD', '12345678'),
+    'database': os.getenv('DB_NAME', 'missing_persons_db')
+}
+
+# Map Thai month names to month numbers
+THAI_MONTHS = {
+    'มกราคม': 1, 'กุมภาพันธ์': 2, 'มีนาคม': 3, 'เมษายน': 4,
+    'พฤษภาคม': 5, 'มิถุนายน': 6, 'กรกฎาคม': 7, 'สิงหาคม': 8,
+    'กันยายน': 9, 'ตุลาคม': 10, 'พฤศจิกายน': 11, 'ธันวาคม': 12
+}
+
+# Longest first, so 'นางสาว' is stripped before 'นาง'
+HONORIFICS = sorted([
+    'นาย', 'นาง', 'นางสาว', 'น.ส.', 'ด.ช.', 'ด.ญ.', 'เด็กชาย', 'เด็กหญิง',
+    'คุณ', 'คุณนาย', 'คุณหญิง', 'คุณแม่', 'คุณพ่อ', 'คุณปู่', 'คุณย่า',
+    'คุณตา', 'คุณยาย', 'คุณลุง', 'คุณป้า', 'คุณน้า', 'คุณอา'
+], key=len, reverse=True)
+
+# Tone marks and the silent-letter mark are where spellings of one name differ most
+THAI_MARKS = re.compile('[\u0e48-\u0e4c]')
+SEPARATORS = re.compile(r"[.,\-_'\"()]+")
+
+AGE_PATTERN = re.compile(r'อายุ(?:ขณะหายตัว)?\s*:?\s*(\d{1,3})\s*ปี')
+ISO_DATE_PATTERN = re.compile(r'วันที่หายตัว:\s*(\d{4}-\d{2}-\d{2})')
+THAI_DATE_PATTERN = re.compile(r'วันที่\s*(\d{1,2})\s+([ก-๙]+)\s+(\d{4})')
+PROVINCE_PATTERN = re.compile(r'(?:จังหวัด|จ\.)\s*([ก-๙]+)')
+
+# Rarest name bigrams used as blocking keys per record
+BLOCK_NGRAMS = int(os.getenv('BLOCK_NGRAMS', 2))
+# Blocks bigger than this are too common to say anything and are skipped
+MAX_BLOCK_SIZE = int(os.getenv('MAX_BLOCK_SIZE', 200))
+# Score from which two records are linked
+LINK_THRESHOLD = float(os.getenv('LINK_THRESHOLD', 0.85))
+
+def name_tokens(name):
+    """Split a Thai name into the parts that survive spelling variants.
+
+    Strips honorifics, punctuation, tone marks and the silent-letter
+    mark, and composes the two-character spelling of sara am.
+    """
+    name = unicodedata.normalize('NFC', name or '').strip()
+    for honorific in HONORIFICS:
+        if name.startswith(honorific):
+            name = name[len(honorific):]
+            break
+    name = THAI_MARKS.sub('', name.replace('ํา', 'ำ')).lower()
+    return [token for token in (SEPARATORS.sub('', part) for part in name.split()) if token]
+
+def normalize_name(name):
+    """Return the name as one string of letters, see name_tokens."""
+    return ''.join(name_tokens(name))
+
+def bigrams(text):
+    if len(text) < 2:
+        return frozenset([text]) if text else frozenset()
+    return frozenset(text[i:i + 2] for i in range(len(text) - 1))
+
+def dice(a, b):
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+def parse_missing_date(description):
+    """Return the missing date found in a description as YYYY-MM-DD, or None."""
+    match = ISO_DATE_PATTERN.search(description)
+    if match:
+        return match.group(1)
+    match = THAI_DATE_PATTERN.search(description)
+    if match and match.group(2) in THAI_MONTHS:
+        day, month, year = int(match.group(1)), THAI_MONTHS[match.group(2)], int(match.group(3)) - 543
+        return f"{year:04d}-{month:02d}-{day:02d}"
+    return None
+
+def parse_province(description):
+    if 'กรุงเทพ' in description:
+        return 'กรุงเทพมหานคร'
+    match = PROVINCE_PATTERN.search(description)
+    return match.group(1) if match else None
+
+def make_record(case_id, platform, name, description=None):
+    """Return the record link_records compares for one case_information row."""
+    description = description or ''
+    age = AGE_PATTERN.search(description)
+    tokens = name_tokens(name)
+    return {
+        'case_id': case_id,
+        'platform': platform,
+        'name': name,
+        'tokens': tokens,
+        'grams': bigrams(''.join(tokens)),
+        'age': int(age.group(1)) if age else None,
+        'date': parse_missing_date(description),
+        'province': parse_province(description)
+    }
+
+def blocking_keys(record, frequency):
+    """Return the blocks a record is filed under.
+
+    Each part of its name, its BLOCK_NGRAMS rarest name bigrams, its
+    missing date, and its province with a five-year age band. A variant
+    spelling rarely touches every part of a name, and similar names share
+    their rare bigrams, so matching records meet in at least one block.
+    """
+    keys = [('t', token) for token in record['tokens'] if len(token) > 1]
+    keys.extend(('n', gram) for gram in sorted(record['grams'], key=lambda gram: (frequency[gram], gram))[:BLOCK_NGRAMS])
+    if record['date']:
+        keys.append(('d', record['date']))
+    if record['province'] and record['age'] is not None:
+        keys.append(('p', record['province'], record['age'] // 5))
+    return keys
+
+def score(a, b, photo_match=False):
+    """Name similarity of two records, adjusted by the other evidence.
+
+    Returns 0 when their ages are too far apart to be the same person.
+    """
+    if a['age'] is not None and b['age'] is not None:
+        if abs(a['age'] - b['age']) > 10:
+            return 0.0
+    value = dice(a['grams'], b['grams'])
+    if a['age'] is not None and b['age'] is not None and abs(a['age'] - b['age']) <= 2:
+        value += 0.05
+    if a['date'] and a['date'] == b['date']:
+        value += 0.1
+    if a['province'] and a['province'] == b['province']:
+        value += 0.05
+    if photo_match:
+        value += 0.2
+    return value
+
+def link_records(records, photo_pairs=frozenset()):
+    """Find the pairs of different cases whose records describe the same person.
+
+    Only records that share a block are compared, so the work grows with
+    the number of candidate pairs rather than with the square of the
+    number of records. photo_pairs holds (case_id, other_case_id) pairs,
+    smaller id first, whose pictures match; their records are always
+    compared, as a matching photo is evidence even when the names have
+    nothing in common to block on.
+
+    Returns {(case_id, other_case_id): score} for the linked pairs.
+    """
+    frequency = Counter(gram for record in records for gram in record['grams'])
+    blocks = defaultdict(list)
+    for i, record in enumerate(records):
+        for key in blocking_keys(record, frequency):
+            blocks[key].append(i)
+
+    candidates = set()
+    for members in blocks.values():
+        if len(members) < 2 or len(members) > MAX_BLOCK_SIZE:
+            continue
+        for x in range(len(members)):
+            for y in range(x + 1, len(members)):
+                candidates.add((members[x], members[y]))
+
+    by_case = defaultdict(list)
+    for i, record in enumerate(records):
+        by_case[record['case_id']].append(i)
+    for case_id, other_id in photo_pairs:
+        for i in by_case.get(case_id, ()):
+            for j in by_case.get(other_id, ()):
+                candidates.add((min(i, j), max(i, j)))
+
+    links = {}
+    for i, j in candidates:
+        a, b = records[i], records[j]
+        if a['case_id'] == b['case_id']:
+            continue
+        pair = (min(a['case_id'], b['case_id']), max(a['case_id'], b['case_id']))
+        value = score(a, b, pair in photo_pairs)
+        if value >= LINK_THRESHOLD and value > links.get(pair, 0):
+            links[pair] = value
+    print(f"Compared {len(candidates)} candidate pairs from {len(blocks)} blocks, linked {len(links)}")
+    return links
+
+def link_cases():
+    """Link the stored cases that look like the same person and record them in case_link.
+
+    case_link is replaced with this run's links in one transaction: pairs
+    that no longer score high enough, or whose cases are gone, are deleted.
+    """
+    conn = pymysql.connect(
+        **DB_CONFIG,
+        cursorclass=pymysql.cursors.DictCursor
+    )
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+            SELECT c.id, c.name, ci.platform, ci.description
+            FROM cases c
+            JOIN case_information ci ON ci.case_id = c.id
+            """)
+            records = [
+                make_record(row['id'], row['platform'], row['name'], row['description'])
+                for row in cur.fetchall()
+            ]
+            cur.execute("SELECT case_id, other_case_id FROM photo_match")
+            photo_pairs = {(row['case_id'], row['other_case_id']) for row in cur.fetchall()}
+
+            links = link_records(records, photo_pairs)
+            cur.execute("SELECT case_id, linked_case_id FROM case_link FOR UPDATE")
+            stale = {(row['case_id'], row['linked_case_id']) for row in cur.fetchall()} - set(links)
+            if stale:
+                cur.execute("""
+                DELETE FROM case_link
+                WHERE (case_id, linked_case_id) IN %(stale)s
+                """, {'stale': tuple(sorted(stale))})
+                print(f"Deleted {len(stale)} stale links")
+            if links:
+                cur.executemany("""
+                INSERT INTO case_link (case_id, linked_case_id, score)
+                VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE score = VALUES(score)
+                """, [(case_id, other_id, round(value, 3)) for (case_id, other_id), value in links.items()])
+        conn.commit()
+        return len(links)
+    except Exception as e:
+        print(f"Database error: {e}")
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def lambda_handler(event=None, context=None):
+    start_time = time.time()
+    linked = link_cases()
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'linked': linked, 'seconds': round(time.time() - start_time, 2)})
+    }
+
+if __name__ == '__main__':
+    print(lambda_handler())
@@ -0,0 +1,434 @@
+import os
+import json
+import time
+import hashlib
+import io
+import urllib.error
+import urllib.request
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
+import pymysql
+from dotenv import load_dotenv
+
+# Pillow hashes the pictures for photo matching; mirror_images refuses to
+# run without it rather than silently matching nothing
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Load environment variables
+load_dotenv()
+
+# Database configuration
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': int(os.getenv('DB_PORT', 3306)),
+    'user': os.getenv('DB_USER', 'admin'),
+    'password': os.getenv('DB_PASSWORD', '12345678'),
+    'database': os.getenv('DB_NAME', 'missing_persons_db')
+}
+
+# 'local' keeps images under IMAGE_STORE_PATH, 's3' in IMAGE_BUCKET
+IMAGE_STORE = os.getenv('IMAGE_STORE', 'local')
+IMAGE_STORE_PATH = os.getenv('IMAGE_STORE_PATH', '/tmp/image_mirror')
+IMAGE_BUCKET = os.getenv('IMAGE_BUCKET')
+
+# Pictures fetched per round and in parallel
+IMAGE_BATCH_SIZE = int(os.getenv('IMAGE_BATCH_SIZE', 100))
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 8))
+IMAGE_TIMEOUT = float(os.getenv('IMAGE_TIMEOUT', 20))
+
+# Pages relative picture paths are resolved against, per platform
+PLATFORM_BASE_URLS = {
+    'backtohome': os.getenv('BACKTOHOME_BASE_URL', "https://web.backtohome.org/net%20missing.php?width=1920&height=1080&pages="),
+    'thaimissing': os.getenv('THAIMISSING_API_URL', "https://api.thaimissing.go.th/api/v1/cir-Datacatalog-web/DataMissingPerson")
+}
+
+# A failed download is retried after IMAGE_RETRY_DELAY seconds, at most
+# IMAGE_MAX_FAILURES times; errors that cannot go away are not retried
+IMAGE_RETRY_DELAY = int(os.getenv('IMAGE_RETRY_DELAY', 3600))
+IMAGE_MAX_FAILURES = int(os.getenv('IMAGE_MAX_FAILURES', 5))
+
+# Largest dHash hamming distance at which two pictures count as the same photo
+PHOTO_MATCH_DISTANCE = int(os.getenv('PHOTO_MATCH_DISTANCE', 6))
+
+# Photo index kept across warm invocations, see load_photo_index
+photo_index = None
+
+# Seconds before the Lambda deadline to stop starting rounds
+DEADLINE_MARGIN = float(os.getenv('DEADLINE_MARGIN', 30))
+
+def deadline_from_context(context):
+    """Return the invocation's deadline on the time.monotonic() clock, or None."""
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return None
+    return time.monotonic() + context.get_remaining_time_in_millis() / 1000
+
+def past_deadline(deadline, margin):
+    return deadline is not None and time.monotonic() > deadline - margin
+
+def object_key(digest):
+    return f"images/{digest[:2]}/{digest}"
+
+class LocalObjectStore:
+    """Object store stand-in that keeps each object as a file under root."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def put(self, key, data, content_type=None):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, key):
+        with open(self._path(key), 'rb') as f:
+            return f.read()
+
+class S3ObjectStore:
+    """Objects in an S3 bucket; boto3 ships with the Lambda Python runtime."""
+
+    def __init__(self, bucket):
+        import boto3
+        self.bucket = bucket
+        self.client = boto3.client('s3')
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except self.client.exceptions.ClientError:
+            return False
+
+    def put(self, key, data, content_type=None):
+        extra = {'ContentType': content_type} if content_type else {}
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, **extra)
+
+    def get(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=key)['Body'].read()
+
+def open_store():
+    if IMAGE_STORE == 's3':
+        return S3ObjectStore(IMAGE_BUCKET)
+    return LocalObjectStore(IMAGE_STORE_PATH)
+
+def dhash(data):
+    """Return the 64-bit difference hash of an image, or None.
+
+    The picture is shrunk to 9x8 greyscale and each bit says whether a
+    pixel is brighter than its right neighbour, so re-encoded, resized or
+    recompressed copies of a photo land within a few bits of each other.
+    None when the data is not an image.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            pixels = list(image.convert('L').resize((9, 8), Image.LANCZOS).getdata())
+    except Exception as e:
+        print(f"Could not hash image: {e}")
+        return None
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    return value
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+class HammingIndex:
+    """Multi-index hash of 64-bit hashes for searches under hamming distance.
+
+    Each hash is cut into max_distance + 1 disjoint bit ranges, and each
+    range has an exact-match dict from its bits to the hashes holding
+    them. Two hashes within max_distance differ in at most max_distance
+    ranges, so they agree exactly on at least one: a search only looks up
+    its own ranges and checks those candidates with hamming().
+    """
+
+    def __init__(self, max_distance):
+        self.max_distance = max_distance
+        chunks = max_distance + 1
+        bounds = [64 * i // chunks for i in range(chunks + 1)]
+        # (shift, mask) of each bit range
+        self.ranges = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(bounds, bounds[1:])]
+        self.tables = [{} for _ in self.ranges]
+        self.values = {}
+
+    def add(self, key, value):
+        values = self.values.get(key)
+        if values is None:
+            values = self.values[key] = []
+            for table, (shift, mask) in zip(self.tables, self.ranges):
+                table.setdefault((key >> shift) & mask, set()).add(key)
+        values.append(value)
+
+    def remove(self, key, value):
+        values = self.values[key]
+        values.remove(value)
+        if not values:
+            del self.values[key]
+            for table, (shift, mask) in zip(self.tables, self.ranges):
+                chunk = (key >> shift) & mask
+                table[chunk].discard(key)
+                if not table[chunk]:
+                    del table[chunk]
+
+    def search(self, key, max_distance):
+        """Return (distance, value) for every value stored within max_distance of key."""
+        if max_distance > self.max_distance:
+            raise ValueError(f"index only answers searches within {self.max_distance} bits")
+        candidates = set()
+        for table, (shift, mask) in zip(self.tables, self.ranges):
+            candidates.update(table.get((key >> shift) & mask, ()))
+        found = []
+        for candidate in candidates:
+            distance = hamming(key, candidate)
+            if distance <= max_distance:
+                found.extend((distance, value) for value in self.values[candidate])
+        return found
+
+def is_permanent(error):
+    """Whether retrying a download that failed with error cannot help."""
+    if isinstance(error, urllib.error.HTTPError):
+        return 400 <= error.code < 500 and error.code not in (408, 429)
+    return isinstance(error, ValueError)
+
+def fetch_image(store, url, platform):
+    """Download one picture and store it under its SHA-256.
+
+    url is the picture as case_information stores it; a relative path is
+    resolved against the platform's entry in PLATFORM_BASE_URLS. Content
+    already in the store is not written again.
+
+    Returns the image_mirror row (url, digest, content_type, size, dhash,
+    error, failures). A failed download has no digest, its error, and
+    counts as IMAGE_MAX_FAILURES failures when it is permanent.
+    """
+    source = urljoin(PLATFORM_BASE_URLS.get(platform, ''), url)
+    try:
+        with urllib.request.urlopen(source, timeout=IMAGE_TIMEOUT) as resp:
+            data = resp.read()
+            content_type = resp.headers.get_content_type()
+    except Exception as e:
+        print(f"Error fetching image {source}: {e}")
+        failures = IMAGE_MAX_FAILURES if is_permanent(e) else 1
+        return url, None, None, None, None, str(e)[:255], failures
+
+    digest = hashlib.sha256(data).hexdigest()
+    key = object_key(digest)
+    if not store.exists(key):
+        store.put(key, data, content_type)
+    return url, digest, content_type, len(data), dhash(data), None, 0
+
+def pending_pictures(cur, limit):
+    """Return (url, platform) of pictures that are neither mirrored nor due a retry.
+
+    A picture is pending when no image_mirror row covers it yet, or when
+    its last download failed at least IMAGE_RETRY_DELAY seconds ago and
+    has failed fewer than IMAGE_MAX_FAILURES times.
+    """
+    cur.execute("""
+    SELECT ci.picture AS url, MIN(ci.platform) AS platform
+    FROM case_information ci
+    LEFT JOIN image_mirror m ON m.url = ci.picture
+    WHERE ci.picture IS NOT NULL AND ci.picture <> ''
+      AND (m.url IS NULL
+           OR (m.digest IS NULL AND m.failures < %(max_failures)s
+               AND m.fetched_at < NOW() - INTERVAL %(retry_delay)s SECOND))
+    GROUP BY ci.picture
+    LIMIT %(limit)s
+    """, {'max_failures': IMAGE_MAX_FAILURES, 'retry_delay': IMAGE_RETRY_DELAY, 'limit': limit})
+    return [(row['url'], row['platform']) for row in cur.fetchall()]
+
+def load_photo_index(cur):
+    """Return a HammingIndex of (case_id, platform) keyed by the dHash of each case picture.
+
+    A warm container keeps the index and only reads the rows whose case
+    information or mirrored picture changed since it was loaded, minus a
+    few minutes for transactions that committed late; a changed hash is
+    moved in place. Deleted rows do not show up as changes, so a row
+    count that no longer matches the index makes it rebuild from the
+    whole table.
+    """
+    global photo_index
+    cur.execute("SELECT NOW() AS now")
+    loaded_at = cur.fetchone()['now']
+
+    if photo_index is not None:
+        cur.execute("""
+        SELECT ci.case_id, ci.platform, m.dhash
+        FROM case_information ci
+        JOIN image_mirror m ON m.url = ci.picture
+        WHERE m.dhash IS NOT NULL
+          AND (ci.created_at >= %(since)s - INTERVAL 5 MINUTE
+               OR m.fetched_at >= %(since)s - INTERVAL 5 MINUTE)
+        """, {'since': photo_index['loaded_at']})
+        rows = cur.fetchall()
+        index = photo_index['index']
+        hashes = photo_index['hashes']
+        for row in rows:
+            key = (row['case_id'], row['platform'])
+            old = hashes.get(key)
+            if old != row['dhash']:
+                if old is not None:
+                    index.remove(old, key)
+                hashes[key] = row['dhash']
+                index.add(row['dhash'], key)
+        cur.execute("""
+        SELECT COUNT(*) AS count
+        FROM case_information ci
+        JOIN image_mirror m ON m.url = ci.picture
+        WHERE m.dhash IS NOT NULL
+        """)
+        if cur.fetchone()['count'] == len(hashes):
+            photo_index['loaded_at'] = loaded_at
+            print(f"Refreshed photo index with {len(rows)} changed rows")
+            return index
+
+    cur.execute("""
+    SELECT ci.case_id, ci.platform, m.dhash
+    FROM case_information ci
+    JOIN image_mirror m ON m.url = ci.picture
+    WHERE m.dhash IS NOT NULL
+    """)
+    index = HammingIndex(PHOTO_MATCH_DISTANCE)
+    hashes = {}
+    for row in cur.fetchall():
+        key = (row['case_id'], row['platform'])
+        hashes[key] = row['dhash']
+        index.add(row['dhash'], key)
+    photo_index = {'index': index, 'hashes': hashes, 'loaded_at': loaded_at}
+    print(f"Built photo index of {len(hashes)} pictures")
+    return index
+
+def match_photos(conn, urls):
+    """Record the near-duplicates of the pictures at urls among all cases.
+
+    Each pair of different cases whose pictures lie within
+    PHOTO_MATCH_DISTANCE is stored once in photo_match, smaller case id
+    first, as evidence for linking the two cases.
+
+    Returns the number of pairs found.
+    """
+    with conn.cursor() as cur:
+        index = load_photo_index(cur)
+        cur.execute("""
+        SELECT ci.case_id, m.dhash
+        FROM case_information ci
+        JOIN image_mirror m ON m.url = ci.picture
+        WHERE m.url IN %(urls)s AND m.dhash IS NOT NULL
+        """, {'urls': tuple(urls)})
+        pairs = {}
+        for row in cur.fetchall():
+            for distance, (other_id, _) in index.search(row['dhash'], PHOTO_MATCH_DISTANCE):
+                if other_id != row['case_id']:
+                    pair = (min(row['case_id'], other_id), max(row['case_id'], other_id))
+                    pairs[pair] = min(distance, pairs.get(pair, distance))
+        if pairs:
+            cur.executemany("""
+            INSERT INTO photo_match (case_id, other_case_id, distance)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE distance = VALUES(distance)
+            """, [(case_id, other_id, distance) for (case_id, other_id), distance in pairs.items()])
+    conn.commit()
+    print(f"Found {len(pairs)} near-duplicate photo pairs")
+    return len(pairs)
+
+def mirror_images(store, deadline=None):
+    """Mirror every case picture not mirrored yet and record its digest.
+
+    Each URL is downloaded once, ever: image_mirror remembers the digest
+    and dHash of every URL fetched, and pictures whose URL is already
+    there are only linked. Failed downloads are recorded there too and
+    retried as pending_pictures allows. The newly fetched pictures are
+    then matched against every case's picture with match_photos.
+
+    Returns (fetched, failed, linked) counts. Raises RuntimeError when
+    Pillow is missing, since no picture could be hashed or matched.
+    """
+    if Image is None:
+        raise RuntimeError("Pillow is not installed; it is needed to hash pictures for photo matching")
+
+    fetched = 0
+    failed = 0
+    new_urls = []
+
+    conn = pymysql.connect(
+        **DB_CONFIG,
+        cursorclass=pymysql.cursors.DictCursor
+    )
+
+    try:
+        with ThreadPoolExecutor(max_workers=IMAGE_WORKERS) as executor:
+            while not past_deadline(deadline, DEADLINE_MARGIN):
+                with conn.cursor() as cur:
+                    pictures = pending_pictures(cur, IMAGE_BATCH_SIZE)
+                conn.commit()
+                if not pictures:
+                    break
+
+                # Failures are recorded too, which takes them off the pending list
+                rows = list(executor.map(lambda picture: fetch_image(store, *picture), pictures))
+                with conn.cursor() as cur:
+                    cur.executemany("""
+                    INSERT INTO image_mirror (url, digest, content_type, size, dhash, error, failures)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE
+                        digest = VALUES(digest),
+                        content_type = VALUES(content_type),
+                        size = VALUES(size),
+                        dhash = VALUES(dhash),
+                        error = VALUES(error),
+                        failures = IF(VALUES(digest) IS NULL, failures + VALUES(failures), 0),
+                        fetched_at = NOW()
+                    """, rows)
+                conn.commit()
+
+                mirrored = [row[0] for row in rows if row[1]]
+                new_urls.extend(mirrored)
+                fetched += len(mirrored)
+                failed += len(rows) - len(mirrored)
+                print(f"Mirrored {len(mirrored)} of {len(rows)} pictures")
+
+        # Point every row at the digest of its current picture
+        with conn.cursor() as cur:
+            cur.execute("""
+            UPDATE case_information ci
+            JOIN image_mirror m ON m.url = ci.picture
+            SET ci.picture_digest = m.digest
+            WHERE NOT (ci.picture_digest <=> m.digest)
+            """)
+            linked = cur.rowcount
+        conn.commit()
+        print(f"Linked {linked} case pictures to their mirrored copy")
+
+        if new_urls:
+            match_photos(conn, new_urls)
+    except Exception as e:
+        print(f"Database error: {e}")
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return fetched, failed, linked
+
+def lambda_handler(event=None, context=None):
+    fetched, failed, linked = mirror_images(open_store(), deadline_from_context(context))
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'fetched': fetched, 'failed': failed, 'linked': linked})
+    }
+
+if __name__ == '__main__':
+    print(lambda_handler())
@@ -0,0 +1,296 @@
+import os
+import json
+import time
+import uuid
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+import pymysql
+from dotenv import load_dotenv
+from datetime import datetime
+
+# Load environment variables
+load_dotenv()
+
+# Database configuration
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': int(os.getenv('DB_PORT', 3306)),
+    'user': os.getenv('DB_USER', 'admin'),
+    'password': os.getenv('DB_PASSWORD', '12345678'),
+    'database': os.getenv('DB_NAME', 'missing_persons_db')
+}
+
+# Sink new cases are posted to, see SINKS
+PUBLISH_SINK = os.getenv('PUBLISH_SINK', 'stub')
+
+# Cases claimed per transaction and posted concurrently
+PUBLISH_BATCH_SIZE = int(os.getenv('PUBLISH_BATCH_SIZE', 20))
+PUBLISH_WORKERS = int(os.getenv('PUBLISH_WORKERS', 4))
+
+# Token bucket: sustained posts per second and the burst allowed on top
+PUBLISH_RATE = float(os.getenv('PUBLISH_RATE', 1))
+PUBLISH_BURST = int(os.getenv('PUBLISH_BURST', 5))
+
+# Seconds before the Lambda deadline to stop claiming batches
+DEADLINE_MARGIN = float(os.getenv('DEADLINE_MARGIN', 30))
+
+# Seconds after which an unrecorded claim counts as abandoned by a crashed run
+CLAIM_TIMEOUT = int(os.getenv('CLAIM_TIMEOUT', 900))
+
+# Seconds an outbox event must age before the cursor moves past it. seqs are
+# allocated at insert but become visible at commit, so this must exceed the
+# longest ingest transaction or a late-committing event would be skipped
+PUBLISH_SETTLE = int(os.getenv('PUBLISH_SETTLE', 300))
+
+def deadline_from_context(context):
+    """Return the invocation's deadline on the time.monotonic() clock, or None."""
+    if context is None or not hasattr(context, 'get_remaining_time_in_millis'):
+        return None
+    return time.monotonic() + context.get_remaining_time_in_millis() / 1000
+
+def past_deadline(deadline, margin):
+    return deadline is not None and time.monotonic() > deadline - margin
+
+class TokenBucket:
+    """Thread-safe token bucket; acquire() blocks until a token is available."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def format_post(case):
+    """Return the announcement text for a case, as post_x.js words it."""
+    description = case.get('description') or ''
+    return '\n'.join([
+        '🚨 แจ้งคนหาย 🚨',
+        '',
+        f"ชื่อ-สกุล: {case['name'] or 'ไม่ระบุ'}",
+        f"รายละเอียด: {description[:100] + '...' if description else 'ไม่ระบุ'}",
+        f"แหล่งที่มา: {case.get('url') or 'ไม่ระบุ'}"
+    ])
+
+class Sink(ABC):
+    """Somewhere cases are announced.
+
+    name is stored as posted_case.social_platform. post() publishes one
+    case and returns the URL of the post; it raises when posting fails,
+    and the case is then retried by a later run.
+    """
+
+    name = None
+
+    @abstractmethod
+    def post(self, case):
+        """Publish one case and return the URL of the post."""
+
+class StubSink(Sink):
+    """Local sink that only prints and remembers its posts, for tests and dry runs."""
+
+    name = 'stub'
+
+    def __init__(self):
+        self.posts = []
+        self._lock = threading.Lock()
+
+    def post(self, case):
+        text = format_post(case)
+        with self._lock:
+            self.posts.append((case['case_id'], text))
+            number = len(self.posts)
+        print(f"[stub] case {case['case_id']}:\n{text}")
+        return f"stub://posts/{number}"
+
+SINKS = {
+    'stub': StubSink,
+}
+
+def claim_batch(cur, sink, limit):
+    """Claim up to limit cases to post to sink; returns (claim, cases).
+
+    Claimed posted_case rows carry the batch's claim token and a NULL url.
+    Posts released by a failed attempt, or held longer than CLAIM_TIMEOUT
+    by a crashed run, are claimed first. The rest come from the 'inserted'
+    events in case_outbox past the sink's publish_cursor, claimed with one
+    multi-row insert; a case that already has a row, because it was listed
+    on several platforms, is skipped. The cursor row is locked for the
+    whole transaction, so publishers of the same sink claim one at a time,
+    and the claims and the new cursor stand once it commits.
+    """
+    claim = uuid.uuid4().hex
+    params = {'sink': sink.name, 'claim': claim, 'timeout': CLAIM_TIMEOUT}
+
+    cur.execute("""
+    INSERT IGNORE INTO publish_cursor (social_platform, seq)
+    VALUES (%(sink)s, 0)
+    """, params)
+    cur.execute("SELECT seq FROM publish_cursor WHERE social_platform = %(sink)s FOR UPDATE", params)
+    seq = cur.fetchone()['seq']
+
+    cur.execute("""
+    UPDATE posted_case SET claim = %(claim)s, posted_at = NOW()
+    WHERE social_platform = %(sink)s AND url IS NULL
+      AND (posted_at IS NULL OR posted_at < NOW() - INTERVAL %(timeout)s SECOND)
+    LIMIT %(limit)s
+    """, {**params, 'limit': limit})
+    remaining = limit - cur.rowcount
+
+    start_seq = seq
+    while remaining > 0:
+        cur.execute("""
+        SELECT seq, case_id FROM case_outbox
+        WHERE change_type = 'inserted' AND seq > %(seq)s
+          AND created_at < NOW() - INTERVAL %(settle)s SECOND
+        ORDER BY seq
+        LIMIT %(limit)s
+        """, {'seq': seq, 'settle': PUBLISH_SETTLE, 'limit': remaining})
+        events = cur.fetchall()
+        if not events:
+            break
+        seq = events[-1]['seq']
+
+        # One multi-row INSERT; a duplicate key leaves the row alone and
+        # counts 0 affected rows, so rowcount is the number of new claims
+        case_ids = sorted({event['case_id'] for event in events})
+        values = ',\n'.join(cur.mogrify("(%s, %s, NOW(), %s)", (case_id, sink.name, claim)) for case_id in case_ids)
+        cur.execute(f"""
+        INSERT INTO posted_case (case_id, social_platform, posted_at, claim)
+        VALUES {values}
+        ON DUPLICATE KEY UPDATE case_id = case_id
+        """)
+        remaining -= cur.rowcount
+    if seq != start_seq:
+        cur.execute("UPDATE publish_cursor SET seq = %(seq)s WHERE social_platform = %(sink)s",
+                    {**params, 'seq': seq})
+
+    # A case delisted before it was posted has nothing left to announce
+    cur.execute("""
+    DELETE FROM posted_case
+    WHERE social_platform = %(sink)s AND claim = %(claim)s AND url IS NULL
+      AND NOT EXISTS (SELECT 1 FROM case_information ci WHERE ci.case_id = posted_case.case_id)
+    """, params)
+
+    cur.execute("""
+    SELECT p.case_id, c.name, ci.platform, ci.picture, ci.url, ci.description
+    FROM posted_case p
+    JOIN cases c ON c.id = p.case_id
+    JOIN case_information ci ON ci.case_id = p.case_id
+    WHERE p.claim = %(claim)s AND p.social_platform = %(sink)s AND p.url IS NULL
+    ORDER BY p.case_id, ci.platform
+    """, params)
+    cases = {}
+    for row in cur.fetchall():
+        cases.setdefault(row['case_id'], row)
+    return claim, list(cases.values())
+
+def record_posts(cur, sink, claim, cases, urls):
+    """Record the outcome of posting the claimed cases; returns how many went out.
+
+    Posted cases get their url in one multi-row upsert, which only sets
+    it on a row still holding this claim, so recording twice changes
+    nothing. Failed cases are released in one UPDATE and are claimed
+    again by a later batch.
+    """
+    posted_at = datetime.now()
+    posted = [(case['case_id'], sink.name, posted_at, url, claim) for case, url in zip(cases, urls) if url]
+    failed = [case['case_id'] for case, url in zip(cases, urls) if not url]
+    if posted:
+        values = ',\n'.join(cur.mogrify("(%s, %s, %s, %s, %s)", row) for row in posted)
+        # posted_at is assigned first so url's condition still sees the old url
+        cur.execute(f"""
+        INSERT INTO posted_case (case_id, social_platform, posted_at, url, claim)
+        VALUES {values}
+        ON DUPLICATE KEY UPDATE
+            posted_at = IF(url IS NULL AND claim = VALUES(claim), VALUES(posted_at), posted_at),
+            url = IF(url IS NULL AND claim = VALUES(claim), VALUES(url), url)
+        """)
+    if failed:
+        cur.execute("""
+        UPDATE posted_case SET posted_at = NULL, claim = NULL
+        WHERE social_platform = %(sink)s AND claim = %(claim)s AND url IS NULL
+          AND case_id IN %(case_ids)s
+        """, {'sink': sink.name, 'claim': claim, 'case_ids': tuple(failed)})
+    return len(posted)
+
+def post_case(sink, bucket, case):
+    """Post one case under the rate limit; return its post URL, or None on failure."""
+    bucket.acquire()
+    try:
+        return sink.post(case)
+    except Exception as e:
+        print(f"Failed to post case {case['case_id']} to {sink.name}: {e}")
+        return None
+
+def publish_cases(sink, deadline=None):
+    """Post every unposted new case to sink, one claimed batch at a time.
+
+    The claims are committed before posting, so no transaction or lock is
+    held while the rate-limited posts go out. Each batch is posted
+    concurrently by PUBLISH_WORKERS threads sharing a token bucket, and
+    record_posts then records the outcomes in a second transaction.
+
+    Returns (posted, failed) counts.
+    """
+    bucket = TokenBucket(PUBLISH_RATE, PUBLISH_BURST)
+    posted = 0
+    failed = 0
+
+    conn = pymysql.connect(
+        **DB_CONFIG,
+        cursorclass=pymysql.cursors.DictCursor
+    )
+
+    try:
+        with ThreadPoolExecutor(max_workers=PUBLISH_WORKERS) as executor:
+            while not past_deadline(deadline, DEADLINE_MARGIN):
+                with conn.cursor() as cur:
+                    claim, cases = claim_batch(cur, sink, PUBLISH_BATCH_SIZE)
+                conn.commit()
+                if not cases:
+                    break
+
+                urls = list(executor.map(lambda case: post_case(sink, bucket, case), cases))
+                with conn.cursor() as cur:
+                    batch_posted = record_posts(cur, sink, claim, cases, urls)
+                conn.commit()
+
+                posted += batch_posted
+                failed += len(cases) - batch_posted
+                print(f"Posted {batch_posted} of {len(cases)} claimed cases to {sink.name}")
+                if not batch_posted:
+                    # Nothing got through; leave the rest for the next run
+                    break
+    except Exception as e:
+        print(f"Database error: {e}")
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return posted, failed
+
+def lambda_handler(event=None, context=None):
+    sink = SINKS[(event or {}).get('sink', PUBLISH_SINK)]()
+    posted, failed = publish_cases(sink, deadline_from_context(context))
+    return {
+        'statusCode': 200,
+        'body': json.dumps({'sink': sink.name, 'posted': posted, 'failed': failed})
+    }
+
+if __name__ == '__main__':
+    print(lambda_handler())
@@ -0,0 +1,17 @@
+"""Shared fixtures: the lambdas are imported the way the benches import them."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'bench'))
+
+from common import import_lambda  # noqa: E402
+
+@pytest.fixture(scope='session')
+def backtohome():
+    return import_lambda('get_backtohome')
+
+@pytest.fixture(scope='session')
+def thaimissing():
+    return import_lambda('get_thaimissing')
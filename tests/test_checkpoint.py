@@ -0,0 +1,57 @@
+"""CrawlCheckpoint over its file store: resuming, discarding and generations."""
+
+def open_checkpoint(backtohome, tmp_path, total_pages=3):
+    store = backtohome.FileCheckpointStore(str(tmp_path / 'checkpoint.json'))
+    return backtohome.CrawlCheckpoint.open(total_pages, store), store
+
+def test_resumes_pages_details_and_persisted_items(backtohome, tmp_path):
+    checkpoint, _ = open_checkpoint(backtohome, tmp_path)
+    items = [{'id': '1', 'name': 'a'}, {'id': '2', 'name': 'b'}]
+    checkpoint.page_done(1, items)
+    checkpoint.detail_done({'id': '1', 'detail': 'text'})
+    checkpoint.detail_done({'id': '2', 'detail': None})
+    checkpoint.mark_persisted(items[:1])
+    checkpoint.flush()
+
+    resumed, _ = open_checkpoint(backtohome, tmp_path)
+    assert resumed.state['generation'] == checkpoint.state['generation']
+    assert resumed.page_items(1) == items
+    assert resumed.page_items(2) is None
+    restored = {'id': '1'}
+    assert resumed.restore_detail(restored) and restored['detail'] == 'text'
+    # A failed detail fetch is not saved, so the resumed run retries it
+    assert not resumed.restore_detail({'id': '2'})
+    assert resumed.is_persisted(items[0]) and not resumed.is_persisted(items[1])
+
+def test_page_items_are_copies(backtohome, tmp_path):
+    checkpoint, _ = open_checkpoint(backtohome, tmp_path)
+    checkpoint.page_done(1, [{'id': '1'}])
+    checkpoint.page_items(1)[0]['detail'] = 'changed'
+    assert checkpoint.page_items(1) == [{'id': '1'}]
+
+def test_discards_checkpoint_of_different_page_count(backtohome, tmp_path):
+    checkpoint, _ = open_checkpoint(backtohome, tmp_path, total_pages=3)
+    checkpoint.page_done(1, [{'id': '1'}])
+    checkpoint.flush()
+    fresh, _ = open_checkpoint(backtohome, tmp_path, total_pages=4)
+    assert fresh.state['generation'] != checkpoint.state['generation']
+    assert fresh.page_items(1) is None
+
+def test_discards_expired_checkpoint(backtohome, tmp_path, monkeypatch):
+    checkpoint, _ = open_checkpoint(backtohome, tmp_path)
+    monkeypatch.setattr(backtohome, 'CHECKPOINT_TTL', -1)
+    fresh, _ = open_checkpoint(backtohome, tmp_path)
+    assert fresh.state['generation'] != checkpoint.state['generation']
+
+def test_older_generation_cannot_overwrite_newer(backtohome, tmp_path, monkeypatch):
+    old, store = open_checkpoint(backtohome, tmp_path, total_pages=3)
+    new, _ = open_checkpoint(backtohome, tmp_path, total_pages=5)
+    assert not store.save(old.state)
+    old.page_done(1, [{'id': 'stale'}])
+    old.flush()
+    assert store.load()['generation'] == new.state['generation']
+    # Clearing with the old generation leaves the newer checkpoint alone
+    old.finish()
+    assert store.load()['generation'] == new.state['generation']
+    new.finish()
+    assert store.load() is None
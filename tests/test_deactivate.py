@@ -0,0 +1,83 @@
+"""deactivate_cases against a database that enforces the schema's foreign keys."""
+import sqlite3
+
+import pytest
+
+SCHEMA = """
+CREATE TABLE cases (id integer PRIMARY KEY, name varchar(255));
+CREATE TABLE case_information (
+  case_id integer REFERENCES cases (id),
+  platform varchar(255),
+  description varchar(5000),
+  created_at timestamp,
+  PRIMARY KEY (case_id, platform)
+);
+CREATE TABLE posted_case (
+  case_id integer REFERENCES cases (id),
+  social_platform varchar(255),
+  posted_at timestamp,
+  url varchar(255),
+  PRIMARY KEY (case_id, social_platform)
+);
+CREATE TABLE case_outbox (
+  seq integer PRIMARY KEY AUTOINCREMENT,
+  case_id integer,
+  platform varchar(255),
+  change_type varchar(16)
+);
+"""
+
+class SqliteCursor:
+    """Runs the lambdas' pymysql-style SQL on sqlite, expanding parameters
+    the way pymysql does."""
+
+    def __init__(self, conn, escape):
+        self.conn = conn
+        self.escape = escape
+
+    def execute(self, sql, params=None):
+        if isinstance(params, dict):
+            sql = sql % {key: self.escape(value) for key, value in params.items()}
+        elif params is not None:
+            sql = sql % tuple(self.escape(value) for value in params)
+        self.conn.execute(sql)
+
+    def executemany(self, sql, rows):
+        for row in rows:
+            self.execute(sql, row)
+
+@pytest.fixture(params=['backtohome', 'thaimissing'])
+def module(request):
+    return request.getfixturevalue(request.param)
+
+@pytest.fixture
+def db(module):
+    import pymysql.converters
+
+    conn = sqlite3.connect(':memory:')
+    conn.execute('PRAGMA foreign_keys = ON')
+    conn.create_function('NOW', 0, lambda: '2026-01-01 00:00:00')
+    conn.create_function('CONCAT', -1, lambda *parts: ''.join(parts))
+    conn.executescript(SCHEMA)
+    platform = 'backtohome' if module.__name__ == 'get_backtohome' else 'thaimissing'
+    for case_id in (1, 2, 3):
+        conn.execute('INSERT INTO cases VALUES (?, ?)', (case_id, f"case {case_id}"))
+        conn.execute('INSERT INTO case_information VALUES (?, ?, ?, NULL)',
+                     (case_id, platform, 'text'))
+    conn.execute("INSERT INTO case_information VALUES (3, 'other', 'text', NULL)")
+    cur = SqliteCursor(conn, lambda value: pymysql.converters.escape_item(value, 'utf8mb4'))
+    return conn, cur
+
+def test_deactivate_deletes_orphans(module, db):
+    conn, cur = db
+    module.deactivate_cases(cur, [1, 3])
+    assert [row[0] for row in conn.execute('SELECT id FROM cases ORDER BY id')] == [2, 3]
+    assert [row[0] for row in conn.execute('SELECT case_id FROM case_outbox')] == [1, 3]
+
+def test_deactivate_keeps_posted_and_claimed_cases(module, db):
+    conn, cur = db
+    conn.execute("INSERT INTO posted_case VALUES (1, 'stub', NULL, 'https://example.com/1')")
+    conn.execute("INSERT INTO posted_case VALUES (2, 'stub', NULL, NULL)")
+    module.deactivate_cases(cur, [1, 2])
+    assert [row[0] for row in conn.execute('SELECT id FROM cases ORDER BY id')] == [1, 2, 3]
+    assert [row[0] for row in conn.execute('SELECT case_id FROM case_information ORDER BY case_id')] == [3, 3]
@@ -0,0 +1,112 @@
+"""Blocking and linking of records, and how link_cases replaces case_link."""
+import pytest
+
+from common import import_lambda
+
+@pytest.fixture(scope='module')
+def link():
+    return import_lambda('link_cases')
+
+def test_name_tokens_drop_honorifics_and_marks(link):
+    assert link.name_tokens('นางสาวสมศรี  ดีใจ') == link.name_tokens('สมศรี ดีใจ')
+    assert link.normalize_name('นายสมชาย ใจดี') == link.normalize_name('สมชาย ใจดี่')
+
+def test_blocking_keys(link):
+    record = link.make_record(1, 'backtohome', 'นายสมชาย ใจดี',
+                              'อายุขณะหายตัว: 23 ปี วันที่หายตัว: 2024-01-05 จังหวัดเชียงใหม่')
+    frequency = {gram: 1 for gram in record['grams']}
+    keys = link.blocking_keys(record, frequency)
+    assert ('t', 'สมชาย') in keys and ('t', 'ใจดี') in keys
+    assert sum(1 for key in keys if key[0] == 'n') == link.BLOCK_NGRAMS
+    assert ('d', '2024-01-05') in keys
+    assert ('p', 'เชียงใหม่', 4) in keys
+
+def test_links_a_variant_spelling_across_platforms(link):
+    records = [
+        link.make_record(1, 'backtohome', 'นายสมชาย ใจดี', 'อายุ 23 ปี'),
+        link.make_record(2, 'thaimissing', 'สมชาย ใจดี', 'อายุ 24 ปี'),
+        link.make_record(3, 'thaimissing', 'นางสมศรี มีสุข', 'อายุ 23 ปี'),
+    ]
+    assert list(link.link_records(records)) == [(1, 2)]
+
+def test_ages_too_far_apart_are_not_linked(link):
+    records = [
+        link.make_record(1, 'backtohome', 'สมชาย ใจดี', 'อายุ 20 ปี'),
+        link.make_record(2, 'thaimissing', 'สมชาย ใจดี', 'อายุ 60 ปี'),
+    ]
+    assert link.link_records(records) == {}
+
+def test_photo_pairs_are_compared_without_a_shared_block(link, monkeypatch):
+    monkeypatch.setattr(link, 'BLOCK_NGRAMS', 0)
+    # No name part in common, so the two records share no block
+    records = [
+        link.make_record(1, 'backtohome', 'สมชายใจดี'),
+        link.make_record(2, 'thaimissing', 'สมชาย ใจดี'),
+        link.make_record(2, 'backtohome', 'สมชาย ใจดี'),
+    ]
+    assert link.link_records(records) == {}
+    links = link.link_records(records, {(1, 2)})
+    assert list(links) == [(1, 2)] and links[1, 2] == pytest.approx(1.2)
+
+class LinkCursor:
+    """Serves link_cases' reads and records its writes."""
+
+    def __init__(self, cases, stored_links):
+        self.cases = cases
+        self.stored_links = stored_links
+        self.writes = []
+        self.result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if 'FROM cases c' in sql:
+            self.result = self.cases
+        elif 'FROM photo_match' in sql:
+            self.result = []
+        elif 'FROM case_link' in sql and sql.lstrip().startswith('SELECT'):
+            self.result = [{'case_id': a, 'linked_case_id': b} for a, b in self.stored_links]
+        else:
+            self.writes.append((' '.join(sql.split()), params))
+
+    def executemany(self, sql, rows):
+        self.writes.append((' '.join(sql.split()), list(rows)))
+
+    def fetchall(self):
+        return self.result
+
+class LinkConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.committed = False
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+def test_link_cases_deletes_stale_links(link, monkeypatch):
+    cases = [
+        {'id': 1, 'name': 'นายสมชาย ใจดี', 'platform': 'backtohome', 'description': ''},
+        {'id': 2, 'name': 'สมชาย ใจดี', 'platform': 'thaimissing', 'description': ''},
+    ]
+    cur = LinkCursor(cases, stored_links=[(1, 2), (3, 4), (5, 6)])
+    conn = LinkConnection(cur)
+    monkeypatch.setattr(link.pymysql, 'connect', lambda **kwargs: conn)
+
+    assert link.link_cases() == 1
+    (delete, params), (upsert, rows) = cur.writes
+    assert delete.startswith('DELETE FROM case_link') and params == {'stale': ((3, 4), (5, 6))}
+    assert upsert.startswith('INSERT INTO case_link') and rows == [(1, 2, 1.0)]
+    assert conn.committed
@@ -0,0 +1,42 @@
+"""PipeParsePool: results and errors from the workers, and workers that die."""
+import os
+
+import pytest
+
+def upper(content):
+    return content.upper()
+
+def fail(content):
+    raise ValueError(content)
+
+def die(content):
+    os._exit(3)
+
+@pytest.fixture
+def pool(backtohome):
+    pool = backtohome.PipeParsePool(2)
+    yield pool
+    pool.shutdown()
+
+def test_runs_parses_in_the_workers(pool):
+    assert [pool.run(upper, text) for text in ('a', 'b', 'c')] == ['A', 'B', 'C']
+
+def test_parse_errors_are_raised_and_keep_the_worker(pool):
+    with pytest.raises(ValueError):
+        pool.run(fail, 'bad page')
+    assert len(pool._workers) == 2
+    assert pool.run(upper, 'a') == 'A'
+
+def test_a_dead_worker_is_dropped(pool):
+    with pytest.raises(EOFError):
+        pool.run(die, 'page')
+    assert len(pool._workers) == 1
+    assert [pool.run(upper, text) for text in ('a', 'b', 'c')] == ['A', 'B', 'C']
+
+def test_parses_inline_once_every_worker_died(pool):
+    for _ in range(2):
+        with pytest.raises(EOFError):
+            pool.run(die, 'page')
+    assert pool._workers == {}
+    assert pool.run(upper, 'a') == 'A'
+    assert pool.run(upper, 'b') == 'B'
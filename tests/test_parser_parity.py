@@ -0,0 +1,35 @@
+"""Every HTML parser backend and the stream extractors agree on the fixture pages."""
+import os
+
+import pytest
+
+from bench_parser import STREAM_TEST_CHUNK, chunked
+from common import FIXTURES_DIR, read_fixture
+
+PAGES = sorted(name for name in os.listdir(os.path.join(FIXTURES_DIR, 'backtohome')) if name.endswith('.html'))
+
+def parse_with(backtohome, name, parser):
+    content = read_fixture('backtohome', name)
+    listing = name.startswith('listing_')
+    if parser in ('html.parser', 'lxml'):
+        parse = backtohome.parse_listing_page if listing else backtohome.parse_detail_page
+        return parse(content, parser)
+    chunk_size = STREAM_TEST_CHUNK if parser == 'stream-small' else backtohome.STREAM_CHUNK_SIZE
+    if listing:
+        return list(backtohome.feed_chunks(backtohome.ListingStreamParser(), chunked(content, chunk_size)))
+    extractor = backtohome.DetailStreamParser()
+    list(backtohome.feed_chunks(extractor, chunked(content, chunk_size)))
+    return extractor.text
+
+@pytest.mark.parametrize('name', PAGES)
+@pytest.mark.parametrize('parser', ['lxml', 'stream', 'stream-small'])
+def test_parser_matches_html_parser(backtohome, name, parser):
+    if parser == 'lxml':
+        pytest.importorskip('lxml')
+    assert parse_with(backtohome, name, parser) == parse_with(backtohome, name, 'html.parser')
+
+def test_fixtures_are_not_trivial(backtohome):
+    listings = parse_with(backtohome, 'listing_page_1.html', 'html.parser')
+    assert len(listings) == 5 and all(item['name'] for item in listings)
+    assert parse_with(backtohome, 'detail_10231.html', 'html.parser')
+    assert parse_with(backtohome, 'detail_missing_content.html', 'html.parser') is None
@@ -0,0 +1,92 @@
+"""HammingIndex against brute force, and the warm refresh of the photo index."""
+import random
+
+import pytest
+
+from common import import_lambda
+
+@pytest.fixture(scope='module')
+def mirror():
+    return import_lambda('mirror_images')
+
+def near_copy(rng, value, bits):
+    for bit in rng.sample(range(64), bits):
+        value ^= 1 << bit
+    return value
+
+@pytest.mark.parametrize('max_distance', [0, 3, 6, 10])
+def test_search_matches_brute_force(mirror, max_distance):
+    rng = random.Random(max_distance)
+    hashes = [rng.getrandbits(64) for _ in range(300)]
+    hashes += [near_copy(rng, rng.choice(hashes), rng.randint(0, max_distance + 2)) for _ in range(300)]
+    index = mirror.HammingIndex(max_distance)
+    for value, key in enumerate(hashes):
+        index.add(key, value)
+    for query in hashes[::7] + [near_copy(rng, key, max_distance) for key in hashes[::11]]:
+        expected = sorted((mirror.hamming(query, key), value) for value, key in enumerate(hashes)
+                          if mirror.hamming(query, key) <= max_distance)
+        assert sorted(index.search(query, max_distance)) == expected
+
+def test_search_within_a_smaller_distance(mirror):
+    index = mirror.HammingIndex(6)
+    index.add(0, 'zero')
+    index.add(0b111, 'three')
+    assert index.search(0, 2) == [(0, 'zero')]
+    with pytest.raises(ValueError):
+        index.search(0, 7)
+
+def test_remove_keeps_other_values_of_a_hash(mirror):
+    index = mirror.HammingIndex(6)
+    index.add(42, 'a')
+    index.add(42, 'b')
+    index.remove(42, 'a')
+    assert index.search(42, 0) == [(0, 'b')]
+    index.remove(42, 'b')
+    assert index.search(42, 6) == []
+    assert index.values == {} and all(table == {} for table in index.tables)
+
+class PhotoCursor:
+    """Answers load_photo_index's queries from a dict of (case_id, platform) -> dhash."""
+
+    def __init__(self, rows, changed=()):
+        self.rows = rows
+        self.changed = set(changed)
+        self.result = None
+
+    def execute(self, sql, params=None):
+        if 'NOW()' in sql:
+            self.result = [{'now': 'now'}]
+        elif 'COUNT(*)' in sql:
+            self.result = [{'count': len(self.rows)}]
+        else:
+            keys = self.changed if params else self.rows
+            self.result = [{'case_id': case_id, 'platform': platform, 'dhash': self.rows[case_id, platform]}
+                           for case_id, platform in keys]
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+def test_refresh_moves_a_changed_hash(mirror, monkeypatch):
+    monkeypatch.setattr(mirror, 'photo_index', None)
+    rows = {(1, 'backtohome'): 0, (2, 'thaimissing'): 0xFF}
+    index = mirror.load_photo_index(PhotoCursor(rows))
+
+    rows[1, 'backtohome'] = 0xF0
+    rows[3, 'backtohome'] = 0xFF00
+    refreshed = mirror.load_photo_index(PhotoCursor(rows, changed=[(1, 'backtohome'), (3, 'backtohome')]))
+    assert refreshed is index
+    assert index.search(0, 0) == []
+    assert sorted(index.search(0xF0, 4)) == [(0, (1, 'backtohome')), (4, (2, 'thaimissing'))]
+    assert index.search(0xFF00, 0) == [(0, (3, 'backtohome'))]
+
+def test_refresh_rebuilds_after_a_delete(mirror, monkeypatch):
+    monkeypatch.setattr(mirror, 'photo_index', None)
+    rows = {(1, 'backtohome'): 0, (2, 'thaimissing'): 0xFF}
+    index = mirror.load_photo_index(PhotoCursor(rows))
+    del rows[2, 'thaimissing']
+    rebuilt = mirror.load_photo_index(PhotoCursor(rows))
+    assert rebuilt is not index
+    assert rebuilt.search(0xFF, 6) == []
@@ -0,0 +1,170 @@
+"""The publisher: rate limiting, sinks, and the statements a batch costs."""
+import pytest
+
+from common import import_lambda
+
+@pytest.fixture(scope='module')
+def publish():
+    return import_lambda('publish_cases')
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(publish, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(publish, 'time', clock)
+    return clock
+
+def test_bucket_allows_the_burst_without_waiting(publish, clock):
+    bucket = publish.TokenBucket(rate=2, capacity=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.slept == []
+
+def test_bucket_then_holds_to_the_rate(publish, clock):
+    bucket = publish.TokenBucket(rate=2, capacity=3)
+    for _ in range(7):
+        bucket.acquire()
+    assert clock.now == pytest.approx(2.0)
+
+def test_bucket_refills_only_up_to_capacity(publish, clock):
+    bucket = publish.TokenBucket(rate=2, capacity=3)
+    for _ in range(3):
+        bucket.acquire()
+    clock.now += 60
+    for _ in range(4):
+        bucket.acquire()
+    assert clock.now == pytest.approx(60.5)
+
+def test_sink_is_abstract(publish):
+    with pytest.raises(TypeError):
+        publish.Sink()
+
+    class Incomplete(publish.Sink):
+        name = 'incomplete'
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+class ScriptedCursor:
+    """Records statements and answers them from a queue of (result, rowcount)."""
+
+    def __init__(self, answers):
+        import pymysql.converters
+        self.escape = lambda value: pymysql.converters.escape_item(value, 'utf8mb4')
+        self.answers = list(answers)
+        self.statements = []
+        self.rowcount = 0
+        self.result = None
+
+    def mogrify(self, sql, args):
+        return sql % tuple(self.escape(value) for value in args)
+
+    def execute(self, sql, params=None):
+        self.statements.append((' '.join(sql.split()), params))
+        self.result, self.rowcount = self.answers.pop(0) if self.answers else (None, 0)
+
+    def executemany(self, sql, rows):
+        raise AssertionError('one statement per outcome, not one per row')
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+def test_claim_batch_claims_new_events_in_one_insert(publish):
+    events = [{'seq': 11, 'case_id': 3}, {'seq': 12, 'case_id': 1}, {'seq': 14, 'case_id': 3}]
+    cases = [
+        {'case_id': 1, 'name': 'a', 'platform': 'backtohome'},
+        {'case_id': 3, 'name': 'b', 'platform': 'backtohome'},
+        {'case_id': 3, 'name': 'b', 'platform': 'thaimissing'},
+    ]
+    cur = ScriptedCursor([
+        (None, 0),              # cursor row
+        ([{'seq': 10}], 1),     # cursor seq
+        (None, 1),              # one released post re-claimed
+        (events, 3),            # new events
+        (None, 2),              # both cases claimed
+        ([], 0),                # outbox drained
+        (None, 1),              # cursor advanced
+        (None, 0),              # no delisted claims
+        (cases, 3),
+    ])
+    claim, claimed = publish.claim_batch(cur, publish.StubSink(), 5)
+    assert [case['case_id'] for case in claimed] == [1, 3]
+
+    sqls = [sql for sql, _ in cur.statements]
+    assert cur.statements[3][1]['seq'] == 10 and cur.statements[3][1]['limit'] == 4
+    inserts = [sql for sql in sqls if sql.startswith('INSERT INTO posted_case')]
+    assert len(inserts) == 1
+    assert f"(1, 'stub', NOW(), '{claim}'),(3, 'stub', NOW(), '{claim}')" in inserts[0].replace(', (', ',(')
+    assert cur.statements[5][1]['seq'] == 14 and cur.statements[5][1]['limit'] == 2
+    assert cur.statements[6][1]['seq'] == 14
+
+def test_claim_batch_leaves_the_cursor_when_nothing_is_new(publish):
+    cur = ScriptedCursor([(None, 0), ([{'seq': 10}], 1), (None, 0), ([], 0), (None, 0), ([], 0)])
+    assert publish.claim_batch(cur, publish.StubSink(), 5)[1] == []
+    assert not any(sql.startswith('UPDATE publish_cursor') for sql, _ in cur.statements)
+
+def test_claim_batch_skips_the_outbox_when_retries_fill_the_batch(publish):
+    cur = ScriptedCursor([(None, 0), ([{'seq': 10}], 1), (None, 5), (None, 0), ([], 0)])
+    publish.claim_batch(cur, publish.StubSink(), 5)
+    assert not any('FROM case_outbox' in sql for sql, _ in cur.statements)
+
+def test_record_posts_is_one_statement_per_outcome(publish):
+    cases = [{'case_id': i} for i in range(6)]
+    urls = ['https://example.com/0', None, 'https://example.com/2', None, 'https://example.com/4', None]
+    cur = ScriptedCursor([])
+    assert publish.record_posts(cur, publish.StubSink(), 'c' * 32, cases, urls) == 3
+    assert len(cur.statements) == 2
+    (posted, _), (released, params) = cur.statements
+    assert posted.startswith('INSERT INTO posted_case') and posted.count("'https://example.com/") == 3
+    assert released.startswith('UPDATE posted_case SET posted_at = NULL, claim = NULL')
+    assert params['case_ids'] == (1, 3, 5)
+
+class FakeConnection:
+    def __init__(self):
+        self.commits = 0
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+def test_publish_cases_posts_batches_until_none_are_claimed(publish, monkeypatch):
+    batches = [[{'case_id': 1, 'name': 'a'}, {'case_id': 2, 'name': 'b'}], [{'case_id': 3, 'name': 'c'}], []]
+    recorded = []
+    monkeypatch.setattr(publish.pymysql, 'connect', lambda **kwargs: FakeConnection())
+    monkeypatch.setattr(publish, 'claim_batch', lambda cur, sink, limit: ('c' * 32, batches.pop(0)))
+    monkeypatch.setattr(publish, 'record_posts',
+                        lambda cur, sink, claim, cases, urls: recorded.append(urls) or sum(map(bool, urls)))
+    monkeypatch.setattr(publish, 'PUBLISH_BURST', 10)
+    monkeypatch.setattr(publish, 'PUBLISH_WORKERS', 1)
+    sink = publish.StubSink()
+    assert publish.publish_cases(sink) == (3, 0)
+    assert [case_id for case_id, _ in sink.posts] == [1, 2, 3]
+    assert recorded == [['stub://posts/1', 'stub://posts/2'], ['stub://posts/3']]
@@ -0,0 +1,85 @@
+"""Snapshot diffing and the database probe that decides whether a snapshot is trusted."""
+import pytest
+
+def listing(id, name, detail='text'):
+    item = {'id': id, 'name': name, 'image_url': f"{id}.jpg", 'detail_link': f"detail?id={id}"}
+    if detail is not None:
+        item['detail'] = detail
+    return item
+
+def test_diff_snapshot_classifies_listings(backtohome):
+    old = [listing('1', 'นายสมชาย ใจดี'), listing('2', 'นางสมศรี ดีใจ'), listing('3', 'ด.ช.ก้อง ฟ้า')]
+    previous = dict(backtohome.snapshot_entry(item) for item in old)
+    items = [
+        listing('1', 'นายสมชาย ใจดี'),
+        listing('2', 'นางสมศรี ดีใจ', 'changed'),
+        listing('4', 'นายใหม่ มาแล้ว'),
+        listing('5', 'นายรอ รายละเอียด', detail=None),
+    ]
+    current, inserts, updates, removed = backtohome.diff_snapshot(previous, items)
+    assert [item['id'] for item in inserts] == ['4']
+    assert [item['id'] for item in updates] == ['2']
+    assert removed == {'ก้อง ฟ้า'}
+    assert set(current) == {'1', '2', '4', '5'}
+
+def test_diff_snapshot_keeps_a_name_listed_under_a_new_id(backtohome):
+    previous = dict([backtohome.snapshot_entry(listing('1', 'นายสมชาย ใจดี'))])
+    _, inserts, _, removed = backtohome.diff_snapshot(previous, [listing('9', 'นายสมชาย ใจดี')])
+    assert [item['id'] for item in inserts] == ['9']
+    assert removed == set()
+
+class ProbeCursor:
+    def __init__(self, row):
+        self.row = row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchone(self):
+        return dict(self.row)
+
+class ProbeConnection:
+    def __init__(self, row):
+        self.row = row
+
+    def cursor(self):
+        return ProbeCursor(self.row)
+
+    def close(self):
+        pass
+
+@pytest.fixture(params=['backtohome', 'thaimissing'])
+def module(request, monkeypatch, tmp_path):
+    module = request.getfixturevalue(request.param)
+    monkeypatch.setattr(module, 'SNAPSHOT_PATH', str(tmp_path / 'snapshot.json'))
+    return module
+
+def use_database(module, monkeypatch, **row):
+    monkeypatch.setattr(module.pymysql, 'connect', lambda **kwargs: ProbeConnection(row))
+    return module.probe_case_information(ProbeCursor(row))
+
+def test_snapshot_saved_in_the_second_of_its_writes_is_trusted(module, monkeypatch):
+    probe = use_database(module, monkeypatch, count=5, latest=1700000000, seq=42)
+    module.save_snapshot({'1': ['digest', 'name']}, 'payload', probe)
+    snapshot = module.load_snapshot()
+    assert snapshot['records'] == {'1': ['digest', 'name']}
+    assert snapshot['digest'] == 'payload'
+
+@pytest.mark.parametrize('changed', [{'count': 6}, {'latest': 1700000001}, {'seq': 43}])
+def test_snapshot_is_dropped_once_the_database_moves(module, monkeypatch, changed):
+    row = {'count': 5, 'latest': 1700000000, 'seq': 42}
+    probe = use_database(module, monkeypatch, **row)
+    module.save_snapshot({'1': ['digest', 'name']}, None, probe)
+    use_database(module, monkeypatch, **dict(row, **changed))
+    assert module.load_snapshot() is None
+
+def test_snapshot_without_probe_is_not_trusted(module, monkeypatch):
+    use_database(module, monkeypatch, count=5, latest=1700000000, seq=42)
+    module.save_snapshot({'1': ['digest', 'name']})
+    assert module.load_snapshot() is None
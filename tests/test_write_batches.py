@@ -0,0 +1,85 @@
+"""write_batches: chunked commits, and savepoint retries that isolate bad rows."""
+import time
+
+import pytest
+
+class FakeConnection:
+    """Transactional list of written ids; 'bad' items fail like a rejected row."""
+
+    def __init__(self):
+        self.committed = []
+        self.pending = []
+        self.savepoints = []
+        self.commits = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.committed.extend(self.pending)
+        self.pending = []
+        self.commits += 1
+
+    def rollback(self):
+        self.pending = []
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        if sql == 'SAVEPOINT sync_item':
+            self.conn.savepoints.append(len(self.conn.pending))
+        elif sql == 'RELEASE SAVEPOINT sync_item':
+            self.conn.savepoints.pop()
+        elif sql == 'ROLLBACK TO SAVEPOINT sync_item':
+            del self.conn.pending[self.conn.savepoints.pop():]
+
+def write_item(cur, item):
+    cur.conn.pending.append(item['id'])
+    if item.get('bad'):
+        raise ValueError(f"bad row {item['id']}")
+    return 'inserted'
+
+def write_chunk(cur, chunk):
+    return [write_item(cur, item) for item in chunk]
+
+@pytest.fixture(params=['backtohome', 'thaimissing'])
+def module(request, monkeypatch):
+    module = request.getfixturevalue(request.param)
+    monkeypatch.setattr(module, 'DB_BATCH_SIZE', 3)
+    return module
+
+def test_commits_every_chunk(module):
+    conn = FakeConnection()
+    items = [{'id': i} for i in range(7)]
+    written, rejected = module.write_batches(conn, items, write_item, write_chunk=write_chunk)
+    assert [item['id'] for item, _ in written] == list(range(7))
+    assert rejected == []
+    assert conn.committed == list(range(7))
+    assert conn.commits == 3
+
+@pytest.mark.parametrize('chunked', [False, True])
+def test_bad_row_costs_only_that_row(module, chunked):
+    conn = FakeConnection()
+    items = [{'id': i, 'bad': i in (1, 5)} for i in range(7)]
+    written, rejected = module.write_batches(
+        conn, items, write_item, write_chunk=write_chunk if chunked else None
+    )
+    assert [item['id'] for item, _ in written] == [0, 2, 3, 4, 6]
+    assert [(item['id'], error) for item, error in rejected] == [(1, 'bad row 1'), (5, 'bad row 5')]
+    # The failed chunks' first attempts were rolled back, nothing is written twice
+    assert conn.committed == [0, 2, 3, 4, 6]
+    assert conn.savepoints == []
+
+def test_stops_before_the_deadline(module):
+    conn = FakeConnection()
+    deadline = time.monotonic() + module.COMMIT_MARGIN - 1
+    written, rejected = module.write_batches(conn, [{'id': 1}], write_item, deadline)
+    assert (written, rejected, conn.committed) == ([], [], [])